@@ -0,0 +1,76 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .cache import record_link_changes
+from .events import link_events
+
+# Links older than this are moved from `links` to `links_archive`.
+LINK_ARCHIVE_AFTER_DAYS = int(os.getenv("LINK_ARCHIVE_AFTER_DAYS", "365"))
+# Rows moved per RPC call (one transaction each).
+LINK_ARCHIVE_BATCH = int(os.getenv("LINK_ARCHIVE_BATCH", "1000"))
+# Seconds between mover runs; 0 disables the background job.
+LINK_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("LINK_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+
+def archive_cutoff(days: int = LINK_ARCHIVE_AFTER_DAYS) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def archive_old_links(db, before: Optional[datetime] = None, batch_size: Optional[int] = None, job=None) -> int:
+    """Move links created before `before` to `links_archive`; returns how many moved.
+
+    Each batch is audited as "archive" so /links/changes and stream clients
+    drop the moved links from their lists.
+    """
+    cutoff = (before or archive_cutoff()).isoformat()
+    batch_size = batch_size or LINK_ARCHIVE_BATCH
+    moved = 0
+    while True:
+        res = db.rpc("archive_links", {"cutoff": cutoff, "batch_size": batch_size}).execute()
+        ids = res.data or []
+        if ids:
+            seq = record_link_changes(db, ids, "archive")
+            for link_id in ids:
+                link_events.publish("deleted", {"token": seq, "id": link_id})
+        moved += len(ids)
+        if job is not None:
+            job.progress(moved)
+        if len(ids) < batch_size or (job is not None and job.cancelled):
+            break
+    return moved
+
+
+class LinkArchiver:
+    """Periodic background run of `archive_old_links` in a worker thread."""
+
+    def __init__(self, interval_seconds: int = LINK_ARCHIVE_INTERVAL_SECONDS):
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.last_moved = 0
+
+    def start(self, get_db):
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(get_db))
+
+    async def _run(self, get_db):
+        while True:
+            try:
+                self.last_moved = await asyncio.to_thread(archive_old_links, get_db())
+                self.last_run = datetime.utcnow()
+                if self.last_moved:
+                    print(f"Moved {self.last_moved} links to links_archive")
+            except Exception as e:
+                print(f"Link archive run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+link_archiver = LinkArchiver()
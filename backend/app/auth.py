@@ -1,20 +1,32 @@
 import os
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from .cache import version_watcher
 from .database import get_db
+from .resilience import BackendUnavailable
+from .singleflight import read_flight
 from .models import User, UserInDB, TokenData
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480 # 8 hours
+# How long a worker trusts its cached disabled/role/existence of a user. Changes
+# made on this worker apply at once; other workers see them after the next
+# version poll, or at worst after this TTL.
+USER_STATUS_TTL_SECONDS = float(os.getenv("USER_STATUS_TTL_SECONDS", "30"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# EventSource cannot send headers, so streams also accept ?access_token=.
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,6 +40,8 @@ def get_user(db, username: str):
         response = db.table("users").select("*").eq("username", username).execute()
         if response.data and len(response.data) > 0:
             return UserInDB(**response.data[0])
+    except BackendUnavailable:
+        raise
     except Exception as e:
         print(f"Error fetching user: {e}")
     return None
@@ -50,31 +64,114 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user_token(token: str = Depends(oauth2_scheme)):
+def decode_access_token(token: Optional[str]) -> TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         role: str = payload.get("role")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username, role=role)
+        return TokenData(username=username, role=role)
     except JWTError:
         raise credentials_exception
-    
-    # We could fetch the full user from DB here if needed, but token data is usually enough for RBAC
-    # db = get_db()
-    # user = get_user(db, username=token_data.username)
-    # if user is None:
-    #     raise credentials_exception
-    return token_data
+
+class UserStatusCache:
+    """Per-worker username -> {"disabled", "role"} (None = no such user), with a short TTL.
+
+    Lets every request check that its token still belongs to an active user
+    without a database read; a miss costs one small, coalesced select.
+    """
+
+    _MISS = object()
+
+    def __init__(self, ttl_seconds: float = USER_STATUS_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+        self.stats = {"hits": 0, "misses": 0, "stale_hits": 0}
+
+    def cached(self, username: str):
+        """Fresh entry for `username`, or UserStatusCache._MISS."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= time.monotonic():
+                self.stats["misses"] += 1
+                return self._MISS
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def load(self, db, username: str) -> Optional[Dict[str, object]]:
+        def read():
+            rows = db.table("users").select("username,disabled,role").eq("username", username).execute().data
+            return {"disabled": bool(rows[0].get("disabled")), "role": rows[0].get("role")} if rows else None
+
+        try:
+            status_ = read_flight.do(("users", username), read, label="users:status")
+        except Exception as e:
+            # Database down or the lookup failed: keep trusting what we last knew, if anything.
+            with self._lock:
+                entry = self._entries.get(username)
+                if entry is not None:
+                    self.stats["stale_hits"] += 1
+                    return entry[1]
+            if isinstance(e, BackendUnavailable):
+                raise
+            print(f"User status lookup failed for {username}: {e}")
+            # Answered as 503 like an outage, not as a bare 500.
+            raise BackendUnavailable(f"user status lookup failed: {e}") from e
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, status_)
+        return status_
+
+    def invalidate(self, username: Optional[str] = None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+user_status = UserStatusCache()
+# User writes bump version:users, so other workers drop their entries on the next poll.
+version_watcher.subscribe("users", user_status.invalidate)
+
+async def check_active(token_data: TokenData) -> TokenData:
+    """Reject tokens of deleted or disabled users; the role comes from the user row."""
+    status_ = user_status.cached(token_data.username)
+    if status_ is UserStatusCache._MISS:
+        status_ = await run_in_threadpool(user_status.load, get_db(), token_data.username)
+    if status_ is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if status_["disabled"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    return TokenData(username=token_data.username, role=status_["role"])
+
+async def get_current_user_token(token: str = Depends(oauth2_scheme)):
+    return decode_access_token(token)
 
 async def get_current_active_user(current_user: TokenData = Depends(get_current_user_token)):
-    return current_user
+    return await check_active(current_user)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = None,
+):
+    return await check_active(decode_access_token(token or access_token))
 
 # Role-based dependencies
 def require_admin(current_user: TokenData = Depends(get_current_active_user)):
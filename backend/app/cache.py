@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from .resilience import BackendUnavailable
+from .singleflight import read_flight
+from .versions import bump_table_version, get_table_versions
+
+# How often (ms) a worker re-reads the shared version counters. This bounds how
+# long a write made by another worker/instance can stay invisible here.
+VERSION_POLL_MS = int(os.getenv("CACHE_VERSION_POLL_MS", "1000"))
+
+
+class VersionWatcher:
+    """Per-worker view of the `version:<table>` counters kept in `settings`.
+
+    All tracked tables are refreshed with one query, at most once per poll
+    interval. Writes made by this worker are applied immediately. Caches
+    subscribe to a table and get called whenever its version moves.
+    """
+
+    def __init__(self, poll_ms: int = VERSION_POLL_MS):
+        self.poll_interval = poll_ms / 1000.0
+        self._lock = threading.Lock()
+        self._tables: set = set()
+        self._versions: Dict[str, int] = {}
+        self._checked_at: Optional[float] = None
+        self._listeners: Dict[str, List[Callable[[], None]]] = defaultdict(list)
+
+    def subscribe(self, table: str, callback: Callable[[], None]):
+        with self._lock:
+            self._tables.add(table)
+            self._listeners[table].append(callback)
+
+    def version(self, db, table: str) -> Optional[int]:
+        """Last known version of `table`, polling the database if it is due."""
+        with self._lock:
+            due = (
+                table not in self._versions
+                or self._checked_at is None
+                or time.monotonic() - self._checked_at >= self.poll_interval
+            )
+            self._tables.add(table)
+        if due:
+            self.refresh(db)
+        with self._lock:
+            return self._versions.get(table)
+
+    def refresh(self, db):
+        with self._lock:
+            tables = sorted(self._tables)
+        # Workers that find the poll due at the same moment share one query.
+        fresh = read_flight.do(("settings", tuple(tables)), lambda: get_table_versions(db, tables), label="settings:versions")
+        with self._lock:
+            self._checked_at = time.monotonic()
+        for table, version in fresh.items():
+            if version is not None:
+                self.apply(table, version)
+
+    def apply(self, table: str, version: Optional[int]):
+        """Record a new version (None = unknown) and notify subscribers if it moved."""
+        with self._lock:
+            known = table in self._versions
+            if known and self._versions[table] == version:
+                return
+            if version is None:
+                self._versions.pop(table, None)
+            else:
+                self._versions[table] = version
+            listeners = list(self._listeners[table])
+        if known or version is None:
+            for callback in listeners:
+                callback()
+
+    def seed(self, versions: Dict[str, int]):
+        """Adopt versions loaded from elsewhere (a snapshot) as if just polled."""
+        with self._lock:
+            for table, version in versions.items():
+                self._tables.add(table)
+                self._versions.setdefault(table, version)
+            self._checked_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._versions.clear()
+            self._checked_at = None
+
+
+class TableCache:
+    """Read cache for one table, keyed by query (None = whole table).
+
+    Entries are stamped with the table version read before loading, so a
+    write racing with a load can only cause an extra reload, never staleness.
+    """
+
+    def __init__(self, watcher: VersionWatcher, table: str, max_entries: int = 64):
+        self.watcher = watcher
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        watcher.subscribe(table, self.invalidate)
+
+    def get(self, db, loader: Callable[[], Any], key: Hashable = None) -> Any:
+        version = self.watcher.version(db, self.table)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        label = self.table if key is None else f"{self.table}:{key}"
+        try:
+            # Concurrent misses for the same query and version share one load.
+            value = read_flight.do((self.table, key, version), loader, label=label)
+        except BackendUnavailable:
+            # Database down: an older copy beats a 503 for reference reads.
+            if entry is None:
+                raise
+            self.stale_hits += 1
+            return entry[1]
+        if version is not None:
+            with self._lock:
+                self._entries[key] = (version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def prime(self, version: int, value: Any, key: Hashable = None):
+        with self._lock:
+            self._entries[key] = (version, value)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+version_watcher = VersionWatcher()
+
+table_caches: Dict[str, TableCache] = {
+    table: TableCache(version_watcher, table)
+    for table in ("source_configs", "products", "turmas", "launch_types", "launches", "links")
+}
+
+
+def cached_rows(db, table: str, loader: Callable[[], Any], key: Hashable = None) -> Any:
+    return table_caches[table].get(db, loader, key)
+
+
+def mark_table_changed(db, table: str) -> Optional[int]:
+    """Bump the shared version after a write and drop this worker's stale entries."""
+    version = bump_table_version(db, table)
+    version_watcher.apply(table, version)
+    return version
+
+
+def record_link_changes(db, link_ids: List[str], action: str) -> Optional[int]:
+    """Bump the links version and insert one audit row per link in one transaction.
+
+    Returns the new version, which is the change token of the write. The RPC
+    holds the counter row lock until its audits commit, so seqs become visible
+    in order and /links/changes never moves a token past a pending write.
+    """
+    res = db.rpc("record_link_changes", {"link_ids": link_ids, "change_action": action}).execute()
+    data = res.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    seq = int(data) if data is not None else None
+    version_watcher.apply("links", seq)
+    return seq
+
+
+def reset_caches():
+    version_watcher.reset()
+    for cache in table_caches.values():
+        cache.invalidate()
@@ -0,0 +1,275 @@
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# Bounded buffer between the webhook handler and the DB writer. When it is full
+# the webhook answers 503 so Hotmart retries later instead of us running out of memory.
+CONVERSION_QUEUE_SIZE = int(os.getenv("CONVERSION_QUEUE_SIZE", "20000"))
+CONVERSION_BATCH_SIZE = int(os.getenv("CONVERSION_BATCH_SIZE", "500"))
+CONVERSION_FLUSH_MS = int(os.getenv("CONVERSION_FLUSH_MS", "500"))
+# Events are acknowledged before they are written, so a failed batch is never
+# dropped: it is retried with backoff doubling up to this cap (the queue fills
+# meanwhile and the webhook answers 503, so Hotmart holds further deliveries).
+CONVERSION_RETRY_BASE_SECONDS = 0.5
+CONVERSION_RETRY_MAX_SECONDS = float(os.getenv("CONVERSION_RETRY_MAX_SECONDS", "30"))
+# Events still unwritten at shutdown are saved here (one file per worker run)
+# and queued again by the next process that starts.
+CONVERSION_SPILL_DIR = os.getenv("CONVERSION_SPILL_DIR", "conversion_spill")
+CONVERSION_STOP_TIMEOUT_SECONDS = float(os.getenv("CONVERSION_STOP_TIMEOUT_SECONDS", "10"))
+# Shared secret Hotmart sends in the X-HOTMART-HOTTOK header. The webhook
+# refuses every event (503) while it is unset.
+HOTMART_HOTTOK = os.getenv("HOTMART_HOTTOK")
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    """Hotmart sends epoch milliseconds; keep ISO strings as they are."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat()
+    return str(value)
+
+
+def parse_hotmart_event(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map a Hotmart webhook (v2) payload to a `conversions` row, or None if unusable."""
+    data = payload.get("data") or {}
+    purchase = data.get("purchase") or {}
+    origin = purchase.get("origin") or {}
+    price = purchase.get("price") or {}
+    product = data.get("product") or {}
+
+    event = payload.get("event")
+    transaction = purchase.get("transaction")
+    event_id = payload.get("id") or (f"{event}:{transaction}" if event and transaction else None)
+    if not event_id:
+        return None
+
+    return {
+        "event_id": str(event_id),
+        "event": event,
+        "transaction": transaction,
+        "status": purchase.get("status"),
+        "xcode": origin.get("xcod") or origin.get("xcode"),
+        "src": origin.get("src"),
+        "sck": origin.get("sck"),
+        "amount": price.get("value"),
+        "currency": price.get("currency_value"),
+        "product_id": str(product["id"]) if product.get("id") is not None else None,
+        "occurred_at": _timestamp(purchase.get("approved_date") or payload.get("creation_date")),
+        "received_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class LinkIndex:
+    """In-memory xcode -> link attribution lookup for vendas links.
+
+    Filled from recent links at startup and as links are created; xcodes not
+    found are looked up for a whole batch with one query.
+    """
+
+    FIELDS = "id,xcode,utm_campaign,src,sck"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_xcode: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self):
+        return len(self._by_xcode)
+
+    def add(self, link: Dict[str, Any]):
+        if link.get("xcode"):
+            with self._lock:
+                self._by_xcode[link["xcode"]] = {k: link.get(k) for k in ("id", "utm_campaign", "src", "sck")}
+
+    def warm(self, db, limit: int = 5000):
+        try:
+            res = (
+                db.table("links").select(self.FIELDS).eq("link_type", "vendas")
+                .order("created_at", desc=True).limit(limit).execute()
+            )
+        except Exception as e:
+            print(f"Link index warm-up failed: {e}")
+            return
+        for link in res.data or []:
+            self.add(link)
+
+    def resolve(self, db, xcodes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        wanted = {x for x in xcodes if x}
+        with self._lock:
+            found = {x: self._by_xcode[x] for x in wanted if x in self._by_xcode}
+        # Old links live in links_archive; only still-missing xcodes go there.
+        for table in ("links", "links_archive"):
+            missing = sorted(wanted - found.keys())
+            if not missing:
+                break
+            res = db.table(table).select(self.FIELDS).in_("xcode", missing).execute()
+            for link in res.data or []:
+                self.add(link)
+            with self._lock:
+                found.update({x: self._by_xcode[x] for x in missing if x in self._by_xcode})
+        return found
+
+
+class ConversionIngestor:
+    """Queue webhook events and persist them to `conversions` in batches.
+
+    `submit` never touches the database, so the webhook can acknowledge at
+    once. A single background task drains the queue, resolves xcodes through
+    the link index and upserts each batch off the event loop. A batch that
+    fails is retried until it is written; on shutdown, whatever is left is
+    spilled to disk and replayed by `start`.
+    """
+
+    def __init__(
+        self,
+        index: LinkIndex,
+        queue_size: int = CONVERSION_QUEUE_SIZE,
+        batch_size: int = CONVERSION_BATCH_SIZE,
+        flush_ms: int = CONVERSION_FLUSH_MS,
+        spill_dir: str = CONVERSION_SPILL_DIR,
+    ):
+        self.index = index
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.spill_dir = spill_dir
+        self._db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Dict[str, Any]] = []
+        self.stats = {
+            "accepted": 0, "rejected": 0, "persisted": 0, "unmatched": 0,
+            "retries": 0, "batches": 0, "spilled": 0, "replayed": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return (self._queue.qsize() if self._queue else 0) + len(self._batch)
+
+    def start(self, db):
+        """Queue events spilled by earlier runs (startup)."""
+        self._db = db
+        self._ensure_started()
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "*.jsonl"))):
+            # Rename first: with several workers, only one replays each file.
+            claimed = f"{path}.{os.getpid()}.claimed"
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            left = []
+            for row in rows:
+                try:
+                    self._queue.put_nowait(row)
+                    self.stats["replayed"] += 1
+                except asyncio.QueueFull:
+                    left.append(row)
+            if left:
+                self.spill(left)
+            os.remove(claimed)
+            print(f"Replaying {len(rows) - len(left)} spilled conversions from {path}")
+
+    def submit(self, db, row: Dict[str, Any]) -> bool:
+        """Enqueue a parsed event. Returns False when the buffer is full."""
+        self._db = db
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["accepted"] += 1
+        return True
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            delay = CONVERSION_RETRY_BASE_SECONDS
+            while not await asyncio.to_thread(self.write_batch, self._db, batch):
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CONVERSION_RETRY_MAX_SECONDS)
+            self._batch = []
+            for _ in batch:
+                self._queue.task_done()
+
+    def write_batch(self, db, rows: List[Dict[str, Any]]) -> bool:
+        """Write one batch; False if it failed (the caller keeps the rows)."""
+        # Hotmart retries deliveries, so the same event may show up twice in a batch.
+        unique = list({r["event_id"]: r for r in rows}.values())
+        try:
+            links = self.index.resolve(db, (r["xcode"] for r in unique))
+            for row in unique:
+                link = links.get(row["xcode"])
+                row["link_id"] = link["id"] if link else None
+                row["utm_campaign"] = link["utm_campaign"] if link else None
+            db.table("conversions").upsert(unique, on_conflict="event_id", ignore_duplicates=True).execute()
+        except Exception as e:
+            print(f"Conversion batch write failed ({len(unique)} events, will retry): {e}")
+            return False
+        self.stats["batches"] += 1
+        self.stats["persisted"] += len(unique)
+        self.stats["unmatched"] += sum(1 for r in unique if r["link_id"] is None)
+        return True
+
+    def spill(self, rows: List[Dict[str, Any]]):
+        """Save acknowledged but unwritten events for the next process."""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.spill_dir, suffix=".tmp", delete=False, encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        os.replace(f.name, os.path.join(self.spill_dir, f"{os.getpid()}-{uuid.uuid4().hex}.jsonl"))
+        self.stats["spilled"] += len(rows)
+        print(f"Spilled {len(rows)} unwritten conversions to {self.spill_dir}")
+
+    async def drain(self):
+        """Wait until every queued event has been written (shutdown/tests)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float = CONVERSION_STOP_TIMEOUT_SECONDS):
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Database still failing: keep what was not written instead of losing it.
+        rows = list(self._batch)
+        while self._queue is not None and not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if rows:
+            # Replays are safe: the upsert ignores event_ids already written.
+            self.spill(rows)
+        self._batch = []
+        self._queue = None
+
+
+link_index = LinkIndex()
+conversion_ingestor = ConversionIngestor(link_index)
@@ -1,10 +1,12 @@
 import os
 import json
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from .resilience import SUPABASE_TIMEOUT_SECONDS, ResilientClient, supabase_breaker
+
 # Global Supabase client
 supabase: Client = None
 
@@ -16,7 +18,9 @@ def get_db():
         
         if url and key:
             try:
-                supabase = create_client(url, key)
+                client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT_SECONDS))
+                # Deadlines, read retries and the circuit breaker (see resilience.py).
+                supabase = ResilientClient(client, supabase_breaker)
                 print(f"Connected to Supabase: {url}")
             except Exception as e:
                 print(f"Failed to connect to Supabase: {e}")
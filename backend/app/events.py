@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+# Seconds between keep-alive comments on an idle stream.
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Events buffered per client before it is considered too slow.
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Set when events were dropped; the client must resync from /links/changes.
+        self.overflowed = False
+
+
+class LinkEventBroker:
+    """In-process pub/sub of link events for the SSE endpoint.
+
+    Each client has a bounded queue. A client that falls behind is not allowed
+    to grow memory: its backlog is dropped and it receives a single `resync`
+    event instead, so it can catch up through the delta endpoint.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """Fan an event out to every subscriber. Safe to call from any thread."""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(event, data)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, event, data)
+
+    def _dispatch(self, event: str, data: Dict[str, Any]):
+        for sub in list(self._subscribers):
+            if sub.overflowed:
+                continue
+            try:
+                sub.queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.overflowed = True
+                sub.queue.put_nowait(("resync", {}))
+
+    async def stream(
+        self,
+        sub: Subscription,
+        is_disconnected: Callable[[], Awaitable[bool]],
+        heartbeat: float = HEARTBEAT_SECONDS,
+    ) -> AsyncIterator[str]:
+        """Yield SSE frames for `sub` until the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while not await is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event == "resync":
+                    sub.overflowed = False
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(sub)
+
+
+link_events = LinkEventBroker()
@@ -0,0 +1,142 @@
+import re
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from .cache import cached_rows
+from .models import LinkCreate, SourceConfigData
+from .utils import normalize_utm, normalize_utm_term
+
+
+# Trailing date token of a normalized utm_term (see normalize_utm_term).
+DATED_TERM = re.compile(r"(^|_)\d{2}-\d{2}-\d{4}$")
+
+
+class SourceRules(NamedTuple):
+    """What a source accepts. Empty medium/content sets mean "anything"."""
+
+    mediums: FrozenSet[str]
+    contents: FrozenSet[str]
+    term_config: str
+    required_fields: FrozenSet[str]
+
+
+def source_config_rows(db) -> List[dict]:
+    return cached_rows(db, "source_configs", lambda: db.table("source_configs").select("*").execute().data)
+
+
+def compile_rules(rows: Iterable[Dict[str, Any]]) -> Dict[str, SourceRules]:
+    rules = {}
+    for row in rows:
+        try:
+            config = SourceConfigData(**(row.get("config") or {}))
+        except ValidationError as e:
+            print(f"Skipping invalid config of source {row.get('slug')}: {e}")
+            continue
+        rules[normalize_utm(row["slug"])] = SourceRules(
+            mediums=frozenset(normalize_utm(m.slug) for m in config.mediums),
+            contents=frozenset(normalize_utm(c.slug) for c in config.contents),
+            term_config=config.term_config,
+            required_fields=frozenset(config.required_fields),
+        )
+    return rules
+
+
+def _error(kind: str, field: str, msg: str, value: Any, source: str, allowed: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+    # Same shape as FastAPI's request validation errors.
+    ctx: Dict[str, Any] = {"source": source}
+    if allowed is not None:
+        ctx["allowed"] = sorted(allowed)
+    return {"type": f"governance.{kind}", "loc": ["body", field], "msg": msg, "input": value, "ctx": ctx}
+
+
+def check_link(rules: Dict[str, SourceRules], data: LinkCreate) -> List[Dict[str, Any]]:
+    """Governance errors for one link request (normalized like build_link does)."""
+    source = normalize_utm(data.utm_source)
+    config = rules.get(source)
+    if config is None:
+        return [_error("unknown_source", "utm_source", f"Source '{source}' is not configured", source, source, frozenset(rules))]
+
+    errors = []
+    medium = normalize_utm(data.utm_medium)
+    if config.mediums and medium not in config.mediums:
+        errors.append(_error(
+            "unknown_medium", "utm_medium", f"Medium '{medium}' is not configured for source '{source}'",
+            medium, source, config.mediums,
+        ))
+    content = normalize_utm(data.utm_content or "")
+    if content and config.contents and content not in config.contents:
+        errors.append(_error(
+            "unknown_content", "utm_content", f"Content '{content}' is not configured for source '{source}'",
+            content, source, config.contents,
+        ))
+    term = normalize_utm_term(data.utm_term or "")
+    dated = bool(DATED_TERM.search(term))
+    if config.term_config == "standard" and not dated:
+        errors.append(_error(
+            "invalid_term", "utm_term", f"Source '{source}' expects the term to end with the send date (dd-mm-yyyy)",
+            data.utm_term, source,
+        ))
+    elif config.term_config == "no_date" and dated:
+        errors.append(_error(
+            "invalid_term", "utm_term", f"Source '{source}' does not take a date in the term", data.utm_term, source,
+        ))
+    for field in sorted(config.required_fields):
+        if field == "term":
+            if not normalize_utm_term(data.utm_term or ""):
+                errors.append(_error("missing_field", "utm_term", f"Source '{source}' requires a term", data.utm_term, source))
+        elif not data.dynamic_fields.get(field):
+            errors.append(_error(
+                "missing_field", "dynamic_fields", f"Source '{source}' requires dynamic field '{field}'", None, source,
+            ))
+    return errors
+
+
+class RuleIndex:
+    """source_configs compiled into per-source frozen sets, per worker.
+
+    Recompiled only when the source_configs read cache hands back new rows
+    (after a config write here, or one seen by the version poll), so
+    validating a link is a few set lookups with no database read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Optional[List[dict]] = None
+        self._rules: Dict[str, SourceRules] = {}
+        self.compiles = 0
+
+    def rules(self, db) -> Dict[str, SourceRules]:
+        rows = source_config_rows(db)
+        with self._lock:
+            if rows is self._rows:
+                return self._rules
+        rules = compile_rules(rows)
+        with self._lock:
+            self._rows, self._rules = rows, rules
+            self.compiles += 1
+        return rules
+
+    def check(self, db, requests: Iterable[LinkCreate]) -> List[Dict[str, Any]]:
+        rules = self.rules(db)
+        if not rules:
+            # No source configured yet (fresh database): nothing to enforce.
+            return []
+        errors, seen = [], set()
+        for data in requests:
+            for error in check_link(rules, data):
+                if error["msg"] not in seen:
+                    seen.add(error["msg"])
+                    errors.append(error)
+        return errors
+
+    def enforce(self, db, requests: Iterable[LinkCreate]):
+        """Raise 422 with every distinct governance error of `requests`."""
+        errors = self.check(db, requests)
+        if errors:
+            raise HTTPException(status_code=422, detail=errors)
+
+
+source_rules = RuleIndex()
@@ -0,0 +1,202 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from .cache import mark_table_changed
+from .utils import TRACKING_PARAMS
+
+# Results per destination are reused for this long (across runs in a worker).
+LINK_HEALTH_TTL_SECONDS = int(os.getenv("LINK_HEALTH_TTL_SECONDS", "600"))
+# Requests in flight overall, and per destination host (be polite to landing pages).
+LINK_HEALTH_CONCURRENCY = int(os.getenv("LINK_HEALTH_CONCURRENCY", "20"))
+LINK_HEALTH_PER_HOST = int(os.getenv("LINK_HEALTH_PER_HOST", "4"))
+LINK_HEALTH_TIMEOUT_SECONDS = float(os.getenv("LINK_HEALTH_TIMEOUT_SECONDS", "10"))
+# "Recent links" when no campaign is given.
+LINK_HEALTH_RECENT_DAYS = int(os.getenv("LINK_HEALTH_RECENT_DAYS", "7"))
+# Ids per update call and links read per page.
+HEALTH_WRITE_CHUNK = 200
+HEALTH_PAGE = 1000
+# Some servers reject HEAD; retry those with a GET (body not downloaded).
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+LINK_HEALTH_MAX_REDIRECTS = 5
+# Destinations are editor input fetched from the server: loopback, private and
+# link-local (cloud metadata) addresses are refused unless this is set (dev only).
+LINK_HEALTH_ALLOW_PRIVATE = os.getenv("LINK_HEALTH_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes")
+
+
+def destination_of(full_url: str) -> str:
+    """The page behind a link: the URL without the tracking params the generator adds.
+
+    Query params of the base URL itself (e.g. a Hotmart `off=`) are part of
+    the page and are kept.
+    """
+    parts = urlsplit(full_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in TRACKING_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+
+class HealthChecker:
+    """Checks destinations concurrently over one pooled client, with a TTL cache."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = LINK_HEALTH_TTL_SECONDS,
+        concurrency: int = LINK_HEALTH_CONCURRENCY,
+        per_host: int = LINK_HEALTH_PER_HOST,
+        timeout_seconds: float = LINK_HEALTH_TIMEOUT_SECONDS,
+        allow_private: bool = LINK_HEALTH_ALLOW_PRIVATE,
+    ):
+        self.ttl = ttl_seconds
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout_seconds
+        self.allow_private = allow_private
+        self._lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}
+        self.stats = {"checked": 0, "cached": 0, "failed": 0}
+
+    def cached(self, destination: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(destination)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    async def check_all(self, destinations: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        todo = []
+        for destination in set(destinations):
+            hit = self.cached(destination)
+            if hit is not None:
+                results[destination] = hit
+                self.stats["cached"] += 1
+            else:
+                todo.append(destination)
+        if not todo:
+            return results
+
+        overall = asyncio.Semaphore(self.concurrency)
+        hosts: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=False) as client:
+            async def run(destination: str):
+                # Host slot first, so a busy host does not hold global slots while waiting.
+                async with hosts[urlsplit(destination).netloc], overall:
+                    results[destination] = await self.check(client, destination)
+
+            await asyncio.gather(*(run(d) for d in todo))
+
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for destination in todo:
+                self._cache[destination] = (expires, results[destination])
+        return results
+
+    async def blocked(self, url: str) -> Optional[str]:
+        """Why `url` must not be fetched from the server, or None if it may."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return "Unsupported URL"
+        if self.allow_private:
+            return None
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            return f"DNS lookup failed: {e}"[:200]
+        for info in infos:
+            address = ipaddress.ip_address(info[4][0].split("%")[0])
+            if not address.is_global:
+                return f"Blocked non-public address {address}"
+        return None
+
+    async def check(self, client: httpx.AsyncClient, destination: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        result: Dict[str, Any] = {"health_status": None, "health_error": None}
+        url = destination
+        try:
+            # Redirects are followed by hand so every hop gets the address check.
+            for _ in range(LINK_HEALTH_MAX_REDIRECTS + 1):
+                result["health_error"] = await self.blocked(url)
+                if result["health_error"]:
+                    break
+                response = await client.head(url)
+                if response.status_code in HEAD_FALLBACK_STATUSES:
+                    async with client.stream("GET", url) as streamed:
+                        response = streamed
+                if response.status_code in REDIRECT_STATUSES and response.headers.get("location"):
+                    url = urljoin(url, response.headers["location"])
+                    continue
+                result["health_status"] = response.status_code
+                if response.status_code >= 400:
+                    result["health_error"] = response.reason_phrase or f"HTTP {response.status_code}"
+                break
+            else:
+                result["health_error"] = "Too many redirects"
+        except httpx.HTTPError as e:
+            result["health_error"] = f"{type(e).__name__}: {e}"[:200]
+        result["health_ms"] = int((time.monotonic() - started) * 1000)
+        result["health_checked_at"] = datetime.utcnow().isoformat()
+        self.stats["checked"] += 1
+        if result["health_error"]:
+            self.stats["failed"] += 1
+        return result
+
+
+def select_links_for_health(db, campaign: Optional[str] = None, days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """id/full_url of the campaign's links, or of links created in the last `days`."""
+    found, last = [], None
+    since = None if campaign else (datetime.utcnow() - timedelta(days=days or LINK_HEALTH_RECENT_DAYS)).isoformat()
+    while True:
+        query = db.table("links").select("id,full_url").neq("status", "archived")
+        query = query.eq("utm_campaign", campaign) if campaign else query.gte("created_at", since)
+        if last is not None:
+            query = query.gt("id", last)
+        page = query.order("id").limit(HEALTH_PAGE).execute().data or []
+        found.extend(page)
+        if len(page) < HEALTH_PAGE:
+            return found
+        last = page[-1]["id"]
+
+
+def check_link_health(db, campaign: Optional[str] = None, days: Optional[int] = None, checker: "HealthChecker" = None, job=None) -> Dict[str, Any]:
+    """Check the distinct destinations of the selected links and store results on them."""
+    checker = checker or health_checker
+    links = select_links_for_health(db, campaign, days)
+    by_destination: Dict[str, List[str]] = defaultdict(list)
+    for link in links:
+        if link.get("full_url"):
+            by_destination[destination_of(link["full_url"])].append(link["id"])
+    if job is not None:
+        job.progress(0, len(by_destination))
+
+    results = asyncio.run(checker.check_all(by_destination))
+
+    # One update per destination (chunked): every link behind it gets the same result.
+    for done, (destination, ids) in enumerate(by_destination.items(), start=1):
+        for i in range(0, len(ids), HEALTH_WRITE_CHUNK):
+            db.table("links").update(results[destination]).in_("id", ids[i:i + HEALTH_WRITE_CHUNK]).execute()
+        if job is not None:
+            job.progress(done, len(by_destination))
+    if links:
+        mark_table_changed(db, "links")
+
+    broken = sorted(d for d, r in results.items() if r["health_error"])
+    return {"links": len(links), "destinations": len(by_destination), "broken": broken}
+
+
+health_checker = HealthChecker()
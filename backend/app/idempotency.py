@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from postgrest.exceptions import APIError
+
+from .resilience import is_unique_violation
+
+# How long a completed response can be replayed.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Completed responses kept in memory per worker (LRU).
+IDEMPOTENCY_MEMORY_ENTRIES = int(os.getenv("IDEMPOTENCY_MEMORY_ENTRIES", "1000"))
+# A claim left behind by a crashed request stops blocking the key after this.
+PENDING_TTL_SECONDS = 60
+# Expired rows are purged from the table once every this many completions.
+PURGE_EVERY = 100
+
+
+def request_hash(payload: Any) -> str:
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expired(record: Dict[str, Any]) -> bool:
+    return datetime.fromisoformat(record["expires_at"]) <= _now()
+
+
+class IdempotencyStore:
+    """Replays stored responses for requests carrying an `Idempotency-Key`.
+
+    Completed responses live in a bounded in-memory LRU backed by the
+    `idempotency_keys` table. A new key is claimed with an insert on the
+    table's primary key, so the same key retried against another worker
+    while the first attempt is running gets a 409 instead of a second write.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MEMORY_ENTRIES, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._completions = 0
+
+    def _remember(self, record: Dict[str, Any]):
+        with self._lock:
+            self._memory[record["key"]] = record
+            self._memory.move_to_end(record["key"])
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, db, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._memory.get(key)
+            if record is not None and _expired(record):
+                del self._memory[key]
+                record = None
+        if record is not None:
+            return record
+
+        res = db.table("idempotency_keys").select("*").eq("key", key).limit(1).execute()
+        if not res.data:
+            return None
+        record = res.data[0]
+        if _expired(record):
+            db.table("idempotency_keys").delete().eq("key", key).execute()
+            return None
+        if record["status"] == "done":
+            self._remember(record)
+        return record
+
+    def claim(self, db, key: str, fingerprint: str) -> bool:
+        try:
+            db.table("idempotency_keys").insert({
+                "key": key,
+                "request_hash": fingerprint,
+                "status": "pending",
+                "expires_at": (_now() + timedelta(seconds=PENDING_TTL_SECONDS)).isoformat(),
+            }).execute()
+            return True
+        except APIError as e:
+            # Only "key already claimed" is a conflict; outages and schema errors propagate.
+            if is_unique_violation(e):
+                return False
+            raise
+
+    def complete(self, db, key: str, fingerprint: str, body: Any):
+        record = {
+            "key": key,
+            "request_hash": fingerprint,
+            "status": "done",
+            "response": body,
+            "expires_at": (_now() + self.ttl).isoformat(),
+        }
+        db.table("idempotency_keys").update(record).eq("key", key).execute()
+        self._remember(record)
+        self._completions += 1
+        if self._completions % PURGE_EVERY == 0:
+            try:
+                db.table("idempotency_keys").delete().lt("expires_at", _now().isoformat()).execute()
+            except Exception as e:
+                print(f"Idempotency purge failed: {e}")
+
+    def release(self, db, key: str):
+        db.table("idempotency_keys").delete().eq("key", key).execute()
+
+    def _replay(self, record: Dict[str, Any], fingerprint: str, response: Response) -> Any:
+        if record["request_hash"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if record["status"] != "done":
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        response.headers["Idempotent-Replayed"] = "true"
+        return record["response"]
+
+    def run(self, db, scope: str, idempotency_key: Optional[str], payload: Any, response: Response, action: Callable[[], Any]) -> Any:
+        """Run `action` once per key; later calls with the same key get its stored response."""
+        if not idempotency_key:
+            return action()
+
+        key = f"{scope}:{idempotency_key}"
+        fingerprint = request_hash(payload)
+        record = self.lookup(db, key)
+        if record is None and not self.claim(db, key, fingerprint):
+            record = self.lookup(db, key)
+            if record is None:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        if record is not None:
+            return self._replay(record, fingerprint, response)
+
+        try:
+            result = action()
+        except Exception:
+            self.release(db, key)
+            raise
+        self.complete(db, key, fingerprint, jsonable_encoder(result))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+# Jobs running at the same time in one worker; the rest wait as 'queued'.
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# How often a worker refreshes updated_at of its jobs (and picks up cancels
+# requested through other workers).
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+# Queued/running jobs without a heartbeat for this many beats are marked failed.
+STALE_AFTER_BEATS = 12
+# Progress is written to the jobs row at most this often.
+PROGRESS_FLUSH_SECONDS = 1.0
+
+ACTIVE_STATUSES = ["queued", "running"]
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class JobContext:
+    """Passed to job functions: progress reporting and cooperative cancellation.
+
+    Functions should call `progress()` between batches and stop early once
+    `cancelled` is set; whatever they return is stored as the job result.
+    """
+
+    def __init__(self, db, job_id: str):
+        self.db = db
+        self.id = job_id
+        self.cancelled = False
+        self.done = 0
+        self.total: Optional[int] = None
+        self._flushed_at = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if time.monotonic() - self._flushed_at < PROGRESS_FLUSH_SECONDS:
+            return
+        self._flushed_at = time.monotonic()
+        values = {"progress": self.done, "updated_at": _now()}
+        if self.total is not None:
+            values["total"] = self.total
+        try:
+            res = self.db.table("jobs").update(values).eq("id", self.id).execute()
+        except Exception as e:
+            print(f"Error saving progress of job {self.id}: {e}")
+            return
+        if res.data and res.data[0].get("cancel_requested"):
+            self.cancelled = True
+
+
+class JobRunner:
+    """In-process asyncio runner for long operations, tracked in the `jobs` table.
+
+    Job functions are sync (they use the sync Supabase client) and run in
+    worker threads, at most `concurrency` at a time. Their status outlives
+    the request that submitted them, so clients poll GET /jobs/{id}.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS):
+        self.concurrency = concurrency
+        self.heartbeat_seconds = heartbeat_seconds
+        self.handlers: Dict[str, Callable[[Any, Any, JobContext], Any]] = {}
+        self.models: Dict[str, Optional[Type[BaseModel]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._contexts: Dict[str, JobContext] = {}
+
+    def register(self, kind: str, fn: Callable[[Any, Any, JobContext], Any], model: Optional[Type[BaseModel]] = None):
+        """`fn(db, params, job)`; params are parsed into `model` when given."""
+        self.handlers[kind] = fn
+        self.models[kind] = model
+
+    def parse(self, kind: str, params: Dict[str, Any]) -> Any:
+        model = self.models.get(kind)
+        return model(**params) if model is not None else params
+
+    def start(self, db):
+        """Bind to the running loop and start the heartbeat (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._heartbeat = None
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = loop.create_task(self._beat(db))
+
+    def submit(self, db, kind: str, params: Dict[str, Any], created_by: Optional[str] = None) -> Dict[str, Any]:
+        """Validate, persist as 'queued' and schedule; returns the jobs row."""
+        params = jsonable_encoder(self.parse(kind, params))
+        now = _now()
+        row = {
+            "id": f"job_{uuid.uuid4().hex[:16]}",
+            "kind": kind,
+            "status": "queued",
+            "params": params,
+            "progress": 0,
+            "cancel_requested": False,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+        }
+        db.table("jobs").insert(row).execute()
+        self.start(db)
+        self._contexts[row["id"]] = JobContext(db, row["id"])
+        self._tasks[row["id"]] = self._loop.create_task(self._run(db, row))
+        return row
+
+    async def _run(self, db, row: Dict[str, Any]):
+        job_id = row["id"]
+        job = self._contexts[job_id]
+        try:
+            async with self._semaphore:
+                # Conditional flip: a cancel that landed while queued wins.
+                started = await asyncio.to_thread(
+                    self._update, db, job_id, {"status": "running", "started_at": _now(), "updated_at": _now()}, "queued"
+                )
+                if not started or job.cancelled:
+                    return
+                try:
+                    params = self.parse(row["kind"], row["params"])
+                    result = await asyncio.to_thread(self.handlers[row["kind"]], db, params, job)
+                    values = {"status": "cancelled" if job.cancelled else "done", "result": jsonable_encoder(result)}
+                except Exception as e:
+                    print(f"Job {job_id} ({row['kind']}) failed: {e}")
+                    values = {"status": "failed", "error": str(getattr(e, "detail", None) or e)}
+                values.update(progress=job.done, total=job.total, finished_at=_now(), updated_at=_now())
+                try:
+                    await asyncio.to_thread(self._update, db, job_id, values)
+                except Exception as e:
+                    # The row stays 'running' until reaped as stale.
+                    print(f"Error saving result of job {job_id}: {e}")
+        finally:
+            self._tasks.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+
+    @staticmethod
+    def _update(db, job_id: str, values: Dict[str, Any], expected_status: Optional[str] = None) -> bool:
+        query = db.table("jobs").update(values).eq("id", job_id)
+        if expected_status:
+            query = query.eq("status", expected_status)
+        return bool(query.execute().data)
+
+    def get(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        res = db.table("jobs").select("*").eq("id", job_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def recent(self, db, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = db.table("jobs").select("*")
+        if status:
+            query = query.eq("status", status)
+        return query.order("created_at", desc=True).limit(limit).execute().data or []
+
+    def cancel(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job at once; ask a running one (on any worker) to stop."""
+        job = self._contexts.get(job_id)
+        if job is not None:
+            job.cancelled = True
+        now = _now()
+        cancelled = self._update(
+            db, job_id, {"status": "cancelled", "cancel_requested": True, "finished_at": now, "updated_at": now}, "queued"
+        )
+        if not cancelled:
+            self._update(db, job_id, {"cancel_requested": True}, "running")
+        return self.get(db, job_id)
+
+    def heartbeat(self, db):
+        ids = list(self._contexts)
+        if ids:
+            res = db.table("jobs").update({"updated_at": _now()}).in_("id", ids).execute()
+            for row in res.data or []:
+                job = self._contexts.get(row["id"])
+                if job is not None and row.get("cancel_requested"):
+                    job.cancelled = True
+        self.reap(db)
+
+    def reap(self, db) -> int:
+        """Fail queued/running jobs whose worker stopped sending heartbeats."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.heartbeat_seconds * STALE_AFTER_BEATS)
+        res = (
+            db.table("jobs")
+            .update({"status": "failed", "error": "Worker stopped before the job finished", "finished_at": _now()})
+            .in_("status", ACTIVE_STATUSES)
+            .lt("updated_at", cutoff.isoformat())
+            .execute()
+        )
+        return len(res.data or [])
+
+    async def _beat(self, db):
+        while True:
+            try:
+                await asyncio.to_thread(self.heartbeat, db)
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    async def stop(self):
+        for task in list(self._tasks.values()) + [self._heartbeat]:
+            if task is not None:
+                task.cancel()
+        self._tasks.clear()
+        self._contexts.clear()
+        self._heartbeat = None
+
+
+job_runner = JobRunner()
@@ -0,0 +1,483 @@
+import re
+import threading
+import uuid
+from copy import deepcopy
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Embedded table store with the PostgREST semantics the backend relies on
+# (filters, ordering, limits, conflict handling, RPCs and the conversions
+# trigger). Backs backend/postgrest_standin.py for offline end-to-end runs.
+
+PRIMARY_KEYS: Dict[str, Tuple[str, ...]] = {
+    "users": ("username",),
+    "source_configs": ("slug",),
+    "products": ("slug",),
+    "turmas": ("slug",),
+    "launch_types": ("slug",),
+    "launches": ("slug",),
+    "settings": ("id",),
+    "links": ("id",),
+    "links_archive": ("id",),
+    "audits": ("event_id",),
+    "conversions": ("event_id",),
+    "attribution_rollups": ("utm_campaign", "dimension", "dim_key"),
+    "idempotency_keys": ("key",),
+    "jobs": ("id",),
+}
+
+# Unique constraints besides the primary key (null values never conflict).
+UNIQUE_KEYS: Dict[str, List[Tuple[str, ...]]] = {
+    "links": [("fingerprint",), ("short_code",)],
+}
+
+# Columns behind link_search_text() in schema.sql (GET /links?q=).
+SEARCH_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "links": ("id", "utm_campaign", "utm_content", "utm_term", "notes"),
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+COLUMN_DEFAULTS: Dict[str, Dict[str, Callable[[], Any]]] = {
+    "users": {"disabled": lambda: False},
+    "settings": {"count": lambda: 0},
+    "links": {"created_at": _now, "status": lambda: "active"},
+    "audits": {"timestamp": _now},
+    "conversions": {"received_at": _now},
+    "attribution_rollups": {"conversions": lambda: 0, "revenue": lambda: 0, "updated_at": _now},
+    "jobs": {
+        "status": lambda: "queued",
+        "params": dict,
+        "progress": lambda: 0,
+        "cancel_requested": lambda: False,
+        "created_at": _now,
+        "updated_at": _now,
+    },
+}
+
+
+class StoreError(Exception):
+    """A PostgREST-style error: HTTP status plus Postgres/PostgREST code."""
+
+    def __init__(self, status: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "details": self.details, "hint": None}
+
+
+def _split_list(text: str) -> List[str]:
+    """Split `a,"b,c",d` honoring the double quotes PostgREST clients add."""
+    items, current, quoted = [], "", False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    items.append(current)
+    return items
+
+
+def _coerce(value: Any, criteria: str) -> Any:
+    """Convert a filter literal to the type of the stored value."""
+    if isinstance(value, bool):
+        return criteria.lower() == "true"
+    if isinstance(value, (int, float)):
+        try:
+            return float(criteria)
+        except ValueError:
+            return criteria
+    return criteria
+
+
+def _like(pattern: str, flags: int = 0) -> "re.Pattern":
+    parts = re.split(r"([*%_])", pattern)
+    regex = "".join(".*" if p in ("*", "%") else "." if p == "_" else re.escape(p) for p in parts)
+    return re.compile(f"^{regex}$", flags | re.DOTALL)
+
+
+def parse_filter(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    """Predicate for one `column=op.value` query parameter."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, criteria = expression.partition(".")
+
+    def test(row: Dict[str, Any]) -> bool:
+        value = row.get(column)
+        if op == "is":
+            target = {"null": None, "true": True, "false": False}.get(criteria.lower(), criteria)
+            return value is target
+        # SQL semantics: comparisons against null are never true.
+        if value is None:
+            return False
+        if op == "in":
+            inner = criteria[1:-1] if criteria.startswith("(") and criteria.endswith(")") else criteria
+            return value in [_coerce(value, item) for item in _split_list(inner)]
+        if op in ("like", "ilike"):
+            return bool(_like(criteria, re.IGNORECASE if op == "ilike" else 0).match(str(value)))
+        target = _coerce(value, criteria)
+        if op == "eq":
+            return value == target
+        if op == "neq":
+            return value != target
+        if op == "gt":
+            return value > target
+        if op == "gte":
+            return value >= target
+        if op == "lt":
+            return value < target
+        if op == "lte":
+            return value <= target
+        raise StoreError(400, "PGRST100", f"unsupported operator: {op}")
+
+    if op not in {"eq", "neq", "gt", "gte", "lt", "lte", "in", "is", "like", "ilike"}:
+        raise StoreError(400, "PGRST100", f"unsupported operator: {op}")
+    if negate:
+        return lambda row: row.get(column) is not None and not test(row)
+    return test
+
+
+def parse_order(order: Optional[str]) -> List[Tuple[str, bool, bool]]:
+    """`col.desc.nullslast,col2` -> [(column, desc, nulls_first)]."""
+    terms = []
+    for term in filter(None, (order or "").split(",")):
+        parts = term.split(".")
+        desc = "desc" in parts[1:]
+        nulls_first = "nullsfirst" in parts[1:] or (desc and "nullslast" not in parts[1:])
+        terms.append((parts[0], desc, nulls_first))
+    return terms
+
+
+def _sort(rows: List[Dict[str, Any]], terms: List[Tuple[str, bool, bool]]) -> List[Dict[str, Any]]:
+    for column, desc, nulls_first in reversed(terms):
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _project(row: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+    if not columns:
+        return deepcopy(row)
+    return {c: deepcopy(row.get(c)) for c in columns}
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Trigram -> row ids, the local stand-in for the pg_trgm index.
+
+    Every substring of at least three characters shares all its trigrams with
+    the text containing it, so candidates are the intersection of the query's
+    posting lists; only those rows are checked for the actual substring.
+    """
+
+    def __init__(self, columns: Tuple[str, ...]):
+        self.columns = columns
+        self.texts: Dict[Any, str] = {}
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.postings: Dict[str, set] = {}
+
+    def text(self, row: Dict[str, Any]) -> str:
+        return " ".join(str(row.get(c) or "") for c in self.columns).lower()
+
+    def add(self, key: Any, row: Dict[str, Any]):
+        text = self.text(row)
+        self.texts[key] = text
+        self.rows[key] = row
+        for gram in _trigrams(text):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: Any):
+        text = self.texts.pop(key, None)
+        self.rows.pop(key, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def search(self, q: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """(rank, row) of the rows whose text contains `q`; lower rank matches better."""
+        grams = sorted(_trigrams(q), key=lambda g: len(self.postings.get(g, ())))
+        if grams:
+            candidates = set(self.postings.get(grams[0], ()))
+            for gram in grams[1:]:
+                candidates &= self.postings.get(gram, set())
+                if not candidates:
+                    break
+        else:
+            candidates = set(self.texts)
+        return [(_match_rank(self.texts[key], q), self.rows[key]) for key in candidates if q in self.texts[key]]
+
+
+def _match_rank(text: str, q: str) -> int:
+    """Order of pg_trgm word similarity for substring hits: 0 when `q` is whole
+    words, 1 when it starts a word, 2 when it ends one, 3 inside a word."""
+    best, start = 3, text.find(q)
+    while start != -1 and best:
+        end = start + len(q)
+        opens = start == 0 or not text[start - 1].isalnum()
+        closes = end == len(text) or not text[end].isalnum()
+        best = min(best, 0 if opens and closes else 1 if opens else 2 if closes else 3)
+        start = text.find(q, start + 1)
+    return best
+
+
+class LocalStore:
+    """Thread-safe in-memory tables with PostgREST-like operations.
+
+    Primary and unique keys are kept in hash indexes so inserts and upserts
+    stay O(1) per row; filtered reads scan the table, except link search,
+    which goes through a trigram index.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._unique: Dict[str, Dict[Tuple[str, ...], Dict[tuple, Dict[str, Any]]]] = {}
+        self._search = {table: TrigramIndex(columns) for table, columns in SEARCH_COLUMNS.items()}
+        self.rpcs: Dict[str, Callable[..., Any]] = {
+            "increment_link_counter": self._increment_link_counter,
+            "increment_link_counter_by": self._increment_link_counter_by,
+            "archive_links": self._archive_links,
+            "rewrite_link_urls": self._rewrite_link_urls,
+            "record_link_changes": self._record_link_changes,
+            "search_links": self._search_links,
+        }
+        self.triggers: Dict[str, Callable[[Dict[str, Any]], None]] = {
+            "conversions": self._apply_conversion_rollup,
+        }
+
+    def _rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def _indexes(self, table: str) -> Dict[Tuple[str, ...], Dict[tuple, Dict[str, Any]]]:
+        if table not in self._unique:
+            keys = [PRIMARY_KEYS.get(table, ())] + UNIQUE_KEYS.get(table, [])
+            self._unique[table] = {columns: {} for columns in keys if columns}
+        return self._unique[table]
+
+    @staticmethod
+    def _key(row: Dict[str, Any], columns: Tuple[str, ...]) -> Optional[tuple]:
+        key = tuple(row.get(c) for c in columns)
+        return None if any(v is None for v in key) else key
+
+    def _find(self, table: str, row: Dict[str, Any], columns: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        key = self._key(row, columns)
+        if key is None:
+            return None
+        index = self._indexes(table).get(columns)
+        if index is not None:
+            return index.get(key)
+        return next((r for r in self._rows(table) if self._key(r, columns) == key), None)
+
+    def _check_unique(self, table: str, row: Dict[str, Any], current: Optional[Dict[str, Any]] = None):
+        for columns in self._indexes(table):
+            existing = self._find(table, row, columns)
+            if existing is not None and existing is not current:
+                raise StoreError(
+                    409, "23505", f'duplicate key value violates unique constraint "{table}_{"_".join(columns)}_key"',
+                    f"Key ({', '.join(columns)})=({', '.join(str(row.get(c)) for c in columns)}) already exists.",
+                )
+
+    def _index(self, table: str, row: Dict[str, Any]):
+        for columns, index in self._indexes(table).items():
+            key = self._key(row, columns)
+            if key is not None:
+                index[key] = row
+        if table in self._search:
+            self._search[table].add(id(row), row)
+
+    def _unindex(self, table: str, row: Dict[str, Any]):
+        for columns, index in self._indexes(table).items():
+            key = self._key(row, columns)
+            if key is not None and index.get(key) is row:
+                del index[key]
+        if table in self._search:
+            self._search[table].remove(id(row))
+
+    def _merge(self, table: str, row: Dict[str, Any], patch: Dict[str, Any]):
+        merged = {**row, **patch}
+        self._check_unique(table, merged, current=row)
+        self._unindex(table, row)
+        row.update(deepcopy(patch))
+        self._index(table, row)
+
+    def select(
+        self,
+        table: str,
+        filters: List[Callable[[Dict[str, Any]], bool]] = (),
+        columns: Optional[List[str]] = None,
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Matching rows (after order/offset/limit) and the total match count."""
+        with self._lock:
+            rows = [r for r in self._rows(table) if all(f(r) for f in filters)]
+            total = len(rows)
+            rows = _sort(rows, parse_order(order))
+            end = None if limit is None else offset + limit
+            return [_project(r, columns) for r in rows[offset:end]], total
+
+    def insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        upsert: bool = False,
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Insert rows; with `upsert`, merge into (or skip) rows that conflict."""
+        conflict = tuple(on_conflict.split(",")) if on_conflict else PRIMARY_KEYS.get(table, ())
+        with self._lock:
+            written = []
+            for payload in rows:
+                existing = self._find(table, payload, conflict) if upsert and conflict else None
+                if existing is not None:
+                    if not ignore_duplicates:
+                        self._merge(table, existing, payload)
+                        written.append(deepcopy(existing))
+                    continue
+                row = {column: default() for column, default in COLUMN_DEFAULTS.get(table, {}).items()}
+                row.update(deepcopy(payload))
+                self._check_unique(table, row)
+                self._rows(table).append(row)
+                self._index(table, row)
+                written.append(deepcopy(row))
+                trigger = self.triggers.get(table)
+                if trigger:
+                    trigger(row)
+            return written
+
+    def update(self, table: str, filters: List[Callable[[Dict[str, Any]], bool]], patch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            updated = []
+            for row in self._rows(table):
+                if all(f(row) for f in filters):
+                    self._merge(table, row, patch)
+                    updated.append(deepcopy(row))
+            return updated
+
+    def delete(self, table: str, filters: List[Callable[[Dict[str, Any]], bool]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            kept, deleted = [], []
+            for row in self._rows(table):
+                (deleted if all(f(row) for f in filters) else kept).append(row)
+            for row in deleted:
+                self._unindex(table, row)
+            self.tables[table] = kept
+            return deleted
+
+    def rpc(self, name: str, args: Dict[str, Any]) -> Any:
+        fn = self.rpcs.get(name)
+        if fn is None:
+            raise StoreError(404, "PGRST202", f"Could not find the function public.{name}")
+        with self._lock:
+            return fn(**args)
+
+    # RPCs and triggers mirroring backend/schema.sql.
+
+    def _increment_link_counter_by(self, row_id: str, amount: int) -> int:
+        row = self._find("settings", {"id": row_id}, ("id",))
+        if row is None:
+            self.insert("settings", [{"id": row_id, "count": amount}])
+            return amount
+        row["count"] = (row.get("count") or 0) + amount
+        return row["count"]
+
+    def _increment_link_counter(self, row_id: str) -> int:
+        return self._increment_link_counter_by(row_id, 1)
+
+    def _archive_links(self, cutoff: str, batch_size: int) -> List[str]:
+        old = [r for r in self._rows("links") if r.get("created_at") is not None and r["created_at"] < cutoff]
+        old = _sort(old, [("created_at", False, False)])[:batch_size]
+        moved = {r["id"] for r in old}
+        self.delete("links", [lambda r: r["id"] in moved])
+        self.insert("links_archive", old, upsert=True)
+        return [r["id"] for r in old]
+
+    def _record_link_changes(self, link_ids: List[str], change_action: str) -> int:
+        seq = self._increment_link_counter("version:links")
+        self.insert("audits", [
+            {"event_id": str(uuid.uuid4()), "link_id": link_id, "actor": "system_user", "action": change_action, "seq": seq}
+            for link_id in link_ids
+        ])
+        return seq
+
+    def _rewrite_link_urls(self, changes: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        updated = []
+        for change in changes:
+            row = self._find("links", change, ("id",))
+            if row is None:
+                continue
+            values = {k: change.get(k) for k in ("base_url", "path", "full_url", "fingerprint")}
+            values.update(health_status=None, health_ms=None, health_error=None, health_checked_at=None)
+            self._merge("links", row, values)
+            updated.append({"id": row["id"]})
+        return updated
+
+    def _search_links(
+        self,
+        q: str,
+        link_status: str = "active",
+        page_size: int = 50,
+        page_offset: int = 0,
+        campaign: Optional[str] = None,
+        source: Optional[str] = None,
+        medium: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        wanted = {"utm_campaign": campaign, "utm_source": source, "utm_medium": medium, "link_type": kind}
+        hits = []
+        for rank, row in self._search["links"].search(q.lower()):
+            if (row.get("status") == "archived") != (link_status == "archived"):
+                continue
+            if any(value is not None and row.get(column) != value for column, value in wanted.items()):
+                continue
+            hits.append((rank, row))
+        # Newest first within a rank, id as the tie-breaker (as in search_links()).
+        hits.sort(key=lambda hit: hit[1]["id"])
+        hits.sort(key=lambda hit: hit[1].get("created_at") or "", reverse=True)
+        hits.sort(key=lambda hit: hit[0])
+        return [deepcopy(row) for _, row in hits[page_offset:page_offset + page_size]]
+
+    def _apply_conversion_rollup(self, row: Dict[str, Any]):
+        if row.get("utm_campaign") is None:
+            return
+        delta = {"PURCHASE_APPROVED": 1, "PURCHASE_REFUNDED": -1, "PURCHASE_CHARGEBACK": -1}.get(row.get("event"), 0)
+        if delta == 0:
+            return
+        amount = delta * float(row.get("amount") or 0)
+        keys = (
+            ("campaign", ""),
+            ("link", row.get("link_id") or ""),
+            ("source", f"{row.get('src') or ''}|{row.get('sck') or ''}"),
+        )
+        for dimension, dim_key in keys:
+            current = {"utm_campaign": row["utm_campaign"], "dimension": dimension, "dim_key": dim_key}
+            rollup = self._find("attribution_rollups", current, PRIMARY_KEYS["attribution_rollups"])
+            if rollup is None:
+                self.insert("attribution_rollups", [{**current, "conversions": delta, "revenue": amount}])
+            else:
+                rollup["conversions"] += delta
+                rollup["revenue"] = float(rollup["revenue"]) + amount
+                rollup["updated_at"] = _now()
@@ -1,13 +1,20 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime, timedelta
-import uuid
+import csv
+import hmac
+import io
+import itertools
+import zipfile
 import os
 
-from .models import Link, LinkCreate, Launch, SourceConfig, Product, Turma, LaunchType, Token, User, UserInDB, UserCreate
+from .models import CampaignGenerateRequest, CampaignGenerateResult, GeneratedCampaign, Link, LinkCreate, LinkChanges, LinkMatrixRequest, LinkMatrixResult, LinkBulkRequest, LinkBulkResult, LinkRewriteRequest, LinkRewriteResult, LinkHealthRequest, Job, JobSubmit, CampaignAttribution, LinkAttribution, SourceAttribution, Launch, SourceConfig, Product, Turma, LaunchType, Token, User, UserInDB, UserCreate
 from .utils import (
     normalize_utm,
     normalize_campaign,
@@ -16,11 +23,30 @@ from .utils import (
     build_full_url,
     build_tracking_params,
     generate_utm_id,
+    generate_utm_ids,
+    link_fingerprint,
+    link_id_from_short_code,
+    rebuild_full_url,
+    short_code_for,
     slugger,
 )
 from .database import get_db
-from .auth import authenticate_user, create_access_token, get_current_active_user, require_admin, require_editor, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+from .versions import etag_matches, get_table_version, make_etag, not_modified
+from .cache import version_watcher, cached_rows, mark_table_changed, record_link_changes, table_caches
+from .resilience import BackendUnavailable, is_unique_violation, supabase_breaker
+from .events import link_events
+from .idempotency import idempotency_store
+from .snapshot import load_snapshot, reference_snapshotter
+from .singleflight import read_flight
+from .jobs import job_runner
+from .governance import source_config_rows, source_rules
+from .health import check_link_health, health_checker
+from .qr import MEDIA_TYPES, QR_BATCH_LIMIT, QrOptions, qr_cache, qr_key
+from .archive import LINK_ARCHIVE_AFTER_DAYS, archive_cutoff, archive_old_links, link_archiver
+from .conversions import HOTMART_HOTTOK, conversion_ingestor, link_index, parse_hotmart_event
+from .auth import authenticate_user, create_access_token, get_current_active_user, get_stream_user, require_admin, require_editor, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash, user_status
 from fastapi.security import OAuth2PasswordRequestForm
+from postgrest.exceptions import APIError
 
 app = FastAPI(title="Link Hub API")
 
@@ -32,13 +58,102 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(BackendUnavailable)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailable):
+    """Supabase is down or the circuit breaker is open: fail fast."""
+    retry_after = max(1, int(exc.retry_after + 0.999))
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database temporarily unavailable"},
+        headers={"Retry-After": str(retry_after)},
+    )
+
 # Static files configuration
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 frontend_path = os.path.join(BASE_DIR, "frontend")
 
+# Source configs upserted at every startup (utm_list.md).
+# New Structure: Source -> { config: { mediums: [], contents: [], ... } }
+SEED_SOURCE_CONFIGS = [
+    {
+        "slug": "email", 
+        "name": "Email", 
+        "config": {
+            "mediums": [{"slug": "newsletter", "name": "Newsletter"}, {"slug": "marketing", "name": "Marketing"}],
+            "contents": [{"slug": "lista_atual", "name": "Lista Atual"}, {"slug": "lista_antiga", "name": "Lista Antiga"}, {"slug": "ex_alunos", "name": "Ex-Alunos"}],
+            "term_config": "standard",
+            "required_fields": ["date"]
+        }
+    },
+    {
+        "slug": "whatsapp", 
+        "name": "WhatsApp", 
+        "config": {
+            "mediums": [{"slug": "api_disparos", "name": "API Disparos"}, {"slug": "api_sequencias", "name": "API Sequências"}, {"slug": "grupos", "name": "Grupos"}],
+            "contents": [{"slug": "grupos_antigos", "name": "Grupos Antigos"}, {"slug": "grupos_atuais", "name": "Grupos Atuais"}, {"slug": "lista_lanc_atual", "name": "Lista Lançamento Atual"}],
+            "term_config": "standard",
+            "required_fields": ["date"]
+        }
+    },
+    {
+        "slug": "site", 
+        "name": "Site", 
+        "config": {
+            "mediums": [{"slug": "institucional", "name": "Institucional"}, {"slug": "plataforma_vde1f", "name": "Plat. VDE1F"}],
+            "contents": [{"slug": "banner", "name": "Banner"}, {"slug": "cupom_exclusivo", "name": "Cupom Exclusivo"}],
+            "term_config": "no_date",
+            "required_fields": []
+        }
+    },
+    {
+        "slug": "instagram", 
+        "name": "Instagram", 
+        "config": {
+            "mediums": [{"slug": "feed_mc", "name": "Feed MC"}, {"slug": "story_mc", "name": "Story MC"}, {"slug": "direct_mc", "name": "Direct MC"}, {"slug": "bio_link", "name": "Link na Bio"}],
+            "contents": [{"slug": "insta_vicio", "name": "Insta Vício"}, {"slug": "insta_vde", "name": "Insta VDE"}],
+            "term_config": "standard",
+            "required_fields": []
+        }
+    },
+     {
+        "slug": "google", 
+        "name": "Google", 
+        "config": {
+            "mediums": [{"slug": "cpc", "name": "CPC"}, {"slug": "display", "name": "Display"}, {"slug": "search", "name": "Search"}],
+            "contents": [{"slug": "keyword", "name": "Palavra Chave"}, {"slug": "banner", "name": "Banner Anúncio"}],
+            "term_config": "standard",
+            "required_fields": ["term"]
+        }
+    },
+    {
+        "slug": "youtube", 
+        "name": "YouTube", 
+        "config": {
+            "mediums": [{"slug": "canal_vicio", "name": "Canal Vício"}, {"slug": "canal_concursos", "name": "Canal Concursos"}],
+            "contents": [{"slug": "descricao_video", "name": "Descrição Vídeo"}, {"slug": "qrcode", "name": "QR Code"}, {"slug": "link_live", "name": "Link Live"}],
+            "term_config": "manual",
+            "required_fields": []
+        }
+    },
+    {
+        "slug": "meta", 
+        "name": "Meta", 
+        "config": {
+            "mediums": [{"slug": "facebook_ads", "name": "Facebook Ads"}, {"slug": "instagram_ads", "name": "Instagram Ads"}],
+            "contents": [{"slug": "static", "name": "Imagem Estática"}, {"slug": "video", "name": "Vídeo"}, {"slug": "carousel", "name": "Carrossel"}],
+            "term_config": "standard",
+            "required_fields": []
+        }
+    }
+]
+
 @app.on_event("startup")
 async def startup_event():
     """Seed initial data if database is empty."""
+    if not HOTMART_HOTTOK:
+        print("HOTMART_HOTTOK is not set: POST /webhooks/hotmart will refuse all events.")
+    # Serve reference data from the local snapshot until Supabase answers.
+    load_snapshot()
     db = get_db()
     
     if db is None:
@@ -58,91 +173,28 @@ async def startup_event():
     try:
         # Always upsert source configs to ensure they match the codebase (utm_list.md)
         print("Seeding/Updating source_configs...")
-        # New Structure: Source -> { config: { mediums: [], contents: [], ... } }
-        initial_sources = [
-            {
-                "slug": "email", 
-                "name": "Email", 
-                "config": {
-                    "mediums": [{"slug": "newsletter", "name": "Newsletter"}, {"slug": "marketing", "name": "Marketing"}],
-                    "contents": [{"slug": "lista_atual", "name": "Lista Atual"}, {"slug": "lista_antiga", "name": "Lista Antiga"}, {"slug": "ex_alunos", "name": "Ex-Alunos"}],
-                    "term_config": "standard",
-                    "required_fields": ["date"]
-                }
-            },
-            {
-                "slug": "whatsapp", 
-                "name": "WhatsApp", 
-                "config": {
-                    "mediums": [{"slug": "api_disparos", "name": "API Disparos"}, {"slug": "api_sequencias", "name": "API Sequências"}, {"slug": "grupos", "name": "Grupos"}],
-                    "contents": [{"slug": "grupos_antigos", "name": "Grupos Antigos"}, {"slug": "grupos_atuais", "name": "Grupos Atuais"}, {"slug": "lista_lanc_atual", "name": "Lista Lançamento Atual"}],
-                    "term_config": "standard",
-                    "required_fields": ["date"]
-                }
-            },
-            {
-                "slug": "site", 
-                "name": "Site", 
-                "config": {
-                    "mediums": [{"slug": "institucional", "name": "Institucional"}, {"slug": "plataforma_vde1f", "name": "Plat. VDE1F"}],
-                    "contents": [{"slug": "banner", "name": "Banner"}, {"slug": "cupom_exclusivo", "name": "Cupom Exclusivo"}],
-                    "term_config": "no_date",
-                    "required_fields": []
-                }
-            },
-            {
-                "slug": "instagram", 
-                "name": "Instagram", 
-                "config": {
-                    "mediums": [{"slug": "feed_mc", "name": "Feed MC"}, {"slug": "story_mc", "name": "Story MC"}, {"slug": "direct_mc", "name": "Direct MC"}, {"slug": "bio_link", "name": "Link na Bio"}],
-                    "contents": [{"slug": "insta_vicio", "name": "Insta Vício"}, {"slug": "insta_vde", "name": "Insta VDE"}],
-                    "term_config": "standard",
-                    "required_fields": []
-                }
-            },
-             {
-                "slug": "google", 
-                "name": "Google", 
-                "config": {
-                    "mediums": [{"slug": "cpc", "name": "CPC"}, {"slug": "display", "name": "Display"}, {"slug": "search", "name": "Search"}],
-                    "contents": [{"slug": "keyword", "name": "Palavra Chave"}, {"slug": "banner", "name": "Banner Anúncio"}],
-                    "term_config": "standard",
-                    "required_fields": ["term"]
-                }
-            },
-            {
-                "slug": "youtube", 
-                "name": "YouTube", 
-                "config": {
-                    "mediums": [{"slug": "canal_vicio", "name": "Canal Vício"}, {"slug": "canal_concursos", "name": "Canal Concursos"}],
-                    "contents": [{"slug": "descricao_video", "name": "Descrição Vídeo"}, {"slug": "qrcode", "name": "QR Code"}, {"slug": "link_live", "name": "Link Live"}],
-                    "term_config": "manual",
-                    "required_fields": []
-                }
-            },
-            {
-                "slug": "meta", 
-                "name": "Meta", 
-                "config": {
-                    "mediums": [{"slug": "facebook_ads", "name": "Facebook Ads"}, {"slug": "instagram_ads", "name": "Instagram Ads"}],
-                    "contents": [{"slug": "static", "name": "Imagem Estática"}, {"slug": "video", "name": "Vídeo"}, {"slug": "carousel", "name": "Carrossel"}],
-                    "term_config": "standard",
-                    "required_fields": []
-                }
-            }
-        ]
-        for s in initial_sources:
+        for s in SEED_SOURCE_CONFIGS:
             db.table("source_configs").upsert(s).execute()
+        mark_table_changed(db, "source_configs")
 
         if is_empty("products"):
             db.table("products").upsert({"slug": "vde1f", "nome": "VDE1F"}).execute()
+            mark_table_changed(db, "products")
         
         if is_empty("turmas"):
             db.table("turmas").upsert({"slug": "120d", "nome": "120d"}).execute()
+            mark_table_changed(db, "turmas")
             
         if is_empty("launch_types"):
             db.table("launch_types").upsert({"slug": "passariano", "nome": "Passariano"}).execute()
             db.table("launch_types").upsert({"slug": "evento", "nome": "Evento"}).execute()
+            mark_table_changed(db, "launch_types")
+
+        link_index.warm(db)
+        conversion_ingestor.start(db)
+        link_archiver.start(get_db)
+        reference_snapshotter.start(get_db)
+        job_runner.start(db)
 
         if is_empty("users"):
             print("Seeding users...")
@@ -158,6 +210,14 @@ async def startup_event():
     except Exception as e:
         print(f"Seeding failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush conversions still waiting in the ingestion queue."""
+    await conversion_ingestor.stop()
+    await link_archiver.stop()
+    await reference_snapshotter.stop()
+    await job_runner.stop()
+
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     db = get_db()
@@ -202,6 +262,8 @@ async def create_new_user(user_data: UserCreate, current_user: User = Depends(re
     )
     payload = user_in_db.model_dump()
     db.table("users").upsert(payload).execute()
+    user_status.invalidate(user_data.username)
+    mark_table_changed(db, "users")
     return User(**payload)
 
 @app.put("/users/{username}", response_model=User)
@@ -220,6 +282,9 @@ async def update_user(username: str, user_data: UserCreate, current_user: User =
     )
     payload = user_in_db.model_dump()
     db.table("users").update(payload).eq("username", username).execute()
+    # Disabling or demoting takes effect on this worker's next request.
+    user_status.invalidate(username)
+    mark_table_changed(db, "users")
     return User(**payload)
 
 @app.delete("/users/{username}")
@@ -228,13 +293,21 @@ async def delete_user(username: str, current_user: User = Depends(require_admin)
         raise HTTPException(status_code=400, detail="Cannot delete super-admin")
     db = get_db()
     db.table("users").delete().eq("username", username).execute()
+    user_status.invalidate(username)
+    mark_table_changed(db, "users")
     return {"status": "deleted"}
 
+# The read handlers below are plain `def`: they run in the threadpool, so
+# concurrent identical reads overlap and get coalesced by read_flight instead
+# of queueing one by one on the event loop.
 @app.get("/launches", response_model=List[dict])
-async def get_launches(current_user: User = Depends(get_current_active_user)):
+def get_launches(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     db = get_db()
-    res = db.table("launches").select("*").execute()
-    return res.data
+    etag = make_etag("launches", version_watcher.version(db, "launches"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    return cached_rows(db, "launches", lambda: db.table("launches").select("*").execute().data)
 
 @app.post("/launches")
 async def create_launch(data: Launch, current_user: User = Depends(require_admin)):
@@ -248,19 +321,92 @@ async def create_launch(data: Launch, current_user: User = Depends(require_admin
     )
     payload["slug"] = normalized_slug
     db.table("launches").upsert(payload).execute()
+    mark_table_changed(db, "launches")
     return {**payload}
 
+# Upper bound on combinations per generate request.
+CAMPAIGN_GENERATE_LIMIT = 500
+
+def launch_slugs(db) -> frozenset:
+    """Existing launch slugs, cached until the launches version moves."""
+    return cached_rows(
+        db, "launches",
+        lambda: frozenset(r["slug"] for r in db.table("launches").select("slug").execute().data or []),
+        key="slugs",
+    )
+
+def unique_slugs(values: List[str], normalize=slugger) -> List[str]:
+    """Each distinct value normalized once, first-seen order, blanks dropped."""
+    return list(dict.fromkeys(filter(None, (normalize(v) for v in values))))
+
+def campaign_date(value: str) -> str:
+    """Month-year part of a campaign: "0724", "07/24", "07-2024" -> "07-24"."""
+    digits = slugger(value).replace("_", "").replace("-", "")
+    if len(digits) == 6 and digits.isdigit():
+        digits = digits[:2] + digits[4:]
+    return normalize_campaign(digits)
+
+@app.post("/launches/generate", response_model=CampaignGenerateResult)
+def generate_campaigns(data: CampaignGenerateRequest, current_user: User = Depends(require_admin)):
+    """Every {produto}_{turma}_{lancamento}_{data} campaign for the given parts,
+    flagged when it already exists; slugs listed in `create` are saved with one upsert."""
+    db = get_db()
+    products, turmas, launch_types = (unique_slugs(values) for values in (data.products, data.turmas, data.launch_types))
+    dates = unique_slugs(data.dates, campaign_date)
+    total = len(products) * len(turmas) * len(launch_types) * len(dates)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Products, turmas, launch types and dates are all required")
+    if total > CAMPAIGN_GENERATE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"{total} combinations (max {CAMPAIGN_GENERATE_LIMIT})")
+
+    existing = launch_slugs(db)
+    campaigns, seen = [], set()
+    for product, turma, launch_type, date in itertools.product(products, turmas, launch_types, dates):
+        slug = normalize_campaign(f"{product}_{turma}_{launch_type}_{date}")
+        if slug in seen:
+            continue
+        seen.add(slug)
+        campaigns.append(GeneratedCampaign(
+            slug=slug, product=product, turma=turma, launch_type=launch_type, date=date, exists=slug in existing,
+        ))
+
+    # The preview text sent back by the frontend may not be normalized yet.
+    selected = {normalize_campaign(slug) for slug in data.create}
+    names = {normalize_campaign(slug): nome for slug, nome in data.names.items()}
+    unknown = sorted(selected - seen)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Not generated by this request: {', '.join(unknown)}")
+    rows = [
+        {"slug": c.slug, "nome": names.get(c.slug) or c.slug, "owner": getattr(current_user, "username", None), "status": "active"}
+        for c in campaigns if c.slug in selected and not c.exists
+    ]
+    created = []
+    if rows:
+        # `existing` is this worker's cache: a launch another worker just
+        # created must not be overwritten, so conflicts are skipped.
+        res = db.table("launches").upsert(rows, ignore_duplicates=True).execute()
+        created = [r["slug"] for r in res.data or []]
+        mark_table_changed(db, "launches")
+        for c in campaigns:
+            if c.slug in selected and c.slug not in created:
+                c.exists = True
+    return CampaignGenerateResult(campaigns=campaigns, created=created)
+
 @app.delete("/launches/{slug}")
 async def delete_launch(slug: str, current_user: User = Depends(require_admin)):
     db = get_db()
     db.table("launches").delete().eq("slug", slug).execute()
+    mark_table_changed(db, "launches")
     return {"status": "deleted"}
 
 @app.get("/source-configs", response_model=List[dict])
-async def get_source_configs(current_user: User = Depends(get_current_active_user)):
+def get_source_configs(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     db = get_db()
-    res = db.table("source_configs").select("*").execute()
-    return res.data
+    etag = make_etag("source_configs", version_watcher.version(db, "source_configs"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    return source_config_rows(db)
 
 @app.post("/source-configs")
 async def create_source_config(data: SourceConfig, current_user: User = Depends(require_admin)):
@@ -271,8 +417,11 @@ async def create_source_config(data: SourceConfig, current_user: User = Depends(
         
         result = db.table("source_configs").upsert(data_dict).execute()
         print(f"[DEBUG] Upsert result: {result}")
+        mark_table_changed(db, "source_configs")
         
         return data
+    except BackendUnavailable:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to upsert source config: {str(e)}")
         print(f"[ERROR] Data received: {data}")
@@ -284,49 +433,66 @@ async def create_source_config(data: SourceConfig, current_user: User = Depends(
 async def delete_source_config(slug: str, current_user: User = Depends(require_admin)):
     db = get_db()
     db.table("source_configs").delete().eq("slug", slug).execute()
+    mark_table_changed(db, "source_configs")
     return {"status": "deleted"}
 
 # Admin endpoints for Campaign Generator
 @app.get("/products", response_model=List[Product])
-async def get_products(current_user: User = Depends(get_current_active_user)):
+def get_products(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     db = get_db()
-    res = db.table("products").select("*").execute()
-    return [Product(**p) for p in res.data]
+    etag = make_etag("products", version_watcher.version(db, "products"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    rows = cached_rows(db, "products", lambda: db.table("products").select("*").execute().data)
+    return [Product(**p) for p in rows]
 
 @app.post("/products")
 async def create_product(data: Product, current_user: User = Depends(require_admin)):
     db = get_db()
     db.table("products").upsert(jsonable_encoder(data, exclude_none=True)).execute()
+    mark_table_changed(db, "products")
     return data
 
 @app.get("/turmas", response_model=List[Turma])
-async def get_turmas(current_user: User = Depends(get_current_active_user)):
+def get_turmas(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     db = get_db()
-    res = db.table("turmas").select("*").execute()
-    return [Turma(**t) for t in res.data]
+    etag = make_etag("turmas", version_watcher.version(db, "turmas"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    rows = cached_rows(db, "turmas", lambda: db.table("turmas").select("*").execute().data)
+    return [Turma(**t) for t in rows]
 
 @app.post("/turmas")
 async def create_turma(data: Turma, current_user: User = Depends(require_admin)):
     db = get_db()
     db.table("turmas").upsert(jsonable_encoder(data, exclude_none=True)).execute()
+    mark_table_changed(db, "turmas")
     return data
 
 @app.get("/launch-types", response_model=List[LaunchType])
-async def get_launch_types(current_user: User = Depends(get_current_active_user)):
+def get_launch_types(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     db = get_db()
-    res = db.table("launch_types").select("*").execute()
-    return [LaunchType(**l) for l in res.data]
+    etag = make_etag("launch_types", version_watcher.version(db, "launch_types"))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    rows = cached_rows(db, "launch_types", lambda: db.table("launch_types").select("*").execute().data)
+    return [LaunchType(**l) for l in rows]
 
 @app.post("/launch-types")
 async def create_launch_type(data: LaunchType, current_user: User = Depends(require_admin)):
     db = get_db()
     db.table("launch_types").upsert(jsonable_encoder(data, exclude_none=True)).execute()
+    mark_table_changed(db, "launch_types")
     return data
 
-@app.post("/links/generate", response_model=Link)
-async def generate_link(data: LinkCreate, current_user: User = Depends(require_editor)):
-    db = get_db()
-    
+# Max audit events returned by /links/changes before asking for a full reload.
+LINK_CHANGES_LIMIT = 500
+
+def build_link(data: LinkCreate, utm_id: str) -> Link:
+    """Normalize a link request and assemble the Link for an already reserved id."""
     # 1. Normalization
     utm_source = normalize_utm(data.utm_source)
     utm_medium = normalize_utm(data.utm_medium)
@@ -334,16 +500,13 @@ async def generate_link(data: LinkCreate, current_user: User = Depends(require_e
     utm_content = normalize_utm(data.utm_content or "")
     utm_term = normalize_utm_term(data.utm_term or "")
 
-    # 2. Validation / Governance
-    # (Simplified for now, UI handles most of it)
+    # 2. Email content from the send date (source rules are enforced by
+    # governance.source_rules before this runs).
     if "email" in utm_medium and "date" in data.dynamic_fields:
         date_str = data.dynamic_fields["date"]
         utm_content = f"email_d{date_str.replace('-', '_')}"
 
-    # 3. Generate Atomic ID
-    utm_id = generate_utm_id(db)
-    
-    # 4. Build query params and vendas contract fields.
+    # 3. Build query params and vendas contract fields.
     utms, src, sck, xcode = build_tracking_params(
         link_type=data.link_type,
         utm_source=utm_source,
@@ -363,13 +526,14 @@ async def generate_link(data: LinkCreate, current_user: User = Depends(require_e
         utms["xcode"] = xcode
         utms.pop("utm_id", None)
     
-    # 5. Build Full URL
+    # 4. Build Full URL
     clean_custom_params = sanitize_custom_params(data.custom_params)
     full_url = build_full_url(data.base_url, data.path, utms, clean_custom_params)
     
-    # 6. Create Object
-    link_obj = Link(
+    # 5. Create Object
+    return Link(
         id=utm_id,
+        short_code=short_code_for(utm_id),
         link_type=data.link_type,
         base_url=data.base_url,
         path=data.path or "",
@@ -387,58 +551,811 @@ async def generate_link(data: LinkCreate, current_user: User = Depends(require_e
         created_by="system_user",
         created_at=datetime.utcnow()
     )
-    
-    # 7. Save
+
+def save_links(db, links: List[Link]):
+    """Persist new links with one insert and one audit/version RPC."""
+    insert_links(db, links)
+    announce_links(db, links)
+
+def insert_links(db, links: List[Link]):
     # Supabase uses 'insert' or 'upsert'. 'utm_id' is our primary key or strict unique.
-    payload = jsonable_encoder(link_obj, exclude_none=True, exclude={"status"})
+    payload = [jsonable_encoder(l, exclude_none=True, exclude={"status"}) for l in links]
     db.table("links").insert(payload).execute()
-    
-    # Audit logic
-    db.table("audits").insert({
-        "event_id": str(uuid.uuid4()),
-        "link_id": utm_id,
-        "actor": "system_user",
-        "action": "create",
-        "timestamp": datetime.utcnow().isoformat()
-    }).execute()
-        
+
+def announce_links(db, links: List[Link]):
+    """Audit, version bump, SSE event and attribution index for inserted links."""
+    seq = record_link_changes(db, [l.id for l in links], "create")
+    for l in links:
+        link_events.publish("created", {"token": seq, "link": jsonable_encoder(l)})
+        link_index.add(l.model_dump())
+
+# Placeholder id for drafts and dry-run previews; real ids are reserved on commit.
+PLACEHOLDER_LINK_ID = "lnk_XXXXXX"
+
+def fingerprint_of(link: Link) -> str:
+    return link_fingerprint(
+        link.link_type, link.base_url, link.path, link.utm_source, link.utm_medium,
+        link.utm_campaign, link.utm_content, link.utm_term, link.custom_params,
+    )
+
+# Fingerprints per `in_()` lookup: 64-char hashes, so fewer than ids per URL.
+FINGERPRINT_LOOKUP_CHUNK = 100
+
+def find_links_by_fingerprint(db, fingerprints: List[str]) -> dict:
+    """Existing links keyed by fingerprint (indexed lookups, chunked)."""
+    found = {}
+    for i in range(0, len(fingerprints), FINGERPRINT_LOOKUP_CHUNK):
+        res = db.table("links").select("*").in_("fingerprint", fingerprints[i:i + FINGERPRINT_LOOKUP_CHUNK]).execute()
+        found.update({row["fingerprint"]: Link(**row) for row in res.data or []})
+    return found
+
+@app.post("/links/generate", response_model=Link)
+async def generate_link(
+    data: LinkCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(require_editor)
+):
+    db = get_db()
+    source_rules.enforce(db, [data])
+    # Client retries with the same Idempotency-Key get the stored response back.
+    return idempotency_store.run(db, "links/generate", idempotency_key, data, response, lambda: create_link(db, data, response))
+
+def create_link(db, data: LinkCreate, response: Response) -> Link:
+    # Identical inputs return the existing link without burning an id.
+    fingerprint = None
+    if not data.force_new:
+        fingerprint = fingerprint_of(build_link(data, PLACEHOLDER_LINK_ID))
+        existing = find_links_by_fingerprint(db, [fingerprint]).get(fingerprint)
+        if existing:
+            response.headers["X-Link-Reused"] = "true"
+            return existing
+
+    # Generate Atomic ID, then build and save.
+    utm_id = generate_utm_id(db)
+    link_obj = build_link(data, utm_id)
+    link_obj.fingerprint = fingerprint
+    try:
+        insert_links(db, [link_obj])
+    except APIError as e:
+        # Lost a race against an identical request (unique fingerprint index).
+        if not is_unique_violation(e):
+            raise
+        existing = find_links_by_fingerprint(db, [fingerprint]).get(fingerprint) if fingerprint else None
+        if existing is None:
+            raise
+        response.headers["X-Link-Reused"] = "true"
+        return existing
+    # Outside the try: a failed audit or version bump is an error, not a reuse.
+    announce_links(db, [link_obj])
     return link_obj
 
-@app.get("/links", response_model=List[Link])
-async def list_links(
-    current_user: User = Depends(get_current_active_user),
-    launch_id: Optional[str] = None,
-    utm_source: Optional[str] = None,
-    utm_medium: Optional[str] = None,
-    link_type: Optional[str] = Query(None, pattern="^(captacao|vendas)$")
+# Upper bound on links materialized by one matrix request.
+LINK_MATRIX_LIMIT = 500
+
+def expand_link_matrix(data: LinkMatrixRequest, configs: dict) -> List[LinkCreate]:
+    """Cross every selected source's mediums x contents with each link type."""
+    date_str = data.dynamic_fields.get("date") or datetime.utcnow().strftime("%d-%m-%Y")
+    requests = []
+    for link_type, destination in data.destinations.items():
+        for source_slug in data.sources:
+            config = configs[source_slug].get("config") or {}
+            # Same term rule the generator form applies for "standard" sources.
+            utm_term = data.utm_term or ""
+            if config.get("term_config", "standard") == "standard":
+                utm_term = f"{utm_term}_{date_str}" if utm_term else date_str
+            contents = [c["slug"] for c in config.get("contents", [])] or [""]
+            for medium in config.get("mediums", []):
+                for content in contents:
+                    requests.append(LinkCreate(
+                        link_type=link_type,
+                        base_url=destination.base_url,
+                        path=destination.path,
+                        utm_source=source_slug,
+                        utm_medium=medium["slug"],
+                        utm_campaign=data.utm_campaign,
+                        utm_content=content,
+                        utm_term=utm_term,
+                        custom_params=data.custom_params,
+                        notes=data.notes,
+                        # The resolved date satisfies sources that require one.
+                        dynamic_fields={**data.dynamic_fields, "date": date_str},
+                    ))
+    return requests
+
+@app.post("/links/matrix", response_model=LinkMatrixResult)
+def generate_link_matrix(
+    data: LinkMatrixRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(require_editor)
 ):
     db = get_db()
-    
-    query = db.table("links").select("*")
-    
+    return idempotency_store.run(db, "links/matrix", idempotency_key, data, response, lambda: create_link_matrix(db, data))
+
+def create_link_matrix(db, data: LinkMatrixRequest) -> LinkMatrixResult:
+    configs = {c["slug"]: c for c in source_config_rows(db)}
+    unknown = [s for s in data.sources if s not in configs]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown sources: {', '.join(unknown)}")
+    invalid_types = [t for t in data.destinations if t not in ("captacao", "vendas")]
+    if invalid_types:
+        raise HTTPException(status_code=400, detail=f"Invalid link types: {', '.join(invalid_types)}")
+
+    requests = expand_link_matrix(data, configs)
+    if not requests:
+        raise HTTPException(status_code=400, detail="Matrix is empty")
+    if len(requests) > LINK_MATRIX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Matrix has {len(requests)} links (max {LINK_MATRIX_LIMIT})")
+    source_rules.enforce(db, requests)
+
+    # Resolve combinations that already exist with a single lookup; only the
+    # rest get ids. Duplicate combinations inside the matrix collapse too.
+    drafts = [build_link(r, PLACEHOLDER_LINK_ID) for r in requests]
+    fingerprints = [None if data.force_new else fingerprint_of(d) for d in drafts]
+    existing = {} if data.force_new else find_links_by_fingerprint(db, sorted(set(fingerprints)))
+
+    pending, seen = [], set()
+    for request, draft, fingerprint in zip(requests, drafts, fingerprints):
+        if fingerprint is not None and (fingerprint in existing or fingerprint in seen):
+            continue
+        if fingerprint is not None:
+            seen.add(fingerprint)
+        pending.append((request, draft, fingerprint))
+
+    if data.dry_run:
+        links = list(existing.values()) + [draft for _, draft, _ in pending]
+        return LinkMatrixResult(dry_run=True, count=len(links), reused=len(existing), links=links)
+
+    ids = generate_utm_ids(db, len(pending))
+    created = []
+    for (request, _, fingerprint), utm_id in zip(pending, ids):
+        link_obj = build_link(request, utm_id)
+        link_obj.fingerprint = fingerprint
+        created.append(link_obj)
+    if created:
+        try:
+            insert_links(db, created)
+        except APIError as e:
+            # Lost a race against an identical matrix (unique fingerprint index):
+            # reuse what the winner wrote and insert only the rest.
+            if not is_unique_violation(e):
+                raise
+            raced = find_links_by_fingerprint(db, sorted({l.fingerprint for l in created if l.fingerprint}))
+            if not raced:
+                raise
+            existing.update(raced)
+            created = [l for l in created if l.fingerprint not in raced]
+            if created:
+                insert_links(db, created)
+        if created:
+            announce_links(db, created)
+    links = list(existing.values()) + created
+    return LinkMatrixResult(dry_run=False, count=len(links), reused=len(existing), links=links)
+
+def filter_links_query(query, launch_id=None, utm_source=None, utm_medium=None, utm_content=None, link_type=None, link_status="active"):
     if launch_id:
         query = query.eq("utm_campaign", launch_id)
     if utm_source:
         query = query.eq("utm_source", utm_source)
     if utm_medium:
         query = query.eq("utm_medium", utm_medium)
+    if utm_content:
+        query = query.eq("utm_content", utm_content)
     if link_type:
         query = query.eq("link_type", link_type)
+    if link_status == "archived":
+        query = query.eq("status", "archived")
+    else:
+        query = query.neq("status", "archived")
+    return query
+
+LINK_SEARCH_PAGE = 50
+LINK_SEARCH_MAX_OFFSET = 1000
+
+def search_links(db, q, offset=0, launch_id=None, utm_source=None, utm_medium=None, link_type=None, link_status="active"):
+    """Ranked page of links whose id, campaign, content, term or notes contain `q`."""
+    res = db.rpc("search_links", {
+        "q": q,
+        "link_status": link_status,
+        "page_size": LINK_SEARCH_PAGE,
+        "page_offset": offset,
+        "campaign": launch_id,
+        "source": utm_source,
+        "medium": utm_medium,
+        "kind": link_type,
+    }).execute()
+    return res.data or []
+
+@app.get("/links", response_model=List[Link])
+def list_links(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    launch_id: Optional[str] = None,
+    utm_source: Optional[str] = None,
+    utm_medium: Optional[str] = None,
+    link_type: Optional[str] = Query(None, pattern="^(captacao|vendas)$"),
+    link_status: str = Query("active", alias="status", pattern="^(active|archived)$"),
+    q: Optional[str] = Query(None, max_length=100),
+    offset: int = Query(0, ge=0, le=LINK_SEARCH_MAX_OFFSET)
+):
+    db = get_db()
+    # Search (q) returns ranked pages of LINK_SEARCH_PAGE; offset pages through them.
+    q = (q or "").strip().lower() or None
+    if q is not None and len(q) < 3:
+        raise HTTPException(status_code=400, detail="Search needs at least 3 characters")
+    if q is None:
+        offset = 0
+
+    # Version first so the tag can never be newer than the rows it describes.
+    version = version_watcher.version(db, "links")
+    etag = make_etag("links", version, launch_id, utm_source, utm_medium, link_type, link_status, q, q and str(offset))
+    cached = not_modified(request, response, etag)
+    if cached:
+        cached.headers["X-Change-Token"] = str(version)
+        return cached
     
-    # Sort by date
-    res = query.order("created_at", desc=True).limit(100).execute()
+    def load():
+        if q is not None:
+            return search_links(
+                db, q, offset, launch_id=launch_id, utm_source=utm_source, utm_medium=utm_medium,
+                link_type=link_type, link_status=link_status,
+            )
+        query = filter_links_query(
+            db.table("links").select("*"),
+            launch_id=launch_id, utm_source=utm_source, utm_medium=utm_medium,
+            link_type=link_type, link_status=link_status,
+        )
+        # Sort by date
+        return query.order("created_at", desc=True).limit(100).execute().data
+
+    rows = cached_rows(db, "links", load, key=(launch_id, utm_source, utm_medium, link_type, link_status, q, offset))
+    if version is not None:
+        response.headers["X-Change-Token"] = str(version)
     
-    return [Link(**l) for l in res.data]
+    return [Link(**l) for l in rows]
+
+@app.get("/links/changes", response_model=LinkChanges)
+async def list_link_changes(
+    since: int = Query(..., ge=0),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Links created and ids deleted after the `since` change token."""
+    db = get_db()
+    res = (
+        db.table("audits")
+        .select("link_id,action,seq")
+        .gt("seq", since)
+        .order("seq")
+        .limit(LINK_CHANGES_LIMIT + 1)
+        .execute()
+    )
+    events = res.data or []
+    if len(events) > LINK_CHANGES_LIMIT:
+        # Too far behind: cheaper for the client to reload the list.
+        return LinkChanges(token=get_table_version(db, "links") or since, reset=True)
+
+    token = since
+    created, deleted = [], []
+    for event in events:
+        token = max(token, event["seq"])
+        if event["action"] in ("create", "rewrite"):
+            # Rewritten links come back in `created`; clients replace them by id.
+            created.append(event["link_id"])
+        elif event["action"] in ("delete", "archive"):
+            deleted.append(event["link_id"])
+
+    gone = set(deleted)
+    created = [link_id for link_id in created if link_id not in gone]
+    links = []
+    if created:
+        rows = db.table("links").select("*").in_("id", created).order("created_at", desc=True).execute()
+        links = [Link(**l) for l in rows.data]
+    return LinkChanges(token=token, created=links, deleted=deleted)
+
+@app.get("/links/stream")
+async def stream_link_events(request: Request, current_user: User = Depends(get_stream_user)):
+    """Server-Sent Events feed of link creates/deletes handled by this process."""
+    sub = link_events.subscribe()
+    return StreamingResponse(
+        link_events.stream(sub, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+LINK_EXPORT_PAGE = 1000
+LINK_EXPORT_COLUMNS = [
+    ("ID", "id"), ("Tipo", "link_type"), ("Campaign", "utm_campaign"), ("Source", "utm_source"),
+    ("Medium", "utm_medium"), ("Content", "utm_content"), ("Term", "utm_term"),
+    ("URL Final", "full_url"), ("Notas", "notes"), ("Criado em", "created_at"),
+    ("Código curto", "short_code"),
+]
+
+def iter_filtered_links(db, columns: str, **filters):
+    """Matching links from `links`, then `links_archive`, in keyset pages by id."""
+    for table in ("links", "links_archive"):
+        last = None
+        while True:
+            query = filter_links_query(db.table(table).select(columns), **filters)
+            if last is not None:
+                query = query.lt("id", last)
+            page = query.order("id", desc=True).limit(LINK_EXPORT_PAGE).execute().data or []
+            yield from page
+            if len(page) < LINK_EXPORT_PAGE:
+                break
+            last = page[-1]["id"]
+
+@app.get("/links/export")
+async def export_links(
+    current_user: User = Depends(get_current_active_user),
+    launch_id: Optional[str] = None,
+    utm_source: Optional[str] = None,
+    utm_medium: Optional[str] = None,
+    utm_content: Optional[str] = None,
+    link_type: Optional[str] = Query(None, pattern="^(captacao|vendas)$"),
+    link_status: str = Query("active", alias="status", pattern="^(active|archived)$")
+):
+    """CSV of every matching link, hot table first, then `links_archive`."""
+    db = get_db()
+    columns = ",".join(field for _, field in LINK_EXPORT_COLUMNS)
+    rows = iter_filtered_links(
+        db, columns, launch_id=launch_id, utm_source=utm_source, utm_medium=utm_medium,
+        utm_content=utm_content, link_type=link_type, link_status=link_status,
+    )
+
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _ in LINK_EXPORT_COLUMNS])
+        for row in rows:
+            writer.writerow(["" if row.get(field) is None else row[field] for _, field in LINK_EXPORT_COLUMNS])
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"viciolinks_export_{datetime.utcnow().date().isoformat()}.csv"
+    return StreamingResponse(
+        lines(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+def qr_options(
+    format: str = Query("png", pattern="^(png|svg)$"),
+    scale: int = Query(10, ge=1, le=40),
+    border: int = Query(4, ge=0, le=10),
+    error: str = Query("m", pattern="^[lmqhLMQH]$"),
+) -> QrOptions:
+    return QrOptions(format=format, scale=scale, border=border, error=error)
+
+@app.get("/links/qr.zip")
+def download_campaign_qr_codes(
+    launch_id: str,
+    utm_source: Optional[str] = None,
+    link_type: Optional[str] = Query(None, pattern="^(captacao|vendas)$"),
+    options: QrOptions = Depends(qr_options),
+    current_user: User = Depends(get_current_active_user)
+):
+    """ZIP with one QR image per link of the campaign plus a manifest.csv."""
+    db = get_db()
+    links = []
+    for row in iter_filtered_links(
+        db, "id,full_url,utm_source,utm_medium,utm_content",
+        launch_id=launch_id, utm_source=utm_source, link_type=link_type,
+    ):
+        links.append(row)
+        if len(links) > QR_BATCH_LIMIT:
+            raise HTTPException(status_code=400, detail=f"More than {QR_BATCH_LIMIT} links; narrow the filter")
+    if not links:
+        raise HTTPException(status_code=404, detail="No links for this campaign")
+
+    buffer = io.BytesIO()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["file", "id", "full_url", "utm_source", "utm_medium", "utm_content"])
+    # PNG is already compressed; SVG is text.
+    compression = zipfile.ZIP_STORED if options.format == "png" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for link in links:
+            name = f"{link['id']}.{options.format}"
+            archive.writestr(name, qr_cache.get(link["full_url"], options))
+            writer.writerow([name] + [link.get(field) or "" for field in ("id", "full_url", "utm_source", "utm_medium", "utm_content")])
+        archive.writestr("manifest.csv", manifest.getvalue(), zipfile.ZIP_DEFLATED)
+
+    filename = f"qr_{slugger(launch_id)}_{options.format}.zip"
+    return Response(
+        content=buffer.getvalue(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.post("/links/archive/run")
+async def run_link_archive(
+    older_than_days: int = Query(LINK_ARCHIVE_AFTER_DAYS, ge=1),
+    current_user: User = Depends(require_admin)
+):
+    """Move links older than `older_than_days` to `links_archive` now."""
+    moved = await run_in_threadpool(archive_old_links, get_db(), archive_cutoff(older_than_days))
+    return {"status": "ok", "moved": moved}
+
+def resolve_link_ref(ref: str) -> str:
+    """Link id for a `lnk_` id or a short code (decoded, no lookup)."""
+    if ref.startswith("lnk_"):
+        return ref
+    try:
+        return link_id_from_short_code(ref)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Link not found")
+
+def find_link(db, link_id: str, columns: str = "*") -> dict:
+    for table in ("links", "links_archive"):
+        res = db.table(table).select(columns).eq("id", link_id).limit(1).execute()
+        if res.data:
+            return res.data[0]
+    raise HTTPException(status_code=404, detail="Link not found")
+
+@app.get("/links/{link_id}", response_model=Link)
+async def get_link(link_id: str, current_user: User = Depends(get_current_active_user)):
+    """A single link by id or short code, looked up in `links_archive` when not in the hot table."""
+    return Link(**find_link(get_db(), resolve_link_ref(link_id)))
+
+@app.get("/links/{link_id}/qr")
+def get_link_qr(
+    link_id: str,
+    request: Request,
+    options: QrOptions = Depends(qr_options),
+    current_user: User = Depends(get_current_active_user)
+):
+    """QR image of the link's full_url (rendered once, then served from the disk cache)."""
+    link = find_link(get_db(), resolve_link_ref(link_id))
+    etag = f'"{qr_key(link["full_url"], options)}"'
+    # no-cache: revalidate every time, since a rewrite can change full_url.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=qr_cache.get(link["full_url"], options), media_type=MEDIA_TYPES[options.format], headers=headers)
+
+@app.get("/r/{code}")
+def redirect_short_code(code: str):
+    """Public redirect to the link's full_url: the code decodes to the id, then
+    one primary key read (hot table, then archive)."""
+    link = find_link(get_db(), resolve_link_ref(code), columns="full_url")
+    # 302, not 301: a destination rewrite must reach clients that followed before.
+    return RedirectResponse(link["full_url"], status_code=302)
 
 @app.delete("/links/{link_id}")
-async def delete_link(link_id: str, current_user: User = Depends(require_editor)):
+def delete_link(link_id: str, current_user: User = Depends(require_editor)):
+    """Delete a link from the hot table and from `links_archive`."""
     db = get_db()
 
-    # Keep FK consistency when audits references links.id.
-    db.table("audits").delete().eq("link_id", link_id).execute()
-    db.table("links").delete().eq("id", link_id).execute()
+    removed = False
+    for table in ("links", "links_archive"):
+        res = db.table(table).delete().eq("id", link_id).execute()
+        removed = removed or bool(res.data)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Link not found")
+
+    # Audits are kept as history; the delete event feeds /links/changes.
+    seq = record_link_changes(db, [link_id], "delete")
+    link_events.publish("deleted", {"token": seq, "id": link_id})
     return {"status": "deleted", "id": link_id}
 
+# Ids per `in_()` write (keeps the PostgREST URL short) and per id lookup page.
+LINK_BULK_CHUNK = 200
+LINK_BULK_PAGE = 1000
+# Refuse to touch more than this many links in one call.
+LINK_BULK_LIMIT = 20000
+
+def select_bulk_link_ids(db, data: LinkBulkRequest) -> List[str]:
+    """Ids matching the request's id list and/or filters, in a few paged reads."""
+    def filtered(query):
+        if data.utm_campaign:
+            query = query.eq("utm_campaign", normalize_campaign(data.utm_campaign))
+        if data.utm_source:
+            query = query.eq("utm_source", normalize_utm(data.utm_source))
+        if data.created_from:
+            query = query.gte("created_at", data.created_from.isoformat())
+        if data.created_to:
+            query = query.lte("created_at", data.created_to.isoformat())
+        if data.action == "archive":
+            query = query.neq("status", "archived")
+        return query
+
+    if data.ids is not None:
+        ids = list(dict.fromkeys(data.ids))
+        found = []
+        for i in range(0, len(ids), LINK_BULK_CHUNK):
+            res = filtered(db.table("links").select("id").in_("id", ids[i:i + LINK_BULK_CHUNK])).execute()
+            found.extend(row["id"] for row in res.data or [])
+        return found
+
+    # Keyset pagination on the primary key; no offset scans.
+    found, last = [], None
+    while True:
+        query = filtered(db.table("links").select("id"))
+        if last is not None:
+            query = query.gt("id", last)
+        page = [row["id"] for row in query.order("id").limit(LINK_BULK_PAGE).execute().data or []]
+        found.extend(page)
+        if len(page) < LINK_BULK_PAGE or len(found) > LINK_BULK_LIMIT:
+            return found
+        last = page[-1]
+
+@app.post("/links/bulk", response_model=LinkBulkResult)
+def bulk_delete_links(data: LinkBulkRequest, current_user: User = Depends(require_editor)):
+    """Delete or archive links by ids and/or filters in batched `in_()` writes."""
+    return run_link_bulk(get_db(), data)
+
+def run_link_bulk(db, data: LinkBulkRequest, job=None) -> LinkBulkResult:
+    has_filter = data.utm_campaign or data.utm_source or data.created_from or data.created_to
+    if data.ids is None and not has_filter:
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+
+    ids = select_bulk_link_ids(db, data)
+    if len(ids) > LINK_BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Matches more than {LINK_BULK_LIMIT} links; narrow the filter")
+    if not ids:
+        return LinkBulkResult(action=data.action, matched=0, affected=0)
+
+    affected = []
+    for i in range(0, len(ids), LINK_BULK_CHUNK):
+        if job is not None:
+            job.progress(i, len(ids))
+            if job.cancelled:
+                # Chunks already written still get their audits and events below.
+                break
+        chunk = ids[i:i + LINK_BULK_CHUNK]
+        if data.action == "delete":
+            query = db.table("links").delete()
+        else:
+            # Dropping the fingerprint lets an identical link be generated again.
+            query = db.table("links").update({
+                "status": "archived",
+                "archived_at": datetime.utcnow().isoformat(),
+                "fingerprint": None,
+            })
+        res = query.in_("id", chunk).execute()
+        affected.extend(row["id"] for row in res.data or [])
+    if job is not None and not job.cancelled:
+        job.progress(len(ids), len(ids))
+
+    seq = record_link_changes(db, affected, data.action)
+    for link_id in affected:
+        link_events.publish("deleted", {"token": seq, "id": link_id})
+    return LinkBulkResult(action=data.action, matched=len(ids), affected=len(affected), token=seq)
+
+# Links read and written per rewrite batch (one rewrite RPC, one audit RPC each).
+LINK_REWRITE_BATCH = 500
+LINK_REWRITE_COLUMNS = (
+    "id,link_type,base_url,path,full_url,utm_source,utm_medium,utm_campaign,"
+    "utm_content,utm_term,custom_params,fingerprint"
+)
+LINK_REWRITE_SAMPLE = 20
+
+@app.post("/links/rewrite", response_model=LinkRewriteResult)
+def rewrite_link_destinations(data: LinkRewriteRequest, current_user: User = Depends(require_editor)):
+    """Point matching links at a new base_url/path, keeping ids and tracking params."""
+    return rewrite_links(get_db(), data)
+
+def rewrite_links(db, data: LinkRewriteRequest, job=None) -> LinkRewriteResult:
+    if not (data.utm_campaign or data.from_base_url):
+        raise HTTPException(status_code=400, detail="Provide utm_campaign or from_base_url")
+    if not data.base_url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="base_url must start with http:// or https://")
+
+    result = LinkRewriteResult(dry_run=data.dry_run, matched=0, rewritten=0)
+    last = None
+    while True:
+        # Keyset pages on id; rows already rewritten are behind the cursor.
+        query = db.table("links").select(LINK_REWRITE_COLUMNS).neq("status", "archived")
+        if data.utm_campaign:
+            query = query.eq("utm_campaign", normalize_campaign(data.utm_campaign))
+        if data.utm_source:
+            query = query.eq("utm_source", normalize_utm(data.utm_source))
+        if data.link_type:
+            query = query.eq("link_type", data.link_type)
+        if data.from_base_url:
+            query = query.eq("base_url", data.from_base_url)
+        if last is not None:
+            query = query.gt("id", last)
+        page = query.order("id").limit(LINK_REWRITE_BATCH).execute().data or []
+        if not page:
+            break
+        last = page[-1]["id"]
+        result.matched += len(page)
+
+        changes = []
+        for row in page:
+            path = (row.get("path") or "") if data.path is None else data.path
+            full_url = rebuild_full_url(row["full_url"], row.get("base_url"), row.get("path"), data.base_url, path)
+            if full_url == row["full_url"] and data.base_url == row.get("base_url") and path == (row.get("path") or ""):
+                continue
+            fingerprint = None
+            if row.get("fingerprint"):
+                fingerprint = link_fingerprint(
+                    row.get("link_type"), data.base_url, path, row.get("utm_source"), row.get("utm_medium"),
+                    row.get("utm_campaign"), row.get("utm_content"), row.get("utm_term"), row.get("custom_params"),
+                )
+            changes.append({"id": row["id"], "base_url": data.base_url, "path": path, "full_url": full_url, "fingerprint": fingerprint})
+            if len(result.sample) < LINK_REWRITE_SAMPLE:
+                result.sample.append({"id": row["id"], "old_url": row["full_url"], "new_url": full_url})
+
+        if changes and not data.dry_run:
+            # A link that already has the new inputs keeps the fingerprint (unique index).
+            taken = find_links_by_fingerprint(db, [c["fingerprint"] for c in changes if c["fingerprint"]])
+            seen = set()
+            for change in changes:
+                fingerprint = change["fingerprint"]
+                if fingerprint and ((fingerprint in taken and taken[fingerprint].id != change["id"]) or fingerprint in seen):
+                    change["fingerprint"] = None
+                elif fingerprint:
+                    seen.add(fingerprint)
+            res = db.rpc("rewrite_link_urls", {"changes": changes}).execute()
+            ids = [row["id"] for row in res.data or []]
+            result.token = record_link_changes(db, ids, "rewrite")
+            link_events.publish("resync", {"token": result.token})
+            result.rewritten += len(ids)
+            result.batches += 1
+        elif data.dry_run:
+            result.rewritten += len(changes)
+
+        if job is not None:
+            job.progress(result.matched)
+            if job.cancelled:
+                break
+        if len(page) < LINK_REWRITE_BATCH:
+            break
+    return result
+
+@app.post("/webhooks/hotmart", status_code=status.HTTP_202_ACCEPTED)
+async def hotmart_webhook(payload: dict, x_hotmart_hottok: Optional[str] = Header(None)):
+    """Acknowledge a Hotmart purchase event at once; it is persisted in batches."""
+    if not HOTMART_HOTTOK:
+        # Without the secret anyone could post purchases into the rollups.
+        raise HTTPException(status_code=503, detail="Hotmart webhook not configured")
+    if not hmac.compare_digest((x_hotmart_hottok or "").encode("utf-8"), HOTMART_HOTTOK.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid hottok")
+    row = parse_hotmart_event(payload)
+    if row is None:
+        raise HTTPException(status_code=400, detail="Missing event id")
+    if not conversion_ingestor.submit(get_db(), row):
+        raise HTTPException(status_code=503, detail="Ingestion queue full", headers={"Retry-After": "5"})
+    return {"status": "queued", "event_id": row["event_id"]}
+
+@app.get("/attribution/{campaign}", response_model=CampaignAttribution)
+async def get_campaign_attribution(
+    campaign: str,
+    limit: int = Query(10, ge=1, le=100),
+    by: str = Query("revenue", pattern="^(revenue|conversions)$"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Top links and src/sck combinations of a campaign from the rollup table."""
+    db = get_db()
+    utm_campaign = normalize_campaign(campaign)
+
+    def top(dimension: str, n: int) -> List[dict]:
+        res = (
+            db.table("attribution_rollups")
+            .select("dim_key,conversions,revenue")
+            .eq("utm_campaign", utm_campaign)
+            .eq("dimension", dimension)
+            .order(by, desc=True)
+            .limit(n)
+            .execute()
+        )
+        return res.data or []
+
+    totals = top("campaign", 1)
+    top_links = top("link", limit)
+    top_sources = top("source", limit)
+
+    # Decorate the N winning links with their UTMs (primary key lookup).
+    link_ids = [r["dim_key"] for r in top_links if r["dim_key"]]
+    details = {}
+    if link_ids:
+        res = db.table("links").select("id,utm_source,utm_medium,utm_content").in_("id", link_ids).execute()
+        details = {l["id"]: l for l in res.data or []}
+
+    return CampaignAttribution(
+        utm_campaign=utm_campaign,
+        conversions=totals[0]["conversions"] if totals else 0,
+        revenue=totals[0]["revenue"] if totals else 0,
+        top_links=[
+            LinkAttribution(
+                link_id=r["dim_key"],
+                conversions=r["conversions"],
+                revenue=r["revenue"],
+                **{k: v for k, v in details.get(r["dim_key"], {}).items() if k != "id"},
+            )
+            for r in top_links
+        ],
+        top_sources=[
+            SourceAttribution(
+                src=r["dim_key"].partition("|")[0],
+                sck=r["dim_key"].partition("|")[2],
+                conversions=r["conversions"],
+                revenue=r["revenue"],
+            )
+            for r in top_sources
+        ],
+    )
+
+# Long operations that can run as background jobs: fn(db, params, job).
+job_runner.register("links.bulk", lambda db, data, job: run_link_bulk(db, data, job), LinkBulkRequest)
+job_runner.register("links.rewrite", lambda db, data, job: rewrite_links(db, data, job), LinkRewriteRequest)
+job_runner.register("links.matrix", lambda db, data, job: create_link_matrix(db, data), LinkMatrixRequest)
+job_runner.register(
+    "links.archive",
+    lambda db, params, job: {"moved": archive_old_links(db, archive_cutoff(int(params.get("older_than_days", LINK_ARCHIVE_AFTER_DAYS))), job=job)},
+)
+job_runner.register(
+    "links.health",
+    lambda db, data, job: check_link_health(db, normalize_campaign(data.utm_campaign) if data.utm_campaign else None, data.days, job=job),
+    LinkHealthRequest,
+)
+JOB_ADMIN_KINDS = {"links.archive"}
+
+@app.post("/jobs", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(data: JobSubmit, current_user: User = Depends(require_editor)):
+    """Queue a long operation; poll GET /jobs/{id} for progress and result."""
+    if data.kind not in job_runner.handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {data.kind}")
+    if data.kind in JOB_ADMIN_KINDS:
+        require_admin(current_user)
+    try:
+        row = job_runner.submit(get_db(), data.kind, data.params, getattr(current_user, "username", None))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors()))
+    return Job(**row)
+
+@app.post("/links/health-check", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def start_link_health_check(data: LinkHealthRequest, current_user: User = Depends(require_editor)):
+    """Check the destinations of a campaign's (or recent) links as a background job."""
+    row = job_runner.submit(get_db(), "links.health", data.model_dump(), getattr(current_user, "username", None))
+    return Job(**row)
+
+@app.get("/jobs", response_model=List[Job])
+def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", pattern="^(queued|running|done|failed|cancelled)$"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user)
+):
+    return [Job(**row) for row in job_runner.recent(get_db(), job_status, limit)]
+
+@app.get("/jobs/{job_id}", response_model=Job)
+def get_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    row = job_runner.get(get_db(), job_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**row)
+
+@app.post("/jobs/{job_id}/cancel", response_model=Job)
+def cancel_job(job_id: str, current_user: User = Depends(require_editor)):
+    """Cancel a queued job; a running one stops at its next batch boundary."""
+    row = job_runner.cancel(get_db(), job_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**row)
+
+@app.get("/metrics")
+async def get_metrics(current_user: User = Depends(require_admin)):
+    """Circuit breaker state, cache/coalescing counters and ingestion stats of this worker."""
+    return {
+        "database": supabase_breaker.snapshot(),
+        "caches": {
+            table: {"hits": cache.hits, "misses": cache.misses, "stale_hits": cache.stale_hits}
+            for table, cache in table_caches.items()
+        },
+        "conversions": {**conversion_ingestor.stats, "pending": conversion_ingestor.pending},
+        "coalescing": read_flight.snapshot(),
+        "health_checks": health_checker.stats,
+        "qr_cache": qr_cache.snapshot(),
+        "user_status": user_status.snapshot(),
+    }
+
 # Mount frontend at root last to avoid intercepting API routes
 if os.path.exists(frontend_path):
     app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
 class Launch(BaseModel):
@@ -11,6 +11,27 @@ class Launch(BaseModel):
     owner: str
     status: str = "active"
 
+class CampaignGenerateRequest(BaseModel):
+    # Every product x turma x launch type x date combination (utm.md).
+    products: List[str]
+    turmas: List[str]
+    launch_types: List[str]
+    dates: List[str] # month-year, e.g. "07-24" or "0724"
+    create: List[str] = Field(default_factory=list) # generated slugs to save; empty = preview
+    names: Dict[str, str] = Field(default_factory=dict) # nome per slug (default: the slug)
+
+class GeneratedCampaign(BaseModel):
+    slug: str
+    product: str
+    turma: str
+    launch_type: str
+    date: str
+    exists: bool
+
+class CampaignGenerateResult(BaseModel):
+    campaigns: List[GeneratedCampaign]
+    created: List[str]
+
 class Product(BaseModel):
     slug: str
     nome: str
@@ -55,6 +76,7 @@ class LinkCreate(BaseModel):
     custom_params: Dict[str, str] = Field(default_factory=dict)
     notes: Optional[str] = None
     dynamic_fields: Dict[str, Any] = Field(default_factory=dict)
+    force_new: bool = False # create even if an identical link already exists
     # For Vendas mapping
     src: Optional[str] = None
     sck: Optional[str] = None
@@ -62,6 +84,7 @@ class LinkCreate(BaseModel):
 
 class Link(BaseModel):
     id: str # utm_id (lnk_000001)
+    short_code: Optional[str] = None # base62 of the id's counter; GET /r/{short_code}
     link_type: str # captacao or vendas
     base_url: str
     path: str
@@ -80,6 +103,114 @@ class Link(BaseModel):
     created_by: str
     created_at: datetime
     status: str = "active"
+    fingerprint: Optional[str] = None # hash of normalized inputs; None when forced
+    # Last destination check (POST /links/health-check); status None = no HTTP answer.
+    health_status: Optional[int] = None
+    health_ms: Optional[int] = None
+    health_error: Optional[str] = None
+    health_checked_at: Optional[datetime] = None
+
+class MatrixDestination(BaseModel):
+    base_url: str
+    path: Optional[str] = ""
+
+class LinkMatrixRequest(BaseModel):
+    utm_campaign: str
+    sources: List[str] # source_config slugs; mediums x contents come from their config
+    destinations: Dict[str, MatrixDestination] # keyed by link_type (captacao, vendas)
+    utm_term: Optional[str] = None
+    custom_params: Dict[str, str] = Field(default_factory=dict)
+    dynamic_fields: Dict[str, Any] = Field(default_factory=dict)
+    notes: Optional[str] = None
+    dry_run: bool = False
+    force_new: bool = False
+
+class LinkMatrixResult(BaseModel):
+    dry_run: bool
+    count: int
+    reused: int = 0 # combinations that matched an existing link
+    links: List[Link] = Field(default_factory=list)
+
+class LinkChanges(BaseModel):
+    token: int # pass back as ?since= on the next call
+    created: List[Link] = Field(default_factory=list) # created or rewritten since the token
+    deleted: List[str] = Field(default_factory=list)
+    reset: bool = False # client is too far behind and should reload /links
+
+class LinkBulkRequest(BaseModel):
+    action: Literal["delete", "archive"] # archive = soft delete (status flip)
+    ids: Optional[List[str]] = None
+    # Filters, combined with AND (and with `ids` when both are given).
+    utm_campaign: Optional[str] = None
+    utm_source: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class LinkRewriteRequest(BaseModel):
+    base_url: str # new destination
+    path: Optional[str] = None # None keeps each link's path
+    # Filters, combined with AND; at least utm_campaign or from_base_url.
+    utm_campaign: Optional[str] = None
+    utm_source: Optional[str] = None
+    link_type: Optional[str] = None
+    from_base_url: Optional[str] = None # only links currently pointing here
+    dry_run: bool = False
+
+class LinkRewriteResult(BaseModel):
+    dry_run: bool
+    matched: int
+    rewritten: int
+    batches: int = 0
+    token: Optional[int] = None # links change token after the last batch
+    sample: List[Dict[str, str]] = Field(default_factory=list) # id, old_url, new_url
+
+class LinkBulkResult(BaseModel):
+    action: str
+    matched: int
+    affected: int
+    token: Optional[int] = None # links change token after the write
+
+class AttributionRow(BaseModel):
+    conversions: int = 0
+    revenue: float = 0.0
+
+class LinkAttribution(AttributionRow):
+    link_id: str
+    utm_source: Optional[str] = None
+    utm_medium: Optional[str] = None
+    utm_content: Optional[str] = None
+
+class SourceAttribution(AttributionRow):
+    src: str
+    sck: str
+
+class CampaignAttribution(AttributionRow):
+    utm_campaign: str
+    top_links: List[LinkAttribution] = Field(default_factory=list)
+    top_sources: List[SourceAttribution] = Field(default_factory=list)
+
+class LinkHealthRequest(BaseModel):
+    utm_campaign: Optional[str] = None # None = links created in the last `days`
+    days: Optional[int] = Field(None, ge=1, le=90)
+
+class JobSubmit(BaseModel):
+    kind: str # registered job kind, e.g. links.bulk, links.matrix, links.archive
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str # queued, running, done, failed, cancelled
+    params: Dict[str, Any] = Field(default_factory=dict)
+    progress: int = 0
+    total: Optional[int] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class User(BaseModel):
     username: str
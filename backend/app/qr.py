@@ -0,0 +1,74 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Dict
+
+import segno
+from pydantic import BaseModel, Field
+
+# Rendered images, content-addressed: safe to share between workers and to delete.
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR", "qr_cache")
+# Max links per campaign ZIP.
+QR_BATCH_LIMIT = int(os.getenv("QR_BATCH_LIMIT", "5000"))
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+class QrOptions(BaseModel):
+    format: str = Field("png", pattern="^(png|svg)$")
+    scale: int = Field(10, ge=1, le=40) # pixels per module
+    border: int = Field(4, ge=0, le=10) # quiet zone, in modules
+    error: str = Field("m", pattern="^[lmqhLMQH]$") # error correction level
+
+
+def qr_key(full_url: str, options: QrOptions) -> str:
+    """Cache key: hash of the encoded URL plus every render option."""
+    canonical = json.dumps({"url": full_url, **options.model_dump(), "error": options.error.lower()}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class QrCache:
+    """Renders QR codes once per (full_url, options) and keeps them on disk."""
+
+    def __init__(self, directory: str = QR_CACHE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0}
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, full_url: str, options: QrOptions) -> bytes:
+        key = qr_key(full_url, options)
+        path = self.path(key, options.format)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            with self._lock:
+                self.stats["hits"] += 1
+            return data
+        except FileNotFoundError:
+            pass
+
+        out = io.BytesIO()
+        qr = segno.make(full_url, error=options.error.lower(), micro=False)
+        qr.save(out, kind=options.format, scale=options.scale, border=options.border)
+        data = out.getvalue()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name + rename: concurrent renders of one key never expose half a file.
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stats["renders"] += 1
+        return data
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+qr_cache = QrCache()
@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+
+# Timeout (s) of each HTTP call to Supabase; passed to the client as its deadline.
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "5"))
+# Extra attempts for reads (selects) that failed transiently; writes/RPCs never retry.
+SUPABASE_READ_RETRIES = int(os.getenv("SUPABASE_READ_RETRIES", "2"))
+SUPABASE_RETRY_BASE_MS = int(os.getenv("SUPABASE_RETRY_BASE_MS", "100"))
+# Consecutive transient failures that open the breaker, and how long it stays open.
+SUPABASE_BREAKER_FAILURES = int(os.getenv("SUPABASE_BREAKER_FAILURES", "5"))
+SUPABASE_BREAKER_RESET_SECONDS = float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "15"))
+
+# PostgREST/Postgres codes meaning "the backend is unhealthy", not "bad request":
+# connection/pool errors, statement timeout, shutdown, too many connections.
+TRANSIENT_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "57014", "57P01", "53300"}
+
+# Postgres unique_violation: a concurrent identical write got there first.
+UNIQUE_VIOLATION = "23505"
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class BackendUnavailable(Exception):
+    """Supabase is failing or the breaker is open; handlers answer 503."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = error.code
+        if code is None or code in TRANSIENT_CODES:
+            return True
+        # Non-JSON error bodies (proxies, Cloudflare) carry the HTTP status as code.
+        return isinstance(code, int) and code >= 500
+    return False
+
+
+def is_unique_violation(error: Exception) -> bool:
+    return isinstance(error, APIError) and error.code == UNIQUE_VIOLATION
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive transient failures -> half-open probe."""
+
+    def __init__(self, failure_threshold: int = SUPABASE_BREAKER_FAILURES, reset_seconds: float = SUPABASE_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self.stats = {"calls": 0, "failures": 0, "retries": 0, "rejected": 0, "opened": 0}
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def before_call(self):
+        """Raise BackendUnavailable instead of calling while the breaker is open."""
+        with self._lock:
+            self.stats["calls"] += 1
+            if self.state == OPEN and self.retry_after() <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if not self._probing:
+                    self._probing = True
+                    return
+            if self.state != CLOSED:
+                self.stats["rejected"] += 1
+                raise BackendUnavailable("Database temporarily unavailable", self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                print("Supabase circuit breaker closed")
+            self.state = CLOSED
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.stats["opened"] += 1
+                    print(f"Supabase circuit breaker open for {self.reset_seconds}s")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_after": round(self.retry_after(), 2) if self.state == OPEN else 0,
+                **self.stats,
+            }
+
+
+class ResilientQuery:
+    """Wraps a postgrest request builder; `execute()` goes through the breaker."""
+
+    def __init__(self, builder: Any, client: "ResilientClient", read: Optional[bool] = None):
+        self._builder = builder
+        self._client = client
+        self._read = read
+
+    def _wrap(self, name: str, result: Any) -> Any:
+        if not hasattr(result, "execute"):
+            return result
+        read = self._read
+        if read is None and name in ("select", "insert", "upsert", "update", "delete"):
+            read = name == "select"
+        return ResilientQuery(result, self._client, read)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return self._wrap(name, attr)
+        return lambda *args, **kwargs: self._wrap(name, attr(*args, **kwargs))
+
+    def execute(self) -> Any:
+        builder = self._builder
+        if hasattr(builder, "retry"):
+            # Retries are ours (bounded, jittered, reads only).
+            builder = builder.retry(False)
+        return self._client.call(builder.execute, retries=SUPABASE_READ_RETRIES if self._read else 0)
+
+
+class ResilientClient:
+    """Supabase client proxy adding retries for reads and a circuit breaker."""
+
+    def __init__(self, client: Any, breaker: Optional[CircuitBreaker] = None):
+        self._client = client
+        self.breaker = breaker or CircuitBreaker()
+
+    def table(self, name: str) -> ResilientQuery:
+        return ResilientQuery(self._client.table(name), self)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> ResilientQuery:
+        return ResilientQuery(self._client.rpc(fn, params or {}, **kwargs), self, read=False)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def call(self, fn, retries: int = 0) -> Any:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    # The backend answered; a bad request says nothing about its health.
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= retries:
+                    raise BackendUnavailable(f"Database call failed: {e}", self.breaker.retry_after()) from e
+                attempt += 1
+                self.breaker.stats["retries"] += 1
+                # Full jitter keeps a burst of retrying workers from synchronizing.
+                time.sleep(random.uniform(0, SUPABASE_RETRY_BASE_MS * (2 ** attempt)) / 1000.0)
+                continue
+            self.breaker.record_success()
+            return result
+
+
+supabase_breaker = CircuitBreaker()
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Per-key counters kept for /metrics; least recently used keys are dropped.
+MAX_TRACKED_KEYS = 256
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Concurrent callers of `do` with the same key share one execution of `fn`.
+
+    The first caller runs the read; the others block until it finishes and get
+    the same result (or exception). Nothing is kept once the call completes,
+    so this only merges overlapping requests; caching is TableCache's job.
+    """
+
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self.calls = 0
+        self.merged = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: Optional[str] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(label or str(key), leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def _count(self, label: str, leader: bool):
+        stats = self._stats.pop(label, None) or {"calls": 0, "merged": 0}
+        self._stats[label] = stats
+        while len(self._stats) > self.max_keys:
+            self._stats.popitem(last=False)
+        if leader:
+            stats["calls"] += 1
+            self.calls += 1
+        else:
+            stats["merged"] += 1
+            self.merged += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "merged": self.merged,
+                "in_flight": len(self._calls),
+                "keys": {label: dict(stats) for label, stats in self._stats.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.calls = 0
+            self.merged = 0
+
+
+read_flight = SingleFlight()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .cache import table_caches, version_watcher
+
+# Local copy of the reference tables, loaded at startup so a new process can
+# serve the generator UI before (or without) reaching Supabase.
+REFERENCE_SNAPSHOT_PATH = os.getenv("REFERENCE_SNAPSHOT_PATH", "reference_snapshot.json")
+# Seconds between background reconcile + snapshot runs; 0 disables the job.
+REFERENCE_SNAPSHOT_SECONDS = int(os.getenv("REFERENCE_SNAPSHOT_SECONDS", "300"))
+REFERENCE_TABLES = ("source_configs", "products", "turmas", "launch_types", "launches")
+SNAPSHOT_FORMAT = 1
+
+
+def load_snapshot(path: str = None) -> Dict[str, int]:
+    """Prime the reference caches from the snapshot file; returns the loaded versions."""
+    path = path or REFERENCE_SNAPSHOT_PATH
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable reference snapshot {path}: {e}")
+        return {}
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        print(f"Ignoring reference snapshot {path}: unknown format {snapshot.get('format')}")
+        return {}
+
+    versions = {}
+    for table, entry in (snapshot.get("tables") or {}).items():
+        if table in REFERENCE_TABLES and entry.get("version") is not None:
+            table_caches[table].prime(entry["version"], entry["rows"])
+            versions[table] = entry["version"]
+    version_watcher.seed(versions)
+    print(f"Loaded reference snapshot from {snapshot.get('written_at')}: {versions}")
+    return versions
+
+
+def write_snapshot(db, path: str = None) -> Optional[Dict[str, int]]:
+    """Write the current reference rows (through the caches) atomically to disk."""
+    path = path or REFERENCE_SNAPSHOT_PATH
+    tables: Dict[str, Any] = {}
+    for table in REFERENCE_TABLES:
+        version = version_watcher.version(db, table)
+        if version is None:
+            # Unknown version (database unreachable): keep the previous file.
+            return None
+        rows = table_caches[table].get(db, lambda: db.table(table).select("*").execute().data)
+        tables[table] = {"version": version, "rows": rows}
+
+    snapshot = {"format": SNAPSHOT_FORMAT, "written_at": datetime.utcnow().isoformat(), "tables": tables}
+    # One temp file per writer (same directory, so the rename stays atomic):
+    # workers snapshotting at once never interleave into a shared file.
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".",
+        suffix=".tmp", delete=False, encoding="utf-8",
+    ) as f:
+        json.dump(snapshot, f, ensure_ascii=False, default=str)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+    return {table: entry["version"] for table, entry in tables.items()}
+
+
+class ReferenceSnapshotter:
+    """Background job: reconcile the reference caches with Supabase and re-snapshot."""
+
+    def __init__(self, interval_seconds: int = REFERENCE_SNAPSHOT_SECONDS):
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.written: Optional[Dict[str, int]] = None
+
+    def start(self, get_db):
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(get_db))
+
+    def run_once(self, db):
+        version_watcher.refresh(db)
+        versions = {table: version_watcher.version(db, table) for table in REFERENCE_TABLES}
+        if versions != self.written:
+            self.written = write_snapshot(db) or self.written
+
+    async def _run(self, get_db):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once, get_db())
+            except Exception as e:
+                print(f"Reference snapshot failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+reference_snapshotter = ReferenceSnapshotter()
@@ -1,9 +1,13 @@
 import re
+import json
+import hashlib
 import unicodedata
-from urllib.parse import urlencode
-from typing import Dict, Any, Tuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from typing import Dict, Any, List, Tuple, Optional
 import uuid
 
+from .resilience import BackendUnavailable
+
 def slugger(text: str) -> str:
     """Normalize text to slug format: lowercase, no accents, underscores/hyphens."""
     if not text:
@@ -62,25 +66,27 @@ def normalize_utm_term(text: str) -> str:
 
     return "_".join(parts)
 
+# Query keys the generator sets itself (build_tracking_params); reserved in custom params.
+TRACKING_PARAMS = frozenset({
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_content",
+    "utm_term",
+    "utm_id",
+    "src",
+    "sck",
+    "xcode",
+})
+
 def sanitize_custom_params(custom_params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Drop reserved tracking keys from custom params to enforce governance."""
     if not custom_params:
         return {}
 
-    reserved = {
-        "utm_source",
-        "utm_medium",
-        "utm_campaign",
-        "utm_content",
-        "utm_term",
-        "utm_id",
-        "src",
-        "sck",
-        "xcode",
-    }
     out: Dict[str, Any] = {}
     for key, value in custom_params.items():
-        if key.lower() in reserved:
+        if key.lower() in TRACKING_PARAMS:
             continue
         out[key] = value
     return out
@@ -112,6 +118,36 @@ def build_full_url(base_url: str, path: str, utm_params: Dict[str, Any], custom_
     separator = "&" if "?" in final_base else "?"
     return f"{final_base}{separator}{query_string}"
 
+def rebuild_full_url(full_url: str, old_base_url: str, old_path: str, base_url: str, path: str) -> str:
+    """Move a stored link to a new base_url/path, keeping its tracking params as distributed."""
+    inherited = set(parse_qsl(urlsplit(build_full_url(old_base_url or "", old_path or "", {}, {})).query, keep_blank_values=True))
+    params = {k: v for k, v in parse_qsl(urlsplit(full_url).query, keep_blank_values=True) if (k, v) not in inherited}
+    return build_full_url(base_url, path, params, {})
+
+def link_fingerprint(
+    link_type: str,
+    base_url: str,
+    path: str,
+    utm_source: str,
+    utm_medium: str,
+    utm_campaign: str,
+    utm_content: str,
+    utm_term: str,
+    custom_params: Dict[str, Any]
+) -> str:
+    """Stable hash of the normalized inputs that define a link (its id excluded)."""
+    canonical = json.dumps(
+        {
+            "link_type": link_type or "captacao",
+            "destination": build_full_url(base_url, path, {}, {}),
+            "utm": [utm_source, utm_medium, utm_campaign, utm_content or "", utm_term or ""],
+            "params": sorted([str(k), str(v)] for k, v in (custom_params or {}).items()),
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 def build_tracking_params(
     link_type: str,
     utm_source: str,
@@ -149,6 +185,56 @@ def build_tracking_params(
 
     return params, src, sck, xcode
 
+# Short codes: the link counter in base62 (lnk_000123 <-> "1z"). Reversible,
+# so resolving a code is arithmetic plus a primary key lookup.
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE62_VALUES = {char: value for value, char in enumerate(BASE62_ALPHABET)}
+# 11 base62 digits cover every bigint counter value.
+SHORT_CODE_MAX_LENGTH = 11
+SHORT_CODE_MAX_VALUE = 2**63 - 1
+LINK_ID_RE = re.compile(r"^lnk_(\d+)$")
+
+def encode_short_code(n: int) -> str:
+    """Base62 of a non-negative counter value."""
+    if n < 0:
+        raise ValueError("short codes encode non-negative counters")
+    if n == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while n:
+        n, rem = divmod(n, 62)
+        digits.append(BASE62_ALPHABET[rem])
+    return "".join(reversed(digits))
+
+def decode_short_code(code: str) -> int:
+    """Counter value of a short code; ValueError when it is not one.
+
+    Only the canonical encoding is accepted (no leading zeros, at most a
+    bigint), so each link has exactly one code.
+    """
+    if not code or len(code) > SHORT_CODE_MAX_LENGTH or (code[0] == "0" and code != "0"):
+        raise ValueError(f"invalid short code: {code!r}")
+    n = 0
+    try:
+        for char in code:
+            n = n * 62 + BASE62_VALUES[char]
+    except KeyError:
+        raise ValueError(f"invalid short code: {code!r}") from None
+    if n > SHORT_CODE_MAX_VALUE:
+        raise ValueError(f"invalid short code: {code!r}")
+    return n
+
+def link_id_for(counter: int) -> str:
+    return f"lnk_{counter:06d}"
+
+def short_code_for(link_id: str) -> Optional[str]:
+    """Short code of a counter-based id; None for any other id."""
+    match = LINK_ID_RE.match(link_id or "")
+    return encode_short_code(int(match.group(1))) if match else None
+
+def link_id_from_short_code(code: str) -> str:
+    return link_id_for(decode_short_code(code))
+
 def generate_utm_id(db) -> str:
     """Generate a unique ID for a link (e.g. lnk_000123)."""
     # db is the supabase client
@@ -163,7 +249,7 @@ def generate_utm_id(db) -> str:
                 new_count = int(rpc_response.data[0])
             else:
                 new_count = int(rpc_response.data)
-            return f"lnk_{new_count:06d}"
+            return link_id_for(new_count)
 
         # Fallback path if RPC is unavailable.
         response = db.table("settings").select("count").eq("id", "link_counter").execute()
@@ -175,8 +261,31 @@ def generate_utm_id(db) -> str:
             new_count = 1
             db.table("settings").insert({"id": "link_counter", "count": new_count}).execute()
 
-        return f"lnk_{new_count:06d}"
+        return link_id_for(new_count)
 
     except Exception as e:
+        # No random fallback: ids must stay sequential (they double as xcode).
         print(f"ID Generation failed: {e}")
-        return f"lnk_{uuid.uuid4().hex[:6]}"
+        raise
+
+def generate_utm_ids(db, count: int) -> List[str]:
+    """Reserve `count` consecutive link IDs with a single counter increment."""
+    if count <= 0:
+        return []
+    if db is None:
+        return [generate_utm_id(db) for _ in range(count)]
+
+    try:
+        rpc_response = db.rpc("increment_link_counter_by", {"row_id": "link_counter", "amount": count}).execute()
+        data = rpc_response.data
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if data is not None:
+            last = int(data)
+            return [link_id_for(n) for n in range(last - count + 1, last + 1)]
+    except BackendUnavailable:
+        raise
+    except Exception as e:
+        print(f"Bulk ID reservation failed, falling back to single increments: {e}")
+
+    return [generate_utm_id(db) for _ in range(count)]
@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, Optional
+import hashlib
+
+from fastapi import Request, Response
+
+# Per-table change counters live in the `settings` table next to link_counter,
+# e.g. {"id": "version:links", "count": 42}.
+VERSION_PREFIX = "version:"
+
+
+def version_key(table: str) -> str:
+    return f"{VERSION_PREFIX}{table}"
+
+
+def get_table_versions(db, tables: Iterable[str]) -> Dict[str, Optional[int]]:
+    """Read the change counters of several tables with a single query.
+
+    Tables that were never written have version 0; None means the read failed.
+    """
+    tables = list(tables)
+    if db is None or not tables:
+        return {t: None for t in tables}
+    try:
+        res = db.table("settings").select("id,count").in_("id", [version_key(t) for t in tables]).execute()
+    except Exception as e:
+        print(f"Error reading table versions: {e}")
+        return {t: None for t in tables}
+    versions: Dict[str, Optional[int]] = {t: 0 for t in tables}
+    for row in res.data or []:
+        table = row["id"][len(VERSION_PREFIX):]
+        versions[table] = int(row.get("count") or 0)
+    return versions
+
+
+def get_table_version(db, table: str) -> Optional[int]:
+    return get_table_versions(db, [table])[table]
+
+
+def bump_table_version(db, table: str) -> Optional[int]:
+    """Atomically increment the change counter of a table after a write."""
+    if db is None:
+        return None
+    try:
+        # Same atomic RPC used for link ids; it works on any settings row.
+        res = db.rpc("increment_link_counter", {"row_id": version_key(table)}).execute()
+        data = res.data
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return int(data) if data is not None else None
+    except Exception as e:
+        print(f"Error bumping version for {table}: {e}")
+        return None
+
+
+def make_etag(table: str, version: Optional[int], *parts: Optional[str]) -> Optional[str]:
+    """Build a weak ETag from a table version and optional request variants."""
+    if version is None:
+        return None
+    tag = f"{table}-{version}"
+    if any(parts):
+        digest = hashlib.sha1("|".join(p or "" for p in parts).encode("utf-8")).hexdigest()[:12]
+        tag = f"{tag}-{digest}"
+    return f'W/"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are considered equal.
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """Return a bare 304 when the client already holds `etag`, else tag `response`."""
+    if etag is None:
+        return None
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
@@ -0,0 +1,60 @@
+"""Benchmark of the base62 short-code encoding against the lnk_ id format.
+
+Usage:
+    python -m backend.bench_short_codes --count 100000 --repeat 5
+
+Reports the best-of-`repeat` cost per call (ns) of encoding a counter,
+decoding a code and the full id <-> code round trips used by the redirect,
+next to formatting/parsing a zero-padded `lnk_` id as the baseline, plus
+code lengths at a few counter sizes.
+"""
+import argparse
+import random
+import timeit
+
+from backend.app.utils import (
+    decode_short_code,
+    encode_short_code,
+    link_id_for,
+    link_id_from_short_code,
+    short_code_for,
+)
+
+
+def bench(label: str, fn, inputs: list, repeat: int):
+    def run():
+        for value in inputs:
+            fn(value)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    print(f"{label:<34} {best / len(inputs) * 1e9:8.0f} ns/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-counter", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    counters = [rng.randint(1, args.max_counter) for _ in range(args.count)]
+    codes = [encode_short_code(n) for n in counters]
+    ids = [link_id_for(n) for n in counters]
+    assert all(decode_short_code(c) == n for c, n in zip(codes, counters))
+
+    print(f"{args.count} counters in [1, {args.max_counter}], best of {args.repeat}")
+    bench("encode_short_code(counter)", encode_short_code, counters, args.repeat)
+    bench("decode_short_code(code)", decode_short_code, codes, args.repeat)
+    bench("short_code_for(lnk_ id)", short_code_for, ids, args.repeat)
+    bench("link_id_from_short_code(code)", link_id_from_short_code, codes, args.repeat)
+    bench("baseline: link_id_for(counter)", link_id_for, counters, args.repeat)
+    bench("baseline: int(lnk_ id[4:])", lambda link_id: int(link_id[4:]), ids, args.repeat)
+
+    print()
+    for n in (999_999, 10**7, 10**9, 2**63 - 1):
+        print(f"counter {n:>19}: id {len(link_id_for(n)):>2} chars, code {len(encode_short_code(n)):>2} chars")
+
+
+if __name__ == "__main__":
+    main()
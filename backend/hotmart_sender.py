@@ -0,0 +1,80 @@
+"""Local stand-in for Hotmart: fires purchase webhooks at the API for load testing.
+
+Usage:
+    python backend/hotmart_sender.py --url http://localhost:8000/webhooks/hotmart \
+        --events 5000 --concurrency 100 --xcodes lnk_000001,lnk_000002
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+
+def build_payload(xcode: str) -> dict:
+    transaction = f"HP{uuid.uuid4().hex[:12].upper()}"
+    return {
+        "id": str(uuid.uuid4()),
+        "event": "PURCHASE_APPROVED",
+        "version": "2.0.0",
+        "creation_date": int(time.time() * 1000),
+        "data": {
+            "product": {"id": 123456, "name": "Produto Teste"},
+            "purchase": {
+                "transaction": transaction,
+                "status": "APPROVED",
+                "approved_date": int(time.time() * 1000),
+                "price": {"value": random.choice([97.0, 197.0, 297.0, 497.0]), "currency_value": "BRL"},
+                "origin": {"xcod": xcode, "src": "whatsapp_grupos_antigos", "sck": "api_disparos"},
+            },
+        },
+    }
+
+
+async def run(url: str, events: int, concurrency: int, xcodes: list, hottok: str):
+    headers = {"X-HOTMART-HOTTOK": hottok} if hottok else {}
+    latencies = []
+    statuses = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(events):
+        queue.put_nowait(build_payload(random.choice(xcodes)))
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            payload = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                resp = await client.post(url, json=payload, headers=headers)
+                code = resp.status_code
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"Sent {events} events in {elapsed:.2f}s ({events / elapsed:.0f}/s, {events / elapsed * 60:.0f}/min)")
+    print(f"Statuses: {statuses}")
+    print(f"Latency ms: p50={pct(0.5):.1f} p95={pct(0.95):.1f} p99={pct(0.99):.1f} max={latencies[-1] * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/hotmart")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--xcodes", default="lnk_000001", help="comma-separated xcodes to attribute sales to")
+    parser.add_argument("--hottok", default=os.getenv("HOTMART_HOTTOK", ""), help="value for X-HOTMART-HOTTOK (default: $HOTMART_HOTTOK)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.events, args.concurrency, args.xcodes.split(","), args.hottok))
@@ -0,0 +1,17 @@
+-- Indexes for the GET /links access paths (safe to re-run).
+-- list_links filters on any mix of utm_campaign, utm_source, utm_medium and
+-- link_type, then sorts by created_at desc with a limit: each filter column
+-- gets a (column, created_at desc) index so the planner can walk one in order
+-- and stop early; unfiltered lists (and the archive mover) use created_at.
+-- Checked by backend/tests/test_query_plans.py.
+create index if not exists links_created_at_idx on public.links (created_at desc);
+create index if not exists links_campaign_created_idx on public.links (utm_campaign, created_at desc);
+create index if not exists links_source_created_idx on public.links (utm_source, created_at desc);
+create index if not exists links_medium_created_idx on public.links (utm_medium, created_at desc);
+create index if not exists links_type_created_idx on public.links (link_type, created_at desc);
+
+-- Conversion attribution resolves xcode -> link in batches.
+create index if not exists links_xcode_idx on public.links (xcode);
+
+-- Per-link audit lookups and deletes.
+create index if not exists audits_link_id_idx on public.audits (link_id);
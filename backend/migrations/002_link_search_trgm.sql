@@ -0,0 +1,10 @@
+-- Trigram search index for GET /links?q= (safe to re-run).
+-- search_links() (schema.sql) matches a lowercased substring of
+-- link_search_text(id, campaign, content, term, notes) and orders by word
+-- distance; a GiST trigram index serves both the like filter and the ordering,
+-- so ranked pages stop after page_offset + page_size entries instead of
+-- sorting every match. Run the link_search_text/search_links function blocks
+-- from schema.sql first. Checked by backend/tests/test_query_plans.py.
+create extension if not exists pg_trgm;
+create index if not exists links_search_trgm_idx on public.links
+  using gist (link_search_text(id, utm_campaign, utm_content, utm_term, notes) gist_trgm_ops);
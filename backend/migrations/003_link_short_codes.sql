@@ -0,0 +1,33 @@
+-- Short codes for links created before the short_code column (safe to re-run).
+-- New links get theirs from the API (utils.encode_short_code): base62 of the
+-- lnk_ counter, same alphabet as below. Backfills the hot table and the
+-- archive (same column order as links), then adds the unique index.
+alter table public.links add column if not exists short_code text;
+alter table public.links_archive add column if not exists short_code text;
+
+create or replace function base62_encode(n bigint)
+returns text
+language plpgsql
+immutable
+as $$
+declare
+  alphabet constant text := '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz';
+  code text := '';
+begin
+  if n = 0 then
+    return '0';
+  end if;
+  while n > 0 loop
+    code := substr(alphabet, (n % 62)::integer + 1, 1) || code;
+    n := n / 62;
+  end loop;
+  return code;
+end;
+$$;
+
+update public.links set short_code = base62_encode(substring(id from 5)::bigint)
+where short_code is null and id ~ '^lnk_[0-9]+$';
+update public.links_archive set short_code = base62_encode(substring(id from 5)::bigint)
+where short_code is null and id ~ '^lnk_[0-9]+$';
+
+create unique index if not exists links_short_code_key on public.links (short_code);
@@ -0,0 +1,23 @@
+-- Atomic version bump + audit insert for link writes (safe to re-run).
+-- Same definition as backend/schema.sql; the API calls it instead of
+-- increment_link_counter('version:links') followed by a separate audits insert.
+create or replace function record_link_changes(link_ids text[], change_action text)
+returns integer
+language plpgsql
+as $$
+declare
+  new_seq integer;
+begin
+  insert into public.settings (id, count)
+  values ('version:links', 1)
+  on conflict (id) do update
+  set count = settings.count + 1
+  returning count into new_seq;
+
+  insert into public.audits (event_id, link_id, actor, action, seq)
+  select gen_random_uuid()::text, link_id, 'system_user', change_action, new_seq
+  from unnest(link_ids) as link_id;
+
+  return new_seq;
+end;
+$$;
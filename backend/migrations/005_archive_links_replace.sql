@@ -0,0 +1,31 @@
+-- archive_links no longer loses rows whose id is already in links_archive
+-- (safe to re-run; superseded by 006_archive_links_ids.sql).
+drop function if exists archive_links(timestamp with time zone, integer);
+create or replace function archive_links(cutoff timestamp with time zone, batch_size integer)
+returns integer
+language plpgsql
+as $$
+declare
+  picked text[];
+  moved integer;
+begin
+  select array_agg(id) into picked
+  from (
+    select id from public.links
+    where created_at < cutoff
+    order by created_at
+    limit batch_size
+    for update skip locked
+  ) p;
+  if picked is null then
+    return 0;
+  end if;
+
+  delete from public.links_archive where id = any(picked);
+  insert into public.links_archive select l.* from public.links l where l.id = any(picked);
+  delete from public.links where id = any(picked);
+
+  get diagnostics moved = row_count;
+  return moved;
+end;
+$$;
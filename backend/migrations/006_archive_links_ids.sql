@@ -0,0 +1,33 @@
+-- archive_links returns the moved ids (text[]) instead of a count, so the API
+-- can audit them as "archive" changes. Same definition as backend/schema.sql;
+-- the return type changes, so the old function is dropped first.
+drop function if exists archive_links(timestamp with time zone, integer);
+create or replace function archive_links(cutoff timestamp with time zone, batch_size integer)
+returns text[]
+language plpgsql
+as $$
+declare
+  picked text[];
+  moved text[];
+begin
+  select array_agg(id) into picked
+  from (
+    select id from public.links
+    where created_at < cutoff
+    order by created_at
+    limit batch_size
+    for update skip locked
+  ) p;
+  if picked is null then
+    return '{}';
+  end if;
+
+  delete from public.links_archive where id = any(picked);
+  insert into public.links_archive select l.* from public.links l where l.id = any(picked);
+  with gone as (
+    delete from public.links where id = any(picked) returning id
+  )
+  select coalesce(array_agg(id), '{}') into moved from gone;
+  return moved;
+end;
+$$;
@@ -0,0 +1,218 @@
+"""Local stand-in for Supabase's PostgREST API, for offline end-to-end and load tests.
+
+Implements the subset of the REST/RPC protocol the backend uses (select with
+filters/order/limit/count, insert, upsert, update, delete, rpc) over the
+in-memory store in backend/app/local_store.py, with optional latency and
+error injection.
+
+Usage:
+    python backend/postgrest_standin.py --port 54321 --latency-ms 20 --jitter-ms 10 --error-rate 0.01
+
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=standin uvicorn backend.app.main:app
+
+Injection settings can be changed while running:
+    curl -X POST localhost:54321/_standin/config -d '{"latency_ms": 200, "error_rate": 0.5}'
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.local_store import LocalStore, StoreError, parse_filter  # noqa: E402
+
+# Query parameters that are not column filters.
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class StandinConfig:
+    """Latency/error injection shared by all request threads."""
+
+    FIELDS = ("latency_ms", "jitter_ms", "error_rate", "error_status")
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, error_status: int = 503):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_errors": 0}
+
+    def update(self, values: Dict[str, Any]):
+        with self.lock:
+            for field in self.FIELDS:
+                if field in values:
+                    setattr(self, field, type(getattr(self, field))(values[field]))
+
+    def to_json(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**{field: getattr(self, field) for field in self.FIELDS}, **self.stats}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: LocalStore = None
+    config: StandinConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # Routing
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method: str):
+        url = urlsplit(self.path)
+        body = self._read_body()
+        if url.path == "/_standin/config":
+            if method == "POST":
+                self.config.update(body or {})
+            return self._send(200, self.config.to_json())
+
+        parts = [p for p in url.path.split("/") if p]
+        if len(parts) < 3 or parts[:2] != ["rest", "v1"]:
+            return self._send(404, {"code": "PGRST000", "message": f"unknown path {url.path}", "details": None, "hint": None})
+
+        with self.config.lock:
+            self.config.stats["requests"] += 1
+            latency = self.config.latency_ms + random.uniform(0, self.config.jitter_ms)
+            fail = random.random() < self.config.error_rate
+            if fail:
+                self.config.stats["injected_errors"] += 1
+            error_status = self.config.error_status
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+        if fail:
+            return self._send(error_status, {"code": "PGRST000", "message": "injected failure", "details": None, "hint": None})
+
+        params = parse_qsl(url.query, keep_blank_values=True)
+        prefer = self._prefer()
+        try:
+            if parts[2] == "rpc" and len(parts) == 4:
+                if method not in ("POST", "GET"):
+                    raise StoreError(405, "PGRST000", "rpc needs POST")
+                args = body if method == "POST" else {k: v for k, v in params}
+                return self._send(200, self.store.rpc(parts[3], args or {}))
+            return self._table(method, parts[2], params, prefer, body)
+        except StoreError as e:
+            return self._send(e.status, e.to_json())
+
+    def _table(self, method: str, table: str, params, prefer: Dict[str, str], body: Any):
+        options = {k: v for k, v in params if k in RESERVED_PARAMS}
+        filters = [parse_filter(k, v) for k, v in params if k not in RESERVED_PARAMS]
+        columns = options.get("select", "*")
+        columns = None if columns in ("", "*") else [c.strip('"') for c in columns.split(",")]
+
+        if method in ("GET", "HEAD"):
+            limit = int(options["limit"]) if "limit" in options else None
+            rows, total = self.store.select(
+                table, filters, columns, options.get("order"), limit, int(options.get("offset", 0))
+            )
+            headers = {"Content-Range": self._content_range(len(rows), total, prefer)}
+            return self._send(200, [] if method == "HEAD" else rows, headers)
+
+        if method == "POST":
+            rows = body if isinstance(body, list) else [body]
+            resolution = prefer.get("resolution")
+            written = self.store.insert(
+                table,
+                rows,
+                upsert=resolution is not None,
+                on_conflict=options.get("on_conflict"),
+                ignore_duplicates=resolution == "ignore-duplicates",
+            )
+            return self._send_written(201, written, prefer)
+
+        if method == "PATCH":
+            return self._send_written(200, self.store.update(table, filters, body or {}), prefer)
+
+        if method == "DELETE":
+            return self._send_written(200, self.store.delete(table, filters), prefer)
+
+        raise StoreError(405, "PGRST000", f"method {method} not supported")
+
+    # Helpers
+
+    def _read_body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def _prefer(self) -> Dict[str, str]:
+        prefer = {}
+        for item in self.headers.get("Prefer", "").split(","):
+            key, _, value = item.strip().partition("=")
+            if key:
+                prefer[key] = value
+        return prefer
+
+    @staticmethod
+    def _content_range(returned: int, total: int, prefer: Dict[str, str]) -> str:
+        span = f"0-{returned - 1}" if returned else "*"
+        return f"{span}/{total if 'count' in prefer else '*'}"
+
+    def _send_written(self, status: int, rows, prefer: Dict[str, str]):
+        headers = {"Content-Range": self._content_range(len(rows), len(rows), prefer)}
+        if prefer.get("return") == "representation":
+            return self._send(status, rows, headers)
+        return self._send(204 if status == 200 else status, None, headers)
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        data = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+
+def serve(host: str = "127.0.0.1", port: int = 54321, store: Optional[LocalStore] = None, config: Optional[StandinConfig] = None) -> ThreadingHTTPServer:
+    """Build the server (port 0 picks a free one); call serve_forever() to run it."""
+    handler = type("BoundStandinHandler", (StandinHandler,), {
+        "store": store or LocalStore(),
+        "config": config or StandinConfig(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0, help="fixed delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra uniform random delay")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, config=StandinConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status))
+    print(f"PostgREST stand-in on http://{args.host}:{server.server_port} (SUPABASE_URL), any SUPABASE_KEY")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,7 @@
 -- Enable UUID extension
 create extension if not exists "uuid-ossp";
+-- Trigram indexes for link search (GET /links?q=)
+create extension if not exists pg_trgm;
 
 -- 1. Users Table
 create table public.users (
@@ -51,6 +53,8 @@ create table public.launches (
 );
 
 -- 7. Settings (for global counters)
+-- Besides 'link_counter', rows 'version:<table>' hold per-table change counters
+-- used as ETags by the list endpoints.
 create table public.settings (
   id text primary key,
   count integer default 0
@@ -74,18 +78,183 @@ create table public.links (
   custom_params jsonb,
   notes text,
   created_by text,
-  created_at timestamp with time zone default timezone('utc'::text, now())
+  created_at timestamp with time zone default timezone('utc'::text, now()),
+  fingerprint text, -- sha256 of normalized inputs; null when created with force_new
+  status text not null default 'active' check (status in ('active', 'archived')),
+  archived_at timestamp with time zone,
+  -- Last destination check (POST /links/health-check); status null = no HTTP answer.
+  health_status integer,
+  health_ms integer,
+  health_error text,
+  health_checked_at timestamp with time zone,
+  short_code text -- base62 of the id's counter (GET /r/{short_code})
 );
 
+-- Identical generate requests resolve to the existing link in one lookup.
+create unique index links_fingerprint_key on public.links (fingerprint) where fingerprint is not null;
+
+-- Filter/sort indexes for GET /links: see migrations/001_link_filter_indexes.sql.
+create index links_created_at_idx on public.links (created_at desc);
+create index links_campaign_created_idx on public.links (utm_campaign, created_at desc);
+create index links_source_created_idx on public.links (utm_source, created_at desc);
+create index links_medium_created_idx on public.links (utm_medium, created_at desc);
+create index links_type_created_idx on public.links (link_type, created_at desc);
+create index links_xcode_idx on public.links (xcode);
+create unique index links_short_code_key on public.links (short_code);
+
+-- Text matched by GET /links?q= (see search_links below), lowercased.
+create or replace function link_search_text(id text, utm_campaign text, utm_content text, utm_term text, notes text)
+returns text
+language sql
+immutable
+as $$
+  select lower(id || ' ' || coalesce(utm_campaign, '') || ' ' || coalesce(utm_content, '') || ' '
+    || coalesce(utm_term, '') || ' ' || coalesce(notes, ''));
+$$;
+
+-- Search index: see migrations/002_link_search_trgm.sql.
+create index links_search_trgm_idx on public.links
+  using gist (link_search_text(id, utm_campaign, utm_content, utm_term, notes) gist_trgm_ops);
+
+-- 8b. Links archive (cold storage)
+-- Same columns as links; rows older than LINK_ARCHIVE_AFTER_DAYS are moved here
+-- by archive_links() so the hot table (and every list query) stays small.
+-- Archived links are still resolved by id/xcode and included in exports.
+-- archive_links() copies rows positionally: add new links columns here too, in the same order.
+create table public.links_archive (like public.links including defaults);
+alter table public.links_archive add primary key (id);
+
+create index links_archive_xcode_idx on public.links_archive (xcode);
+create index links_archive_campaign_idx on public.links_archive (utm_campaign, created_at desc);
+
 -- 9. Audits
+-- Kept after the link is deleted (no FK) so delete events feed GET /links/changes.
+-- seq is the 'version:links' counter value of the write (the delta-sync token).
 create table public.audits (
   event_id text primary key,
-  link_id text references public.links(id),
+  link_id text,
   actor text,
   action text,
+  seq bigint,
   timestamp timestamp with time zone default timezone('utc'::text, now())
 );
 
+create index audits_seq_idx on public.audits (seq);
+create index audits_link_id_idx on public.audits (link_id);
+
+-- 10. Conversions (Hotmart purchase webhooks, matched to links by xcode)
+create table public.conversions (
+  event_id text primary key, -- Hotmart delivery id; retries are ignored
+  event text, -- e.g. PURCHASE_APPROVED, PURCHASE_REFUNDED
+  transaction text,
+  status text,
+  xcode text,
+  src text,
+  sck text,
+  link_id text, -- resolved from xcode; null when no link matched
+  utm_campaign text,
+  amount numeric(12, 2),
+  currency text,
+  product_id text,
+  occurred_at timestamp with time zone,
+  received_at timestamp with time zone default timezone('utc'::text, now())
+);
+
+create index conversions_link_id_idx on public.conversions (link_id);
+create index conversions_transaction_idx on public.conversions (transaction);
+
+-- 11. Attribution rollups, maintained by trigger on conversions insert.
+-- One row per (campaign, dimension, key): dimension 'campaign' (key ''),
+-- 'link' (key = link id) or 'source' (key = 'src|sck').
+create table public.attribution_rollups (
+  utm_campaign text not null,
+  dimension text not null check (dimension in ('campaign', 'link', 'source')),
+  dim_key text not null,
+  conversions integer not null default 0,
+  revenue numeric(14, 2) not null default 0,
+  updated_at timestamp with time zone default timezone('utc'::text, now()),
+  primary key (utm_campaign, dimension, dim_key)
+);
+
+-- Top-N per campaign is a bounded index range scan.
+create index attribution_rollups_revenue_idx on public.attribution_rollups (utm_campaign, dimension, revenue desc);
+create index attribution_rollups_conversions_idx on public.attribution_rollups (utm_campaign, dimension, conversions desc);
+
+create or replace function apply_conversion_rollup()
+returns trigger
+language plpgsql
+as $$
+declare
+  delta integer;
+begin
+  -- Unmatched sales cannot be attributed to a campaign.
+  if new.utm_campaign is null then
+    return new;
+  end if;
+
+  delta := case
+    when new.event = 'PURCHASE_APPROVED' then 1
+    when new.event in ('PURCHASE_REFUNDED', 'PURCHASE_CHARGEBACK') then -1
+    else 0
+  end;
+  if delta = 0 then
+    return new;
+  end if;
+
+  insert into public.attribution_rollups as r (utm_campaign, dimension, dim_key, conversions, revenue)
+  values
+    (new.utm_campaign, 'campaign', '', delta, delta * coalesce(new.amount, 0)),
+    (new.utm_campaign, 'link', coalesce(new.link_id, ''), delta, delta * coalesce(new.amount, 0)),
+    (new.utm_campaign, 'source', coalesce(new.src, '') || '|' || coalesce(new.sck, ''), delta, delta * coalesce(new.amount, 0))
+  on conflict (utm_campaign, dimension, dim_key) do update
+  set conversions = r.conversions + excluded.conversions,
+      revenue = r.revenue + excluded.revenue,
+      updated_at = timezone('utc'::text, now());
+
+  return new;
+end;
+$$;
+
+-- Duplicate deliveries are skipped by the ingestor (on conflict do nothing),
+-- so this only fires once per Hotmart event.
+create trigger conversions_rollup
+after insert on public.conversions
+for each row execute function apply_conversion_rollup();
+
+-- 12. Idempotency keys (stored responses for retried POST /links/generate and /links/matrix)
+create table public.idempotency_keys (
+  key text primary key, -- '<endpoint>:<Idempotency-Key header>'
+  request_hash text not null,
+  status text not null check (status in ('pending', 'done')),
+  response jsonb,
+  expires_at timestamp with time zone not null
+);
+
+create index idempotency_keys_expires_idx on public.idempotency_keys (expires_at);
+
+-- 13. Background jobs (POST /jobs): status and progress of long operations.
+-- updated_at is the owning worker's heartbeat; queued/running rows whose
+-- heartbeat stopped are marked failed by the other workers.
+create table public.jobs (
+  id text primary key,
+  kind text not null,
+  status text not null default 'queued' check (status in ('queued', 'running', 'done', 'failed', 'cancelled')),
+  params jsonb not null default '{}',
+  progress integer not null default 0,
+  total integer,
+  result jsonb,
+  error text,
+  cancel_requested boolean not null default false,
+  created_by text,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  started_at timestamp with time zone,
+  finished_at timestamp with time zone,
+  updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index jobs_active_idx on public.jobs (updated_at) where status in ('queued', 'running');
+create index jobs_created_idx on public.jobs (created_at desc);
+
 -- Helper function for atomic counter increment (RPC)
 create or replace function increment_link_counter(row_id text)
 returns integer
@@ -104,6 +273,142 @@ begin
 end;
 $$;
 
+-- Move up to batch_size links created before cutoff into links_archive in one
+-- transaction. Returns the ids moved (call again until fewer than batch_size).
+-- An id already in the archive (a copy left by an earlier run) is replaced by
+-- the hot row, so every picked link is archived before it is deleted.
+create or replace function archive_links(cutoff timestamp with time zone, batch_size integer)
+returns text[]
+language plpgsql
+as $$
+declare
+  picked text[];
+  moved text[];
+begin
+  select array_agg(id) into picked
+  from (
+    select id from public.links
+    where created_at < cutoff
+    order by created_at
+    limit batch_size
+    for update skip locked
+  ) p;
+  if picked is null then
+    return '{}';
+  end if;
+
+  delete from public.links_archive where id = any(picked);
+  insert into public.links_archive select l.* from public.links l where l.id = any(picked);
+  with gone as (
+    delete from public.links where id = any(picked) returning id
+  )
+  select coalesce(array_agg(id), '{}') into moved from gone;
+  return moved;
+end;
+$$;
+
+-- Apply a batch of per-link destination rewrites (POST /links/rewrite) in one
+-- statement: changes = [{"id", "base_url", "path", "full_url", "fingerprint"}].
+-- The last health check no longer applies. Returns the ids actually updated.
+create or replace function rewrite_link_urls(changes jsonb)
+returns table (id text)
+language sql
+as $$
+  update public.links l
+  set base_url = c.base_url,
+      path = c.path,
+      full_url = c.full_url,
+      fingerprint = c.fingerprint,
+      health_status = null,
+      health_ms = null,
+      health_error = null,
+      health_checked_at = null
+  from jsonb_to_recordset(changes) as c(id text, base_url text, path text, full_url text, fingerprint text)
+  where l.id = c.id
+  returning l.id;
+$$;
+
+-- Ranked substring search over links (GET /links?q=). q is matched as a
+-- literal, case-insensitive substring of link_search_text(); results come
+-- best word match first (pg_trgm word distance), then newest. Both the like
+-- filter and the <<-> ordering are served by links_search_trgm_idx, so a page
+-- reads about page_offset + page_size index entries, not every match.
+create or replace function search_links(
+  q text,
+  link_status text default 'active',
+  page_size integer default 50,
+  page_offset integer default 0,
+  campaign text default null,
+  source text default null,
+  medium text default null,
+  kind text default null
+)
+returns setof public.links
+language plpgsql
+stable
+as $$
+declare
+  term text := lower(q);
+  pattern text := '%' || replace(replace(replace(lower(q), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+begin
+  return query
+  select l.* from public.links l
+  where link_search_text(l.id, l.utm_campaign, l.utm_content, l.utm_term, l.notes) like pattern
+    and (case when link_status = 'archived' then l.status = 'archived' else l.status <> 'archived' end)
+    and (campaign is null or l.utm_campaign = campaign)
+    and (source is null or l.utm_source = source)
+    and (medium is null or l.utm_medium = medium)
+    and (kind is null or l.link_type = kind)
+  order by term <<-> link_search_text(l.id, l.utm_campaign, l.utm_content, l.utm_term, l.notes),
+    l.created_at desc, l.id
+  limit page_size offset page_offset;
+end;
+$$;
+
+-- Reserve a block of counter values in one call (bulk link creation).
+-- Returns the last value of the block.
+create or replace function increment_link_counter_by(row_id text, amount integer)
+returns integer
+language plpgsql
+as $$
+declare
+  current_count integer;
+begin
+  insert into public.settings (id, count)
+  values (row_id, amount)
+  on conflict (id) do update
+  set count = settings.count + amount
+  returning count into current_count;
+
+  return current_count;
+end;
+$$;
+
+-- Link writes: bump 'version:links' and insert one audit per link in one
+-- transaction, returning the new version (the delta-sync token). The settings
+-- row lock is held until commit, so a concurrent writer cannot take seq N+1
+-- until the audits of N are visible: GET /links/changes never skips one.
+create or replace function record_link_changes(link_ids text[], change_action text)
+returns integer
+language plpgsql
+as $$
+declare
+  new_seq integer;
+begin
+  insert into public.settings (id, count)
+  values ('version:links', 1)
+  on conflict (id) do update
+  set count = settings.count + 1
+  returning count into new_seq;
+
+  insert into public.audits (event_id, link_id, actor, action, seq)
+  select gen_random_uuid()::text, link_id, 'system_user', change_action, new_seq
+  from unnest(link_ids) as link_id;
+
+  return new_seq;
+end;
+$$;
+
 -- RLS Policies (Open by default for authenticated service role)
 alter table public.users enable row level security;
 alter table public.links enable row level security;
@@ -112,3 +417,26 @@ alter table public.source_configs enable row level security;
 create policy "Enable access to all users" on public.users for all using (true);
 create policy "Enable access to all links" on public.links for all using (true);
 create policy "Enable access to all configs" on public.source_configs for all using (true);
+
+-- Upgrades for existing projects (safe to re-run)
+alter table public.audits drop constraint if exists audits_link_id_fkey;
+alter table public.audits add column if not exists seq bigint;
+create index if not exists audits_seq_idx on public.audits (seq);
+alter table public.links add column if not exists fingerprint text;
+create unique index if not exists links_fingerprint_key on public.links (fingerprint) where fingerprint is not null;
+alter table public.links add column if not exists status text not null default 'active';
+alter table public.links add column if not exists archived_at timestamp with time zone;
+alter table public.links add column if not exists health_status integer;
+alter table public.links add column if not exists health_ms integer;
+alter table public.links add column if not exists health_error text;
+alter table public.links add column if not exists health_checked_at timestamp with time zone;
+alter table public.links_archive add column if not exists health_status integer;
+alter table public.links_archive add column if not exists health_ms integer;
+alter table public.links_archive add column if not exists health_error text;
+alter table public.links_archive add column if not exists health_checked_at timestamp with time zone;
+alter table public.links add column if not exists short_code text;
+alter table public.links_archive add column if not exists short_code text;
+-- New tables: run their "create table" blocks above (e.g. conversions, attribution_rollups,
+-- idempotency_keys, links_archive, jobs) and the conversions_rollup trigger.
+-- Functions: run the "create or replace function" blocks above.
+-- Indexes: run backend/migrations/*.sql in order.
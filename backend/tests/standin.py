@@ -0,0 +1,30 @@
+"""PostgREST stand-in fixture shared by the tests that talk HTTP to the backend."""
+import threading
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional
+
+from supabase import Client, create_client
+
+from backend.app.local_store import LocalStore
+from backend.postgrest_standin import StandinConfig, serve
+
+
+class Standin(NamedTuple):
+    url: str
+    db: Client
+
+
+@contextmanager
+def running_standin(store: Optional[LocalStore] = None, config: Optional[StandinConfig] = None) -> Iterator[Standin]:
+    """Serve the stand-in on a free port in a daemon thread; yields its URL and a client.
+
+    In a test: `standin = self.enterContext(running_standin())`.
+    """
+    server = serve(port=0, store=store or LocalStore(), config=config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        yield Standin(url, create_client(url, "standin"))
+    finally:
+        server.shutdown()
+        server.server_close()
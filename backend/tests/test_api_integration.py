@@ -1,9 +1,18 @@
+import io
+import tempfile
 import unittest
+import zipfile
+from datetime import datetime
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
 
 from backend.app import main
+from backend.app.auth import user_status
+from backend.app.cache import reset_caches, version_watcher
+from backend.app.governance import source_rules
+from backend.app.idempotency import idempotency_store, request_hash
 from backend.app.models import UserInDB
 
 
@@ -32,6 +41,7 @@ class FakeQuery:
         self._order_field = None
         self._order_desc = False
         self._limit = None
+        self._ignore_duplicates = False
 
     def select(self, _columns="*", count=None):
         self._op = "select"
@@ -39,7 +49,32 @@ class FakeQuery:
         return self
 
     def eq(self, key, value):
-        self._filters.append((key, value))
+        self._filters.append(lambda row: row.get(key) == value)
+        return self
+
+    def gt(self, key, value):
+        self._filters.append(lambda row: row.get(key) is not None and row.get(key) > value)
+        return self
+
+    def neq(self, key, value):
+        self._filters.append(lambda row: row.get(key) != value)
+        return self
+
+    def gte(self, key, value):
+        self._filters.append(lambda row: row.get(key) is not None and row.get(key) >= value)
+        return self
+
+    def lte(self, key, value):
+        self._filters.append(lambda row: row.get(key) is not None and row.get(key) <= value)
+        return self
+
+    def lt(self, key, value):
+        self._filters.append(lambda row: row.get(key) is not None and row.get(key) < value)
+        return self
+
+    def in_(self, key, values):
+        values = list(values)
+        self._filters.append(lambda row: row.get(key) in values)
         return self
 
     def order(self, field, desc=False):
@@ -51,9 +86,10 @@ class FakeQuery:
         self._limit = value
         return self
 
-    def upsert(self, payload):
+    def upsert(self, payload, ignore_duplicates=False, **_kwargs):
         self._op = "upsert"
         self._payload = payload
+        self._ignore_duplicates = ignore_duplicates
         return self
 
     def insert(self, payload):
@@ -75,7 +111,7 @@ class FakeQuery:
         primary_key = self.db.primary_keys.get(self.table_name)
 
         def matches(row):
-            return all(row.get(k) == v for k, v in self._filters)
+            return all(f(row) for f in self._filters)
 
         if self._op == "select":
             result = [r.copy() for r in rows if matches(r)]
@@ -87,16 +123,24 @@ class FakeQuery:
             return FakeResponse(data=result, count=total_count if self._count == "exact" else None)
 
         if self._op in {"insert", "upsert"}:
-            payload = self._payload.copy()
-            if primary_key and payload.get(primary_key) is not None:
-                idx = next((i for i, r in enumerate(rows) if r.get(primary_key) == payload[primary_key]), None)
-                if idx is not None:
-                    rows[idx] = {**rows[idx], **payload}
+            payloads = self._payload if isinstance(self._payload, list) else [self._payload]
+            written = []
+            for item in payloads:
+                payload = item.copy()
+                if primary_key and payload.get(primary_key) is not None:
+                    idx = next((i for i, r in enumerate(rows) if r.get(primary_key) == payload[primary_key]), None)
+                    if idx is not None and self._op == "upsert" and self._ignore_duplicates:
+                        continue
+                    if idx is not None and self._op == "insert":
+                        raise APIError({"code": "23505", "message": f"duplicate key value violates unique constraint on {self.table_name}"})
+                    if idx is not None:
+                        rows[idx] = {**rows[idx], **payload}
+                    else:
+                        rows.append(payload)
                 else:
                     rows.append(payload)
-            else:
-                rows.append(payload)
-            return FakeResponse(data=[payload])
+                written.append(payload)
+            return FakeResponse(data=written)
 
         if self._op == "update":
             updated = []
@@ -132,6 +176,8 @@ class FakeDB:
             "links": "id",
             "settings": "id",
             "audits": "event_id",
+            "idempotency_keys": "key",
+            "links_archive": "id",
         }
         self.tables = {
             "users": [],
@@ -143,26 +189,59 @@ class FakeDB:
             "links": [],
             "settings": [{"id": "link_counter", "count": 0}],
             "audits": [],
+            "idempotency_keys": [],
+            "links_archive": [],
         }
+        self.rpc_calls = []
 
     def table(self, table_name):
         return FakeQuery(self, table_name)
 
     def rpc(self, function_name, args):
-        if function_name != "increment_link_counter":
+        if function_name == "archive_links":
+            self.rpc_calls.append(function_name)
+            old = sorted(
+                (r for r in self.tables["links"] if r["created_at"] < args["cutoff"]),
+                key=lambda r: r["created_at"],
+            )[: args["batch_size"]]
+            moved = {r["id"] for r in old}
+            self.tables["links"] = [r for r in self.tables["links"] if r["id"] not in moved]
+            self.tables.setdefault("links_archive", []).extend(old)
+            return FakeRpcCall(FakeResponse(data=[r["id"] for r in old]))
+        if function_name == "rewrite_link_urls":
+            self.rpc_calls.append(function_name)
+            links = {r["id"]: r for r in self.tables["links"]}
+            updated = []
+            for change in args["changes"]:
+                if change["id"] in links:
+                    links[change["id"]].update({k: v for k, v in change.items() if k != "id"}, health_status=None)
+                    updated.append({"id": change["id"]})
+            return FakeRpcCall(FakeResponse(data=updated))
+        if function_name == "record_link_changes":
+            seq = self.rpc("increment_link_counter", {"row_id": "version:links"}).execute().data
+            self.tables["audits"].extend(
+                {"event_id": f"evt_{len(self.tables['audits']) + i}", "link_id": link_id, "actor": "system_user",
+                 "action": args["change_action"], "seq": seq}
+                for i, link_id in enumerate(args["link_ids"])
+            )
+            return FakeRpcCall(FakeResponse(data=seq))
+        if function_name not in {"increment_link_counter", "increment_link_counter_by"}:
             return FakeRpcCall(FakeResponse(data=None))
+        self.rpc_calls.append(function_name)
         row_id = args["row_id"]
         settings = self.tables["settings"]
         row = next((r for r in settings if r["id"] == row_id), None)
         if row is None:
             row = {"id": row_id, "count": 0}
             settings.append(row)
-        row["count"] += 1
+        row["count"] += args.get("amount", 1)
         return FakeRpcCall(FakeResponse(data=row["count"]))
 
 
 class ApiIntegrationTests(unittest.TestCase):
     def setUp(self):
+        reset_caches()
+        idempotency_store.clear()
         self.db = FakeDB()
         admin_user = UserInDB(
             username="admin",
@@ -216,6 +295,46 @@ class ApiIntegrationTests(unittest.TestCase):
         deleted = self.client.delete("/users/editor1")
         self.assertEqual(deleted.status_code, 200)
 
+    def test_disabled_and_deleted_users_are_rejected_from_cache(self):
+        user_status.invalidate()
+        auth_db_patch = patch("backend.app.auth.get_db", return_value=self.db)
+        auth_db_patch.start()
+        self.addCleanup(auth_db_patch.stop)
+        self.client.post("/users", json={"username": "editor1", "password": "abc123", "role": "user"})
+        # Admin endpoints stay overridden; /users/me goes through the real token check.
+        del main.app.dependency_overrides[main.get_current_active_user]
+        token = main.create_access_token({"sub": "editor1", "role": "admin"})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            first = self.client.get("/users/me", headers=headers)
+            second = self.client.get("/users/me", headers=headers)
+        self.assertEqual(first.status_code, 200)
+        # The role comes from the user row, not from the token claim.
+        self.assertEqual(second.json()["role"], "user")
+        self.assertEqual([c.args[0] for c in table_spy.call_args_list].count("users"), 1)
+
+        self.client.put("/users/editor1", json={"username": "editor1", "password": "abc123", "role": "user", "disabled": True})
+        self.assertEqual(self.client.get("/users/me", headers=headers).status_code, 403)
+
+        self.client.delete("/users/editor1")
+        self.assertEqual(self.client.get("/users/me", headers=headers).status_code, 401)
+        self.assertEqual(self.client.get("/links/stream", params={"access_token": token}).status_code, 401)
+
+    def test_failed_user_status_lookup_answers_503(self):
+        user_status.invalidate()
+        auth_db_patch = patch("backend.app.auth.get_db", return_value=self.db)
+        auth_db_patch.start()
+        self.addCleanup(auth_db_patch.stop)
+        del main.app.dependency_overrides[main.get_current_active_user]
+        headers = {"Authorization": f"Bearer {main.create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+
+        error = APIError({"code": "42501", "message": "permission denied for table users"})
+        with patch.object(FakeQuery, "execute", side_effect=error):
+            resp = self.client.get("/users/me", headers=headers)
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn("retry-after", resp.headers)
+
     def test_launches_endpoints(self):
         created = self.client.post("/launches", json={"slug": "vde1f_90d_evento_0124", "nome": "Campanha 1", "owner": "admin", "status": "active"})
         self.assertEqual(created.status_code, 200)
@@ -228,6 +347,55 @@ class ApiIntegrationTests(unittest.TestCase):
         deleted = self.client.delete("/launches/vde1f_90d_evento_01-24")
         self.assertEqual(deleted.status_code, 200)
 
+    def test_campaign_generator_previews_and_bulk_creates(self):
+        self.db.tables["launches"].append({"slug": "vde1f_120d_evento_07-24", "nome": "Existente", "owner": "admin", "status": "active"})
+        request = {
+            "products": ["VDE1F", "vde1f", "Enam"],
+            "turmas": ["120d"],
+            "launch_types": ["evento", "Passariano"],
+            "dates": ["0724", "08/2024"],
+        }
+
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            preview = self.client.post("/launches/generate", json=request)
+            self.client.post("/launches/generate", json=request)
+        self.assertEqual(preview.status_code, 200)
+        campaigns = preview.json()["campaigns"]
+        self.assertEqual(len(campaigns), 8)
+        self.assertEqual(campaigns[0], {
+            "slug": "vde1f_120d_evento_07-24", "product": "vde1f", "turma": "120d",
+            "launch_type": "evento", "date": "07-24", "exists": True,
+        })
+        self.assertEqual([c["slug"] for c in campaigns if c["exists"]], ["vde1f_120d_evento_07-24"])
+        self.assertIn("enam_120d_passariano_08-24", [c["slug"] for c in campaigns])
+        self.assertEqual(preview.json()["created"], [])
+        # Existing slugs come from the cache after the first request.
+        self.assertEqual([c.args[0] for c in table_spy.call_args_list].count("launches"), 1)
+
+        create = ["vde1f_120d_evento_07-24", "vde1f_120d_evento_08-24", "enam_120d_passariano_08-24"]
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            created = self.client.post("/launches/generate", json={**request, "create": create, "names": {"enam_120d_passariano_08-24": "ENAM Ago"}})
+        self.assertEqual(created.json()["created"], ["vde1f_120d_evento_08-24", "enam_120d_passariano_08-24"])
+        self.assertEqual([c.args[0] for c in table_spy.call_args_list].count("launches"), 1)
+        launches = {l["slug"]: l for l in self.db.tables["launches"]}
+        self.assertEqual(len(launches), 3)
+        self.assertEqual(launches["enam_120d_passariano_08-24"]["nome"], "ENAM Ago")
+        self.assertEqual(launches["vde1f_120d_evento_07-24"]["nome"], "Existente")
+
+        again = self.client.post("/launches/generate", json=request).json()
+        self.assertEqual(sum(c["exists"] for c in again["campaigns"]), 3)
+
+        # Created by another worker after this one cached the slugs; slugs as typed in the preview.
+        self.db.tables["launches"].append({"slug": "vde1f_120d_passariano_08-24", "nome": "Outro worker", "owner": "user", "status": "active"})
+        raced = self.client.post("/launches/generate", json={**request, "create": ["VDE1F_120d_Passariano_0824", "ENAM_120D_Evento_0724"]})
+        self.assertEqual(raced.status_code, 200, raced.text)
+        self.assertEqual(raced.json()["created"], ["enam_120d_evento_07-24"])
+        launches = {l["slug"]: l for l in self.db.tables["launches"]}
+        self.assertEqual(launches["vde1f_120d_passariano_08-24"]["nome"], "Outro worker")
+        self.assertTrue(next(c for c in raced.json()["campaigns"] if c["slug"] == "vde1f_120d_passariano_08-24")["exists"])
+        self.assertEqual(self.client.post("/launches/generate", json={**request, "create": ["outra_campanha"]}).status_code, 400)
+        self.assertEqual(self.client.post("/launches/generate", json={**request, "dates": []}).status_code, 400)
+
     def test_source_configs_endpoints(self):
         payload = {
             "slug": "instagram",
@@ -352,6 +520,17 @@ class ApiIntegrationTests(unittest.TestCase):
         ids = [item["id"] for item in listing.json()]
         self.assertNotIn(link_id, ids)
 
+        audits = len(self.db.tables["audits"])
+        self.assertEqual(self.client.delete(f"/links/{link_id}").status_code, 404)
+        self.assertEqual(len(self.db.tables["audits"]), audits)
+
+        self.seed_links(1, "camp_archived")
+        archived_id = self.db.tables["links"][-1]["id"]
+        self.db.tables["links_archive"].append(self.db.tables["links"].pop())
+        self.assertEqual(self.client.delete(f"/links/{archived_id}").status_code, 200)
+        self.assertEqual(self.db.tables["links_archive"], [])
+        self.assertEqual(self.client.get(f"/links/{archived_id}").status_code, 404)
+
     def test_links_list_filters(self):
         payloads = [
             {
@@ -402,6 +581,675 @@ class ApiIntegrationTests(unittest.TestCase):
         self.assertEqual(by_type_vendas.status_code, 200)
         self.assertEqual(len(by_type_vendas.json()), 1)
 
+    def test_reference_endpoints_answer_304_when_unchanged(self):
+        self.client.post("/products", json={"slug": "vde1f", "nome": "VDE1F"})
+        first = self.client.get("/products")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["etag"]
+
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            again = self.client.get("/products", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers["etag"], etag)
+        # At most the version lookup ran, never the products query.
+        self.assertNotIn("products", [c.args[0] for c in table_spy.call_args_list])
+
+        self.client.post("/products", json={"slug": "vde2f", "nome": "VDE2F"})
+        changed = self.client.get("/products", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(len(changed.json()), 2)
+
+    def test_links_etag_varies_with_filters_and_writes(self):
+        all_links = self.client.get("/links")
+        by_source = self.client.get("/links", params={"utm_source": "email"})
+        self.assertNotEqual(all_links.headers["etag"], by_source.headers["etag"])
+
+        etag = all_links.headers["etag"]
+        self.assertEqual(self.client.get("/links", headers={"If-None-Match": etag}).status_code, 304)
+
+        self.client.post(
+            "/links/generate",
+            json={
+                "link_type": "captacao",
+                "base_url": "https://lp.exemplo.com",
+                "utm_source": "instagram",
+                "utm_medium": "feed",
+                "utm_campaign": "camp_etag",
+            },
+        )
+        refreshed = self.client.get("/links", headers={"If-None-Match": etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(len(refreshed.json()), 1)
+
+    def test_link_changes_since_token(self):
+        def generate(campaign):
+            resp = self.client.post(
+                "/links/generate",
+                json={
+                    "link_type": "captacao",
+                    "base_url": "https://lp.exemplo.com",
+                    "utm_source": "instagram",
+                    "utm_medium": "feed",
+                    "utm_campaign": campaign,
+                },
+            )
+            return resp.json()["id"]
+
+        kept = generate("camp_a")
+        listing = self.client.get("/links")
+        token = int(listing.headers["x-change-token"])
+
+        added = generate("camp_b")
+        short_lived = generate("camp_c")
+        self.client.delete(f"/links/{short_lived}")
+        self.client.delete(f"/links/{kept}")
+
+        changes = self.client.get("/links/changes", params={"since": token})
+        self.assertEqual(changes.status_code, 200)
+        body = changes.json()
+        self.assertEqual([l["id"] for l in body["created"]], [added])
+        self.assertEqual(sorted(body["deleted"]), sorted([short_lived, kept]))
+        self.assertFalse(body["reset"])
+
+        # Delete events stay in audits instead of being wiped with the link.
+        actions = [(a["link_id"], a["action"]) for a in self.db.tables["audits"]]
+        self.assertIn((kept, "create"), actions)
+        self.assertIn((kept, "delete"), actions)
+
+        caught_up = self.client.get("/links/changes", params={"since": body["token"]}).json()
+        self.assertEqual(caught_up["created"], [])
+        self.assertEqual(caught_up["deleted"], [])
+        self.assertEqual(caught_up["token"], body["token"])
+
+    def test_link_writes_publish_stream_events(self):
+        with patch.object(main.link_events, "publish") as publish:
+            created = self.client.post(
+                "/links/generate",
+                json={
+                    "link_type": "captacao",
+                    "base_url": "https://lp.exemplo.com",
+                    "utm_source": "instagram",
+                    "utm_medium": "feed",
+                    "utm_campaign": "camp_live",
+                },
+            ).json()
+            self.client.delete(f"/links/{created['id']}")
+
+        (create_event, create_data), (delete_event, delete_data) = [c.args for c in publish.call_args_list]
+        self.assertEqual(create_event, "created")
+        self.assertEqual(create_data["link"]["id"], created["id"])
+        self.assertEqual(delete_event, "deleted")
+        self.assertEqual(delete_data["id"], created["id"])
+        self.assertGreater(delete_data["token"], create_data["token"])
+
+    def test_link_stream_requires_token(self):
+        self.assertEqual(self.client.get("/links/stream").status_code, 401)
+        self.assertEqual(self.client.get("/links/stream", params={"access_token": "garbage"}).status_code, 401)
+
+    def test_reference_cache_sees_other_workers_after_poll_interval(self):
+        self.client.post("/turmas", json={"slug": "120d", "nome": "120d"})
+        self.assertEqual(len(self.client.get("/turmas").json()), 1)
+
+        # Another worker writes directly and bumps the shared counter.
+        self.db.tables["turmas"].append({"slug": "90d", "nome": "90d"})
+        self.db.rpc("increment_link_counter", {"row_id": "version:turmas"})
+
+        with patch.object(version_watcher, "poll_interval", 60.0), patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            stale = self.client.get("/turmas")
+        self.assertEqual(len(stale.json()), 1)
+        self.assertEqual(table_spy.call_count, 0)
+
+        with patch.object(version_watcher, "poll_interval", 0.0):
+            fresh = self.client.get("/turmas")
+        self.assertEqual(len(fresh.json()), 2)
+
+    def test_link_matrix_preview_and_bulk_create(self):
+        self.db.tables["source_configs"].extend([
+            {
+                "slug": "email",
+                "name": "Email",
+                "config": {
+                    "mediums": [{"slug": "newsletter", "name": "Newsletter"}, {"slug": "marketing", "name": "Marketing"}],
+                    "contents": [{"slug": "lista_atual", "name": "Lista Atual"}, {"slug": "ex_alunos", "name": "Ex-Alunos"}],
+                    "term_config": "standard",
+                    "required_fields": ["date"],
+                },
+            },
+            {
+                "slug": "site",
+                "name": "Site",
+                "config": {
+                    "mediums": [{"slug": "institucional", "name": "Institucional"}],
+                    "contents": [],
+                    "term_config": "no_date",
+                    "required_fields": [],
+                },
+            },
+        ])
+        request = {
+            "utm_campaign": "vde1f_120d_evento_0326",
+            "sources": ["email", "site"],
+            "destinations": {
+                "captacao": {"base_url": "https://lp.exemplo.com", "path": "/inscricao"},
+                "vendas": {"base_url": "https://checkout.exemplo.com"},
+            },
+            "dynamic_fields": {"date": "10-03-2026"},
+            "dry_run": True,
+        }
+
+        preview = self.client.post("/links/matrix", json=request)
+        self.assertEqual(preview.status_code, 200)
+        self.assertEqual(preview.json()["count"], 10)  # (2x2 + 1x1) per link type
+        self.assertEqual(self.db.tables["links"], [])
+        self.assertEqual(self.db.rpc_calls, [])
+
+        created = self.client.post("/links/matrix", json={**request, "dry_run": False})
+        self.assertEqual(created.status_code, 200)
+        links = created.json()["links"]
+        self.assertEqual(len(links), 10)
+        self.assertEqual(len({l["id"] for l in links}), 10)
+        self.assertEqual(len(self.db.tables["links"]), 10)
+        self.assertEqual(self.db.rpc_calls.count("increment_link_counter_by"), 1)
+
+        email_terms = {l["utm_term"] for l in links if l["utm_source"] == "email"}
+        site_terms = {l["utm_term"] for l in links if l["utm_source"] == "site"}
+        self.assertEqual(email_terms, {"10-03-2026"})
+        self.assertEqual(site_terms, {""})
+        vendas = [l for l in links if l["link_type"] == "vendas"]
+        self.assertTrue(all(l["xcode"] == l["id"] for l in vendas))
+
+        rerun = self.client.post("/links/matrix", json={**request, "dry_run": False}).json()
+        self.assertEqual(rerun["reused"], 10)
+        self.assertEqual({l["id"] for l in rerun["links"]}, {l["id"] for l in links})
+        self.assertEqual(len(self.db.tables["links"]), 10)
+        self.assertEqual(self.db.rpc_calls.count("increment_link_counter_by"), 1)
+
+    def test_link_matrix_reuses_links_of_a_lost_insert_race(self):
+        self.db.tables["source_configs"].append({
+            "slug": "site",
+            "name": "Site",
+            "config": {
+                "mediums": [{"slug": "institucional", "name": "Institucional"}],
+                "contents": [],
+                "term_config": "no_date",
+                "required_fields": [],
+            },
+        })
+        request = {
+            "utm_campaign": "vde1f_120d_evento_0326",
+            "sources": ["site"],
+            "destinations": {"captacao": {"base_url": "https://lp.exemplo.com"}},
+            "dry_run": False,
+        }
+        winner = self.client.post("/links/matrix", json=request).json()["links"]
+
+        misses = iter([True])
+        real_find, real_insert = main.find_links_by_fingerprint, main.insert_links
+        inserts = iter([APIError({"code": "23505", "message": "duplicate key value violates unique constraint \"links_fingerprint_key\""})])
+
+        def insert(db, links):
+            error = next(inserts, None)
+            if error:
+                raise error
+            real_insert(db, links)
+
+        # The first lookup misses the winner's link, then the batch insert hits the unique index.
+        with patch.object(main, "find_links_by_fingerprint", side_effect=lambda db, fps: {} if next(misses, False) else real_find(db, fps)), \
+                patch.object(main, "insert_links", side_effect=insert):
+            resp = self.client.post("/links/matrix", json={
+                **request,
+                "destinations": {**request["destinations"], "vendas": {"base_url": "https://checkout.exemplo.com"}},
+            })
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(resp.json()["count"], 2)
+        self.assertEqual(resp.json()["reused"], 1)
+        self.assertIn(winner[0]["id"], {l["id"] for l in resp.json()["links"]})
+        self.assertEqual(len(self.db.tables["links"]), 2)
+
+    def test_link_matrix_rejects_unknown_source(self):
+        resp = self.client.post(
+            "/links/matrix",
+            json={
+                "utm_campaign": "camp",
+                "sources": ["nope"],
+                "destinations": {"captacao": {"base_url": "https://lp.exemplo.com"}},
+            },
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_link_generation_enforces_source_configs(self):
+        self.db.tables["source_configs"].append({
+            "slug": "google",
+            "name": "Google",
+            "config": {
+                "mediums": [{"slug": "cpc", "name": "CPC"}],
+                "contents": [{"slug": "keyword", "name": "Palavra Chave"}],
+                "term_config": "manual",
+                "required_fields": ["term"],
+            },
+        })
+        base = {"base_url": "https://lp.exemplo.com", "utm_source": "Google", "utm_campaign": "camp", "utm_term": "curso"}
+
+        ok = self.client.post("/links/generate", json={**base, "utm_medium": "CPC", "utm_content": "keyword"})
+        self.assertEqual(ok.status_code, 200)
+
+        compiles = source_rules.compiles
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            bad = self.client.post("/links/generate", json={**base, "utm_medium": "display", "utm_content": "banner", "utm_term": ""})
+        self.assertEqual(bad.status_code, 422)
+        self.assertEqual(
+            [(e["type"], e["loc"], e["input"]) for e in bad.json()["detail"]],
+            [
+                ("governance.unknown_medium", ["body", "utm_medium"], "display"),
+                ("governance.unknown_content", ["body", "utm_content"], "banner"),
+                ("governance.missing_field", ["body", "utm_term"], ""),
+            ],
+        )
+        self.assertEqual(bad.json()["detail"][0]["ctx"], {"source": "google", "allowed": ["cpc"]})
+        self.assertEqual(source_rules.compiles, compiles)
+        self.assertNotIn("source_configs", [c.args[0] for c in table_spy.call_args_list])
+        self.assertEqual(len(self.db.tables["links"]), 1)
+
+        unknown = self.client.post("/links/generate", json={**base, "utm_source": "tiktok", "utm_medium": "cpc"})
+        self.assertEqual(unknown.json()["detail"][0]["type"], "governance.unknown_source")
+
+        # A config write recompiles the rules for the next request.
+        config = dict(self.db.tables["source_configs"][0])
+        config["config"] = {**config["config"], "mediums": [{"slug": "cpc", "name": "CPC"}, {"slug": "display", "name": "Display"}]}
+        self.assertEqual(self.client.post("/source-configs", json=config).status_code, 200)
+        display = self.client.post("/links/generate", json={**base, "utm_medium": "display", "utm_content": "keyword"})
+        self.assertEqual(display.status_code, 200)
+        self.assertEqual(source_rules.compiles, compiles + 1)
+
+    def test_link_generation_enforces_term_config(self):
+        for slug, term_config in (("email", "standard"), ("site", "no_date"), ("youtube", "manual")):
+            self.db.tables["source_configs"].append({
+                "slug": slug, "name": slug, "config": {"mediums": [], "contents": [], "term_config": term_config},
+            })
+        base = {"base_url": "https://lp.exemplo.com", "utm_medium": "any", "utm_campaign": "camp"}
+
+        for source, term, status in (
+            ("email", "aaa_10032026", 200),
+            ("email", "aaa", 422),
+            ("site", "", 200),
+            ("site", "10-03-2026", 422),
+            ("youtube", "aula_10-03-2026", 200),
+            ("youtube", "", 200),
+        ):
+            with self.subTest(source=source, term=term):
+                resp = self.client.post("/links/generate", json={**base, "utm_source": source, "utm_term": term})
+                self.assertEqual(resp.status_code, status, resp.text)
+                if status == 422:
+                    self.assertEqual(
+                        [(e["type"], e["loc"], e["input"]) for e in resp.json()["detail"]],
+                        [("governance.invalid_term", ["body", "utm_term"], term)],
+                    )
+
+    def test_link_matrix_enforces_required_fields(self):
+        self.db.tables["source_configs"].append({
+            "slug": "google",
+            "name": "Google",
+            "config": {"mediums": [{"slug": "cpc", "name": "CPC"}], "term_config": "manual", "required_fields": ["term"]},
+        })
+        resp = self.client.post("/links/matrix", json={
+            "utm_campaign": "camp",
+            "sources": ["google"],
+            "destinations": {"captacao": {"base_url": "https://lp.exemplo.com"}, "vendas": {"base_url": "https://checkout.exemplo.com"}},
+        })
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual([e["type"] for e in resp.json()["detail"]], ["governance.missing_field"])
+        self.assertEqual(self.db.rpc_calls, [])
+
+    def test_link_matrix_defaults_the_date_of_seeded_sources(self):
+        self.db.tables["source_configs"].extend(dict(c) for c in main.SEED_SOURCE_CONFIGS)
+        resp = self.client.post("/links/matrix", json={
+            "utm_campaign": "camp",
+            "sources": ["email", "whatsapp"],
+            "destinations": {"captacao": {"base_url": "https://lp.exemplo.com"}},
+            "dry_run": True,
+        })
+        self.assertEqual(resp.status_code, 200, resp.text)
+        today = datetime.utcnow().strftime("%d-%m-%Y")
+        self.assertEqual({l["utm_term"] for l in resp.json()["links"]}, {today})
+        self.assertEqual(resp.json()["count"], 2 * 3 + 3 * 3)
+
+    def test_short_code_redirect_and_lookup(self):
+        link = self.client.post("/links/generate", json={
+            "base_url": "https://lp.exemplo.com", "path": "/oferta", "utm_source": "email",
+            "utm_medium": "newsletter", "utm_campaign": "camp",
+        }).json()
+        self.assertEqual(link["short_code"], "1")
+        self.assertEqual(self.db.tables["links"][0]["short_code"], "1")
+
+        with patch.object(self.db, "table", wraps=self.db.table) as table_spy:
+            redirect = self.client.get(f"/r/{link['short_code']}", follow_redirects=False)
+        self.assertEqual(redirect.status_code, 302)
+        self.assertEqual(redirect.headers["location"], link["full_url"])
+        self.assertEqual([c.args[0] for c in table_spy.call_args_list], ["links"])
+        self.assertEqual(self.client.get("/links/1").json()["id"], link["id"])
+
+        # Archived links keep redirecting.
+        self.db.tables["links_archive"].append(self.db.tables["links"].pop())
+        self.assertEqual(self.client.get("/r/1", follow_redirects=False).headers["location"], link["full_url"])
+        self.assertEqual(self.client.get("/r/2", follow_redirects=False).status_code, 404)
+        self.assertEqual(self.client.get("/r/no-code", follow_redirects=False).status_code, 404)
+        # Non-canonical codes (leading zero, past a bigint) are not aliases.
+        self.assertEqual(self.client.get("/r/01", follow_redirects=False).status_code, 404)
+        self.assertEqual(self.client.get(f"/r/{'z' * 11}", follow_redirects=False).status_code, 404)
+
+    def test_campaign_attribution_reads_rollups(self):
+        self.db.tables["links"].append({
+            "id": "lnk_000007", "utm_source": "whatsapp", "utm_medium": "api_disparos", "utm_content": "grupos_antigos",
+        })
+        rollups = [
+            ("campaign", "", 5, 1485.0),
+            ("link", "lnk_000007", 3, 891.0),
+            ("link", "lnk_000008", 2, 594.0),
+            ("source", "whatsapp_grupos_antigos|api_disparos", 4, 1188.0),
+            ("source", "email_lista_atual|newsletter", 1, 297.0),
+        ]
+        self.db.tables["attribution_rollups"] = [
+            {"utm_campaign": "vde1f_120d_evento_03-26", "dimension": d, "dim_key": k, "conversions": c, "revenue": r}
+            for d, k, c, r in rollups
+        ] + [{"utm_campaign": "other", "dimension": "campaign", "dim_key": "", "conversions": 9, "revenue": 1.0}]
+
+        resp = self.client.get("/attribution/vde1f_120d_evento_0326", params={"limit": 1})
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual(body["conversions"], 5)
+        self.assertEqual(body["revenue"], 1485.0)
+        self.assertEqual(len(body["top_links"]), 1)
+        self.assertEqual(body["top_links"][0]["link_id"], "lnk_000007")
+        self.assertEqual(body["top_links"][0]["utm_source"], "whatsapp")
+        self.assertEqual(body["top_sources"][0]["src"], "whatsapp_grupos_antigos")
+        self.assertEqual(body["top_sources"][0]["sck"], "api_disparos")
+
+        empty = self.client.get("/attribution/unknown_campaign").json()
+        self.assertEqual(empty["conversions"], 0)
+        self.assertEqual(empty["top_links"], [])
+
+    def test_identical_generate_returns_existing_link(self):
+        payload = {
+            "link_type": "vendas",
+            "base_url": "https://checkout.exemplo.com",
+            "path": "/vde1f",
+            "utm_source": "WhatsApp",
+            "utm_medium": "api_disparos",
+            "utm_campaign": "vde1f_120d_evento_0326",
+            "utm_content": "grupos_antigos",
+            "custom_params": {"b": "2", "a": "1"},
+        }
+        first = self.client.post("/links/generate", json=payload)
+        # Same inputs after normalization, params in another order.
+        again = self.client.post(
+            "/links/generate",
+            json={**payload, "utm_source": "whatsapp", "utm_campaign": "vde1f_120d_evento_03-26", "custom_params": {"a": "1", "b": "2"}},
+        )
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["id"], first.json()["id"])
+        self.assertEqual(again.headers.get("x-link-reused"), "true")
+        self.assertEqual(len(self.db.tables["links"]), 1)
+        self.assertEqual(len(self.db.tables["audits"]), 1)
+        self.assertEqual(self.db.rpc_calls.count("increment_link_counter"), 2)  # id + version of the first call
+
+        forced = self.client.post("/links/generate", json={**payload, "force_new": True})
+        self.assertNotEqual(forced.json()["id"], first.json()["id"])
+        self.assertIsNone(forced.json()["fingerprint"])
+
+        different = self.client.post("/links/generate", json={**payload, "utm_content": "grupos_atuais"})
+        self.assertNotIn(different.json()["id"], {first.json()["id"], forced.json()["id"]})
+
+    def test_only_a_lost_insert_race_reuses_the_link(self):
+        payload = {
+            "link_type": "captacao",
+            "base_url": "https://vicio.com",
+            "path": "/vde1f",
+            "utm_source": "whatsapp",
+            "utm_medium": "api_disparos",
+            "utm_campaign": "vde1f_120d_evento_0326",
+        }
+        first = self.client.post("/links/generate", json=payload).json()
+        lookups = iter([{}])
+        real_find = main.find_links_by_fingerprint
+        race = APIError({"code": "23505", "message": "duplicate key value violates unique constraint \"links_fingerprint_key\""})
+        # The first lookup misses, then the insert hits the unique index.
+        with patch.object(main, "find_links_by_fingerprint", side_effect=lambda db, fps: next(lookups, None) or real_find(db, fps)), \
+                patch.object(main, "insert_links", side_effect=race):
+            reused = self.client.post("/links/generate", json=payload)
+        self.assertEqual(reused.json()["id"], first["id"])
+        self.assertEqual(reused.headers.get("x-link-reused"), "true")
+
+        # A failure after the insert is an error, not a reuse.
+        with patch.object(main, "record_link_changes", side_effect=RuntimeError("audit insert failed")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/links/generate", json={**payload, "utm_content": "grupos_atuais"})
+
+    def test_idempotency_key_replays_link_creation(self):
+        payload = {
+            "link_type": "captacao",
+            "base_url": "https://vicio.com",
+            "path": "/vde1f",
+            "utm_source": "whatsapp",
+            "utm_medium": "api_disparos",
+            "utm_campaign": "vde1f_120d_evento_0326",
+            "force_new": True,
+        }
+        headers = {"Idempotency-Key": "form-1"}
+        first = self.client.post("/links/generate", json=payload, headers=headers)
+        retry = self.client.post("/links/generate", json=payload, headers=headers)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry.headers.get("idempotent-replayed"), "true")
+        self.assertNotIn("idempotent-replayed", first.headers)
+        self.assertEqual(len(self.db.tables["links"]), 1)
+        self.assertEqual(len(self.db.tables["audits"]), 1)
+
+        # Another worker (empty memory) answers from the table.
+        idempotency_store.clear()
+        self.assertEqual(self.client.post("/links/generate", json=payload, headers=headers).json()["id"], first.json()["id"])
+
+        reused = self.client.post("/links/generate", json={**payload, "utm_content": "outro"}, headers=headers)
+        self.assertEqual(reused.status_code, 422)
+
+        # Same key on another endpoint and no key at all are independent.
+        self.assertEqual(self.client.post("/links/generate", json=payload).status_code, 200)
+        self.assertEqual(len(self.db.tables["links"]), 2)
+
+    def test_idempotency_key_in_progress_conflicts(self):
+        payload = {"link_type": "captacao", "base_url": "https://vicio.com", "utm_source": "whatsapp", "utm_medium": "api_disparos", "utm_campaign": "c"}
+        self.db.tables["idempotency_keys"].append({
+            "key": "links/generate:busy",
+            "request_hash": request_hash(main.LinkCreate(**payload)),
+            "status": "pending",
+            "expires_at": "2999-01-01T00:00:00+00:00",
+        })
+        resp = self.client.post("/links/generate", json=payload, headers={"Idempotency-Key": "busy"})
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self.db.tables["links"], [])
+
+    def test_idempotency_claim_only_conflicts_on_unique_violation(self):
+        self.assertTrue(idempotency_store.claim(self.db, "links/generate:k1", "h"))
+        self.assertFalse(idempotency_store.claim(self.db, "links/generate:k1", "h"))
+
+        missing = APIError({"code": "42P01", "message": 'relation "public.idempotency_keys" does not exist'})
+        with patch.object(FakeQuery, "execute", side_effect=missing):
+            with self.assertRaises(APIError):
+                idempotency_store.claim(self.db, "links/generate:k2", "h")
+
+    def seed_links(self, count, campaign, source="whatsapp", day="2026-03-01"):
+        for _ in range(count):
+            n = len(self.db.tables["links"]) + 1
+            self.db.tables["links"].append({
+                "id": f"lnk_{n:06d}",
+                "link_type": "captacao",
+                "base_url": "https://vicio.com",
+                "path": "",
+                "full_url": f"https://vicio.com/?utm_id=lnk_{n:06d}",
+                "utm_source": source,
+                "utm_medium": "api_disparos",
+                "utm_campaign": campaign,
+                "created_by": "admin",
+                "created_at": f"{day}T12:00:00",
+                "fingerprint": f"fp{n}",
+            })
+
+    def test_bulk_delete_by_filter_runs_in_batches(self):
+        self.seed_links(450, "teste_lancamento")
+        self.seed_links(3, "teste_lancamento", source="email")
+        self.seed_links(2, "vde1f_120d_evento_0326")
+        with patch.object(main, "LINK_BULK_PAGE", 100):
+            resp = self.client.post("/links/bulk", json={"action": "delete", "utm_campaign": "teste_lancamento", "utm_source": "whatsapp"})
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual((body["matched"], body["affected"]), (450, 450))
+        remaining = {l["utm_source"] for l in self.db.tables["links"]}
+        self.assertEqual(len(self.db.tables["links"]), 5)
+        self.assertEqual(remaining, {"email", "whatsapp"})
+        # One audit insert for the whole call, one version bump.
+        self.assertEqual(len(self.db.tables["audits"]), 450)
+        self.assertEqual({a["seq"] for a in self.db.tables["audits"]}, {body["token"]})
+        self.assertEqual(self.db.rpc_calls.count("increment_link_counter"), 1)
+
+        changes = self.client.get("/links/changes", params={"since": body["token"] - 1}).json()
+        self.assertEqual(len(changes["deleted"]), 450)
+
+    def test_bulk_archive_by_ids_and_date_range(self):
+        self.seed_links(2, "teste", day="2026-01-10")
+        self.seed_links(2, "teste", day="2026-02-10")
+        resp = self.client.post("/links/bulk", json={
+            "action": "archive",
+            "ids": ["lnk_000001", "lnk_000003", "lnk_000004", "lnk_999999"],
+            "created_from": "2026-02-01T00:00:00",
+        })
+        self.assertEqual(resp.json()["affected"], 2)
+        archived = [l["id"] for l in self.db.tables["links"] if l.get("status") == "archived"]
+        self.assertEqual(archived, ["lnk_000003", "lnk_000004"])
+        self.assertIsNone(self.db.tables["links"][2]["fingerprint"])
+
+        listed = [l["id"] for l in self.client.get("/links").json()]
+        self.assertEqual(sorted(listed), ["lnk_000001", "lnk_000002"])
+        only_archived = [l["id"] for l in self.client.get("/links", params={"status": "archived"}).json()]
+        self.assertEqual(sorted(only_archived), ["lnk_000003", "lnk_000004"])
+
+        again = self.client.post("/links/bulk", json={"action": "archive", "ids": ["lnk_000003"]}).json()
+        self.assertEqual(again["affected"], 0)
+
+    def test_bulk_requires_ids_or_filter(self):
+        self.seed_links(1, "teste")
+        self.assertEqual(self.client.post("/links/bulk", json={"action": "delete"}).status_code, 400)
+        self.assertEqual(len(self.db.tables["links"]), 1)
+
+    def test_old_links_move_to_archive_and_stay_resolvable(self):
+        self.seed_links(3, "lancamento_antigo", day="2023-05-01")
+        self.seed_links(2, "lancamento_novo", day=datetime.utcnow().date().isoformat())
+        since = self.client.get("/links/changes", params={"since": 0}).json()["token"]
+        with patch("backend.app.archive.LINK_ARCHIVE_BATCH", 2), patch("backend.app.archive.link_events.publish") as publish:
+            resp = self.client.post("/links/archive/run", params={"older_than_days": 365})
+        self.assertEqual(resp.json()["moved"], 3)
+        self.assertEqual(self.db.rpc_calls.count("archive_links"), 2)
+        self.assertEqual(len(self.db.tables["links_archive"]), 3)
+        self.assertEqual(sorted(c.args[1]["id"] for c in publish.call_args_list), ["lnk_000001", "lnk_000002", "lnk_000003"])
+        changes = self.client.get("/links/changes", params={"since": since}).json()
+        self.assertEqual(sorted(changes["deleted"]), ["lnk_000001", "lnk_000002", "lnk_000003"])
+        self.assertEqual({l["utm_campaign"] for l in self.client.get("/links").json()}, {"lancamento_novo"})
+
+        self.assertEqual(self.client.get("/links/lnk_000001").json()["utm_campaign"], "lancamento_antigo")
+        self.assertEqual(self.client.get("/links/lnk_000005").json()["utm_campaign"], "lancamento_novo")
+        self.assertEqual(self.client.get("/links/lnk_999999").status_code, 404)
+
+        export = self.client.get("/links/export")
+        self.assertEqual(export.status_code, 200)
+        self.assertIn("text/csv", export.headers["content-type"])
+        lines = export.text.strip().splitlines()
+        self.assertTrue(lines[0].startswith("ID,Tipo,Campaign"))
+        self.assertEqual([l.split(",")[0] for l in lines[1:]], ["lnk_000005", "lnk_000004", "lnk_000003", "lnk_000002", "lnk_000001"])
+        only_old = self.client.get("/links/export", params={"launch_id": "lancamento_antigo"}).text.strip().splitlines()
+        self.assertEqual(len(only_old), 4)
+
+    def test_link_qr_is_rendered_once_and_revalidated(self):
+        self.seed_links(1, "teste_lancamento")
+        with tempfile.TemporaryDirectory() as cache_dir, patch.object(main.qr_cache, "directory", cache_dir):
+            renders = main.qr_cache.stats["renders"]
+            first = self.client.get("/links/lnk_000001/qr")
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first.headers["content-type"], "image/png")
+            self.assertTrue(first.content.startswith(b"\x89PNG"))
+
+            again = self.client.get("/links/lnk_000001/qr")
+            self.assertEqual(again.content, first.content)
+            self.assertEqual(main.qr_cache.stats["renders"], renders + 1)
+            cached = self.client.get("/links/lnk_000001/qr", headers={"If-None-Match": first.headers["etag"]})
+            self.assertEqual(cached.status_code, 304)
+
+            svg = self.client.get("/links/lnk_000001/qr", params={"format": "svg", "scale": 4})
+            self.assertEqual(svg.headers["content-type"], "image/svg+xml")
+            self.assertNotEqual(svg.headers["etag"], first.headers["etag"])
+            self.assertEqual(main.qr_cache.stats["renders"], renders + 2)
+            self.assertEqual(self.client.get("/links/lnk_000001/qr", params={"scale": 99}).status_code, 422)
+            self.assertEqual(self.client.get("/links/lnk_999999/qr").status_code, 404)
+
+    def test_campaign_qr_zip_reuses_rendered_images(self):
+        self.seed_links(3, "teste_lancamento")
+        self.seed_links(2, "outro")
+        with tempfile.TemporaryDirectory() as cache_dir, patch.object(main.qr_cache, "directory", cache_dir):
+            renders = main.qr_cache.stats["renders"]
+            self.client.get("/links/lnk_000002/qr")
+            res = self.client.get("/links/qr.zip", params={"launch_id": "teste_lancamento"})
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.headers["content-type"], "application/zip")
+            with zipfile.ZipFile(io.BytesIO(res.content)) as archive:
+                names = sorted(archive.namelist())
+                manifest = archive.read("manifest.csv").decode().splitlines()
+            self.assertEqual(names, ["lnk_000001.png", "lnk_000002.png", "lnk_000003.png", "manifest.csv"])
+            self.assertEqual(len(manifest), 4)
+            # lnk_000002 was already on disk.
+            self.assertEqual(main.qr_cache.stats["renders"], renders + 3)
+
+            self.client.get("/links/qr.zip", params={"launch_id": "teste_lancamento"})
+            self.assertEqual(main.qr_cache.stats["renders"], renders + 3)
+            self.assertEqual(self.client.get("/links/qr.zip", params={"launch_id": "nada"}).status_code, 404)
+
+
+    def test_rewrite_moves_campaign_links_and_keeps_ids(self):
+        base = {
+            "link_type": "vendas", "base_url": "https://old.vicio.com", "path": "/vde1f",
+            "utm_medium": "api_disparos", "utm_campaign": "vde1f_120d_evento_0326", "custom_params": {"a": "1"},
+        }
+        links = [self.client.post("/links/generate", json={**base, "utm_source": s, "utm_content": "grupos"}).json() for s in ("whatsapp", "email")]
+        other = self.client.post("/links/generate", json={**base, "utm_campaign": "outra", "utm_source": "email"}).json()
+        token = int(self.client.get("/links").headers["x-change-token"])
+        self.db.tables["links"][0]["health_status"] = 404
+
+        self.assertEqual(self.client.post("/links/rewrite", json={"base_url": "https://new.vicio.com"}).status_code, 400)
+        preview = self.client.post("/links/rewrite", json={
+            "base_url": "https://new.vicio.com", "path": "/oferta", "utm_campaign": "vde1f_120d_evento_0326", "dry_run": True,
+        }).json()
+        self.assertEqual((preview["matched"], preview["rewritten"], preview["batches"]), (2, 2, 0))
+        self.assertTrue(preview["sample"][0]["new_url"].startswith("https://new.vicio.com/oferta?"))
+        self.assertNotIn("rewrite_link_urls", self.db.rpc_calls)
+
+        with patch.object(main, "LINK_REWRITE_BATCH", 1):
+            res = self.client.post("/links/rewrite", json={
+                "base_url": "https://new.vicio.com", "path": "/oferta", "utm_campaign": "vde1f_120d_evento_0326",
+            }).json()
+        self.assertEqual((res["matched"], res["rewritten"], res["batches"]), (2, 2, 2))
+
+        stored = {r["id"]: r for r in self.db.tables["links"]}
+        for link in links:
+            row = stored[link["id"]]
+            self.assertEqual(row["full_url"], link["full_url"].replace("https://old.vicio.com/vde1f", "https://new.vicio.com/oferta"))
+            self.assertEqual((row["base_url"], row["path"]), ("https://new.vicio.com", "/oferta"))
+            self.assertIsNone(row["health_status"])
+        self.assertTrue(stored[other["id"]]["full_url"].startswith("https://old.vicio.com/vde1f?"))
+        self.assertEqual(sorted(a["link_id"] for a in self.db.tables["audits"] if a["action"] == "rewrite"), sorted(l["id"] for l in links))
+
+        changes = self.client.get("/links/changes", params={"since": token}).json()
+        self.assertEqual({l["id"] for l in changes["created"]}, {l["id"] for l in links})
+        # The fingerprint follows the destination: generating the new URL reuses the link.
+        again = self.client.post("/links/generate", json={**base, "base_url": "https://new.vicio.com", "path": "/oferta", "utm_source": "email", "utm_content": "grupos"})
+        self.assertEqual(again.json()["id"], links[1]["id"])
+
 
 if __name__ == "__main__":
     unittest.main()
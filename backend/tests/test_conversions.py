@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend.app import conversions, main
+from backend.app.conversions import ConversionIngestor, LinkIndex, parse_hotmart_event
+
+
+def hotmart_payload(event_id, xcode, value=297.0, event="PURCHASE_APPROVED"):
+    return {
+        "id": event_id,
+        "event": event,
+        "creation_date": 1767225600000,
+        "data": {
+            "product": {"id": 123, "name": "VDE1F"},
+            "purchase": {
+                "transaction": f"HP{event_id}",
+                "status": "APPROVED",
+                "price": {"value": value, "currency_value": "BRL"},
+                "origin": {"xcod": xcode, "src": "whatsapp_grupos_antigos", "sck": "api_disparos"},
+            },
+        },
+    }
+
+
+class RecordingQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self._in = None
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def in_(self, key, values):
+        self._in = (key, set(values))
+        return self
+
+    def upsert(self, rows, **_kwargs):
+        if self.db.fail_writes > 0:
+            self.db.fail_writes -= 1
+            raise ConnectionError("database unreachable")
+        self.db.writes.append([r.copy() for r in rows])
+        return self
+
+    def execute(self):
+        self.db.queries.append(self.table)
+        if self._in:
+            key, values = self._in
+            return type("R", (), {"data": [l for l in self.db.links if l.get(key) in values]})()
+        return type("R", (), {"data": []})()
+
+
+class RecordingDB:
+    def __init__(self, links):
+        self.links = links
+        self.queries = []
+        self.writes = []
+        self.fail_writes = 0
+
+    def table(self, name):
+        return RecordingQuery(self, name)
+
+
+class ConversionParsingTests(unittest.TestCase):
+    def test_parse_hotmart_payload(self):
+        row = parse_hotmart_event(hotmart_payload("evt-1", "lnk_000042"))
+        self.assertEqual(row["event_id"], "evt-1")
+        self.assertEqual(row["xcode"], "lnk_000042")
+        self.assertEqual(row["src"], "whatsapp_grupos_antigos")
+        self.assertEqual(row["amount"], 297.0)
+        self.assertEqual(row["product_id"], "123")
+        self.assertTrue(row["occurred_at"].startswith("2026-01-01"))
+
+    def test_parse_rejects_payload_without_identity(self):
+        self.assertIsNone(parse_hotmart_event({"data": {}}))
+
+
+class ConversionIngestorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_events_are_batched_and_matched_by_xcode(self):
+        db = RecordingDB([{"id": "lnk_000002", "xcode": "lnk_000002", "utm_campaign": "camp_b"}])
+        index = LinkIndex()
+        index.add({"id": "lnk_000001", "xcode": "lnk_000001", "utm_campaign": "camp_a"})
+        ingestor = ConversionIngestor(index, batch_size=100, flush_ms=50)
+
+        for i, xcode in enumerate(["lnk_000001", "lnk_000002", "unknown", "lnk_000001"]):
+            self.assertTrue(ingestor.submit(db, parse_hotmart_event(hotmart_payload(f"evt-{i}", xcode))))
+        # Duplicate delivery of the same event.
+        ingestor.submit(db, parse_hotmart_event(hotmart_payload("evt-0", "lnk_000001")))
+        await ingestor.stop()
+
+        self.assertEqual(len(db.writes), 1)
+        rows = {r["event_id"]: r for r in db.writes[0]}
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows["evt-0"]["link_id"], "lnk_000001")
+        self.assertEqual(rows["evt-1"]["utm_campaign"], "camp_b")
+        self.assertIsNone(rows["evt-2"]["link_id"])
+        # One lookup for the misses of the batch (the archive only for what is
+        # still unknown), then the write.
+        self.assertEqual(db.queries, ["links", "links_archive", "conversions"])
+        self.assertEqual(ingestor.stats["unmatched"], 1)
+
+    async def test_full_queue_rejects(self):
+        ingestor = ConversionIngestor(LinkIndex(), queue_size=1, flush_ms=50)
+        db = RecordingDB([])
+        self.assertTrue(ingestor.submit(db, parse_hotmart_event(hotmart_payload("a", "x"))))
+        self.assertFalse(ingestor.submit(db, parse_hotmart_event(hotmart_payload("b", "x"))))
+        self.assertEqual(ingestor.stats["rejected"], 1)
+        await ingestor.stop()
+
+    async def test_failed_batches_are_retried_until_written(self):
+        db = RecordingDB([])
+        db.fail_writes = 3
+        with patch.object(conversions, "CONVERSION_RETRY_BASE_SECONDS", 0.01):
+            ingestor = ConversionIngestor(LinkIndex(), flush_ms=10, spill_dir=tempfile.mkdtemp())
+            for i in range(2):
+                ingestor.submit(db, parse_hotmart_event(hotmart_payload(f"evt-{i}", "x")))
+            await ingestor.stop()
+        self.assertEqual(ingestor.stats["retries"], 3)
+        self.assertEqual(ingestor.stats["persisted"], 2)
+        self.assertEqual(sorted(r["event_id"] for r in db.writes[0]), ["evt-0", "evt-1"])
+
+    async def test_unwritten_events_are_spilled_and_replayed(self):
+        spill_dir = tempfile.mkdtemp()
+        down = RecordingDB([])
+        down.fail_writes = 10**6
+        ingestor = ConversionIngestor(LinkIndex(), flush_ms=10, batch_size=2, spill_dir=spill_dir)
+        for i in range(3):
+            ingestor.submit(down, parse_hotmart_event(hotmart_payload(f"evt-{i}", "x")))
+        await ingestor.stop(timeout=0.1)
+        self.assertEqual(ingestor.stats["spilled"], 3)
+        self.assertEqual(len(os.listdir(spill_dir)), 1)
+
+        up = RecordingDB([])
+        replay = ConversionIngestor(LinkIndex(), flush_ms=10, spill_dir=spill_dir)
+        replay.start(up)
+        await replay.stop()
+        self.assertEqual(replay.stats["replayed"], 3)
+        self.assertEqual(sorted(r["event_id"] for batch in up.writes for r in batch), ["evt-0", "evt-1", "evt-2"])
+        self.assertEqual(os.listdir(spill_dir), [])
+
+
+class HotmartWebhookTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_webhook_acknowledges_without_db_access(self):
+        with patch("backend.app.main.get_db") as get_db, patch.object(main.conversion_ingestor, "submit", return_value=True) as submit, \
+                patch.object(main, "HOTMART_HOTTOK", "secret"):
+            resp = self.client.post("/webhooks/hotmart", json=hotmart_payload("evt-9", "lnk_000009"), headers={"X-HOTMART-HOTTOK": "secret"})
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["event_id"], "evt-9")
+        self.assertEqual(submit.call_args.args[1]["xcode"], "lnk_000009")
+        get_db.return_value.table.assert_not_called()
+
+    def test_webhook_checks_hottok_and_backpressure(self):
+        with patch.object(main, "HOTMART_HOTTOK", None):
+            self.assertEqual(self.client.post("/webhooks/hotmart", json=hotmart_payload("e", "x")).status_code, 503)
+        with patch.object(main, "HOTMART_HOTTOK", "secret"):
+            self.assertEqual(self.client.post("/webhooks/hotmart", json=hotmart_payload("e", "x")).status_code, 401)
+            wrong = self.client.post("/webhooks/hotmart", json=hotmart_payload("e", "x"), headers={"X-HOTMART-HOTTOK": "secreT"})
+            self.assertEqual(wrong.status_code, 401)
+            with patch("backend.app.main.get_db"), patch.object(main.conversion_ingestor, "submit", return_value=False):
+                full = self.client.post("/webhooks/hotmart", json=hotmart_payload("e", "x"), headers={"X-HOTMART-HOTTOK": "secret"})
+        self.assertEqual(full.status_code, 503)
+        self.assertIn("retry-after", full.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
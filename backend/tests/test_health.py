@@ -0,0 +1,213 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.cache import reset_caches
+from backend.app.health import HealthChecker, destination_of, health_checker
+from backend.app.jobs import job_runner
+from backend.app.models import TokenData
+from backend.tests.standin import running_standin
+
+
+class DestinationHandler(BaseHTTPRequestHandler):
+    """/ok 200, /missing 404, /nohead 405 on HEAD, /slow/* 200 after 50 ms,
+    /to-ok 302 to /ok, /to-metadata 302 to the cloud metadata address."""
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    hits = Counter()
+    active = 0
+    max_active = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        if self.command == "GET":
+            self.wfile.write(b"ok")
+
+    def do_HEAD(self):
+        self.route()
+
+    def do_GET(self):
+        self.route()
+
+    def route(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits[(self.command, self.path.split("?")[0])] += 1
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            if self.path.startswith("/to-"):
+                target = "/ok" if self.path.startswith("/to-ok") else "http://169.254.169.254/latest/meta-data/"
+                self.send_response(302)
+                self.send_header("Location", target)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.path.startswith("/slow/"):
+                time.sleep(0.05)
+                return self._answer(200)
+            if self.path.startswith("/ok"):
+                return self._answer(200)
+            if self.path.startswith("/nohead"):
+                return self._answer(405 if self.command == "HEAD" else 200)
+            return self._answer(404)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class DestinationServerMixin:
+    def start_destinations(self):
+        DestinationHandler.hits = Counter()
+        DestinationHandler.active = DestinationHandler.max_active = 0
+        self.site = ThreadingHTTPServer(("127.0.0.1", 0), DestinationHandler)
+        self.site.daemon_threads = True
+        threading.Thread(target=self.site.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.site.server_port}"
+        self.addCleanup(self.site.server_close)
+        self.addCleanup(self.site.shutdown)
+
+
+class HealthCheckerTests(DestinationServerMixin, unittest.TestCase):
+    def setUp(self):
+        self.start_destinations()
+
+    def test_statuses_fallback_and_unreachable_hosts(self):
+        dead = f"http://127.0.0.1:{free_port()}/"
+        urls = [f"{self.base}/ok", f"{self.base}/missing", f"{self.base}/nohead", dead]
+        results = asyncio.run(HealthChecker(timeout_seconds=2, allow_private=True).check_all(urls))
+
+        self.assertEqual(results[f"{self.base}/ok"]["health_status"], 200)
+        self.assertIsNone(results[f"{self.base}/ok"]["health_error"])
+        self.assertEqual(results[f"{self.base}/missing"]["health_status"], 404)
+        self.assertTrue(results[f"{self.base}/missing"]["health_error"])
+        self.assertEqual(results[f"{self.base}/nohead"]["health_status"], 200)
+        self.assertEqual(DestinationHandler.hits[("GET", "/nohead")], 1)
+        self.assertIsNone(results[dead]["health_status"])
+        self.assertIn("ConnectError", results[dead]["health_error"])
+        self.assertTrue(all(r["health_ms"] >= 0 for r in results.values()))
+
+    def test_per_host_limit_and_ttl_cache(self):
+        checker = HealthChecker(per_host=2, concurrency=10, allow_private=True)
+        urls = [f"{self.base}/slow/{i}" for i in range(8)]
+        asyncio.run(checker.check_all(urls))
+        self.assertEqual(DestinationHandler.max_active, 2)
+        self.assertEqual(sum(DestinationHandler.hits.values()), 8)
+
+        asyncio.run(checker.check_all(urls))
+        self.assertEqual(sum(DestinationHandler.hits.values()), 8)
+        self.assertEqual(checker.stats["cached"], 8)
+
+    def test_private_addresses_and_redirects_to_them_are_refused(self):
+        class LoopbackTestServer(HealthChecker):
+            # Only the local test server is let through the address check.
+            async def blocked(self, url):
+                if urlsplit(url).hostname == "127.0.0.1" and urlsplit(url).path.startswith("/to-"):
+                    return None
+                return await super().blocked(url)
+
+        urls = [f"{self.base}/ok", f"{self.base}/to-metadata", "http://169.254.169.254/latest/meta-data/", "http://[::1]/"]
+        results = asyncio.run(LoopbackTestServer(timeout_seconds=2).check_all(urls))
+        self.assertEqual(results[f"{self.base}/ok"]["health_error"], "Blocked non-public address 127.0.0.1")
+        self.assertEqual(results[f"{self.base}/to-metadata"]["health_error"], "Blocked non-public address 169.254.169.254")
+        self.assertIsNone(results[f"{self.base}/to-metadata"]["health_status"])
+        self.assertIn("Blocked", results["http://169.254.169.254/latest/meta-data/"]["health_error"])
+        self.assertIn("Blocked", results["http://[::1]/"]["health_error"])
+        self.assertNotIn(("HEAD", "/ok"), DestinationHandler.hits)
+
+        followed = asyncio.run(HealthChecker(timeout_seconds=2, allow_private=True).check_all([f"{self.base}/to-ok"]))
+        self.assertEqual(followed[f"{self.base}/to-ok"]["health_status"], 200)
+        self.assertEqual(DestinationHandler.hits[("HEAD", "/ok")], 1)
+
+    def test_destination_strips_only_tracking_params(self):
+        self.assertEqual(
+            destination_of("https://Vicio.com/vendas?utm_source=email&utm_id=lnk_1"),
+            destination_of("https://vicio.com/vendas?utm_source=meta&utm_id=lnk_2"),
+        )
+        self.assertEqual(
+            destination_of("https://pay.hotmart.com/X1?off=abc&xcode=lnk_3&src=meta_ads&sck=feed&utm_campaign=c"),
+            "https://pay.hotmart.com/X1?off=abc",
+        )
+
+
+class LinkHealthApiTests(DestinationServerMixin, unittest.TestCase):
+    def setUp(self):
+        reset_caches()
+        health_checker.clear()
+        allow = patch.object(health_checker, "allow_private", True)
+        allow.start()
+        self.addCleanup(allow.stop)
+        self.start_destinations()
+        self.db = self.enterContext(running_standin()).db
+
+        user = TokenData(username="admin", role="admin")
+        for dependency in (main.get_current_active_user, main.require_editor, main.require_admin):
+            main.app.dependency_overrides[dependency] = lambda: user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        for patcher in (
+            patch("backend.app.main.get_db", return_value=self.db),
+            patch.object(main.app.router, "on_startup", []),
+            patch.object(main.app.router, "on_shutdown", [job_runner.stop]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def test_health_check_job_stores_results_on_links(self):
+        rows = [
+            {"id": f"lnk_{i}", "full_url": f"{self.base}/ok?utm_source=s{i}", "utm_campaign": "c1", "utm_source": f"s{i}",
+             "utm_medium": "m", "link_type": "captacao", "base_url": self.base, "path": "/ok", "created_by": "t"}
+            for i in range(5)
+        ]
+        rows.append({**rows[0], "id": "lnk_bad", "full_url": f"{self.base}/missing?utm_source=s0", "path": "/missing"})
+        rows.append({**rows[0], "id": "lnk_other", "utm_campaign": "c2", "full_url": f"{self.base}/slow/x"})
+        self.db.table("links").insert(rows).execute()
+
+        submitted = self.client.post("/links/health-check", json={"utm_campaign": "c1"})
+        self.assertEqual(submitted.status_code, 202)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            job = self.client.get(f"/jobs/{submitted.json()['id']}").json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.02)
+        self.assertEqual(job["status"], "done", job["error"])
+        self.assertEqual(job["result"]["links"], 6)
+        self.assertEqual(job["result"]["destinations"], 2)
+        self.assertEqual(job["result"]["broken"], [f"{self.base}/missing"])
+        # Five links behind one destination: one request.
+        self.assertEqual(DestinationHandler.hits[("HEAD", "/ok")], 1)
+        self.assertNotIn(("HEAD", "/slow/x"), DestinationHandler.hits)
+
+        links = {l["id"]: l for l in self.client.get("/links", params={"launch_id": "c1"}).json()}
+        self.assertEqual(links["lnk_3"]["health_status"], 200)
+        self.assertIsNotNone(links["lnk_3"]["health_checked_at"])
+        self.assertEqual(links["lnk_bad"]["health_status"], 404)
+        self.assertTrue(links["lnk_bad"]["health_error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend.app import jobs, main
+from backend.app.cache import reset_caches
+from backend.app.jobs import job_runner
+from backend.app.models import TokenData
+from backend.tests.standin import running_standin
+
+
+class JobApiTests(unittest.TestCase):
+    def setUp(self):
+        reset_caches()
+        self.db = self.enterContext(running_standin()).db
+
+        user = TokenData(username="admin", role="admin")
+        for dependency in (main.get_current_active_user, main.require_editor, main.require_admin):
+            main.app.dependency_overrides[dependency] = lambda: user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        for patcher in (
+            patch("backend.app.main.get_db", return_value=self.db),
+            patch.object(jobs, "PROGRESS_FLUSH_SECONDS", 0),
+            # Skip seeding/background loops; the jobs run on the client's loop.
+            patch.object(main.app.router, "on_startup", []),
+            patch.object(main.app.router, "on_shutdown", [job_runner.stop]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def wait_for(self, job_id, statuses, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(f"/jobs/{job_id}").json()
+            if job["status"] in statuses:
+                return job
+            time.sleep(0.02)
+        self.fail(f"job {job_id} still {job['status']}")
+
+    def test_bulk_archive_runs_as_job(self):
+        self.db.table("links").insert([
+            {"id": f"lnk_{i:03d}", "full_url": f"https://vicio.com/?i={i}", "utm_campaign": "c1", "utm_source": "email"}
+            for i in range(450)
+        ]).execute()
+
+        submitted = self.client.post("/jobs", json={"kind": "links.bulk", "params": {"action": "archive", "utm_campaign": "c1"}})
+        self.assertEqual(submitted.status_code, 202)
+        self.assertEqual(submitted.json()["status"], "queued")
+
+        job = self.wait_for(submitted.json()["id"], {"done", "failed"})
+        self.assertEqual(job["status"], "done", job["error"])
+        self.assertEqual((job["progress"], job["total"]), (450, 450))
+        self.assertEqual(job["result"]["affected"], 450)
+        archived = self.db.table("links").select("id").eq("status", "archived").execute().data
+        self.assertEqual(len(archived), 450)
+        self.assertEqual(self.client.get("/jobs", params={"status": "done"}).json()[0]["id"], job["id"])
+
+    def test_running_job_stops_when_cancelled(self):
+        started = threading.Event()
+
+        def endless(db, params, job):
+            started.set()
+            done = 0
+            while not job.cancelled:
+                done += 1
+                job.progress(done)
+                time.sleep(0.01)
+            return {"steps": done}
+
+        job_runner.register("test.endless", endless)
+        self.addCleanup(job_runner.handlers.pop, "test.endless")
+
+        job_id = self.client.post("/jobs", json={"kind": "test.endless"}).json()["id"]
+        self.assertTrue(started.wait(5))
+        self.assertEqual(self.client.post(f"/jobs/{job_id}/cancel").json()["cancel_requested"], True)
+        job = self.wait_for(job_id, {"cancelled", "done"})
+        self.assertEqual(job["status"], "cancelled")
+        self.assertGreater(job["result"]["steps"], 0)
+
+    def test_rejects_unknown_kinds_and_bad_params(self):
+        self.assertEqual(self.client.post("/jobs", json={"kind": "nope"}).status_code, 400)
+        bad = self.client.post("/jobs", json={"kind": "links.bulk", "params": {"action": "explode"}})
+        self.assertEqual(bad.status_code, 422)
+        self.assertEqual(self.client.get("/jobs/job_missing").status_code, 404)
+
+    def test_jobs_of_a_dead_worker_are_failed(self):
+        stale = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+        self.db.table("jobs").insert({"id": "job_old", "kind": "links.bulk", "status": "running", "updated_at": stale}).execute()
+        self.assertEqual(job_runner.reap(self.db), 1)
+        job = self.client.get("/jobs/job_old").json()
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("Worker stopped", job["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
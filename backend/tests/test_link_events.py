@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+import unittest
+
+from backend.app.events import LinkEventBroker
+
+
+async def never_disconnected():
+    return False
+
+
+def parse_frame(frame):
+    lines = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+    return lines["event"], json.loads(lines["data"])
+
+
+class LinkEventBrokerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_subscribers_receive_published_events(self):
+        broker = LinkEventBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish("created", {"token": 1, "link": {"id": "lnk_000001"}})
+
+        for sub in (first, second):
+            event, data = sub.queue.get_nowait()
+            self.assertEqual(event, "created")
+            self.assertEqual(data["link"]["id"], "lnk_000001")
+
+    async def test_slow_subscriber_gets_single_resync(self):
+        broker = LinkEventBroker(queue_size=3)
+        slow = broker.subscribe()
+        for i in range(10):
+            broker.publish("deleted", {"token": i, "id": f"lnk_{i:06d}"})
+
+        self.assertTrue(slow.overflowed)
+        self.assertEqual(slow.queue.qsize(), 1)
+        self.assertEqual(slow.queue.get_nowait()[0], "resync")
+
+    async def test_stream_sends_heartbeat_events_and_unsubscribes(self):
+        broker = LinkEventBroker()
+        sub = broker.subscribe()
+        frames = broker.stream(sub, never_disconnected, heartbeat=0.01)
+
+        self.assertTrue((await anext(frames)).startswith("retry:"))
+        self.assertEqual(await anext(frames), ": ping\n\n")
+
+        broker.publish("deleted", {"token": 7, "id": "lnk_000007"})
+        self.assertEqual(parse_frame(await anext(frames)), ("deleted", {"token": 7, "id": "lnk_000007"}))
+
+        await frames.aclose()
+        self.assertEqual(broker.subscriber_count, 0)
+
+    async def test_publish_from_worker_thread(self):
+        broker = LinkEventBroker()
+        sub = broker.subscribe()
+        thread = threading.Thread(target=broker.publish, args=("created", {"token": 2}))
+        thread.start()
+        thread.join()
+
+        event, data = await asyncio.wait_for(sub.queue.get(), timeout=1)
+        self.assertEqual((event, data), ("created", {"token": 2}))
+
+
+if __name__ == "__main__":
+    unittest.main()
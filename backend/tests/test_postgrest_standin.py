@@ -0,0 +1,127 @@
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from backend.app import main
+from backend.app.cache import reset_caches
+from backend.app.idempotency import idempotency_store
+from backend.app.local_store import LocalStore
+from backend.postgrest_standin import StandinConfig
+from backend.tests.standin import running_standin
+
+
+class PostgrestStandinTests(unittest.TestCase):
+    def setUp(self):
+        self.store = LocalStore()
+        self.config = StandinConfig()
+        self.url, self.db = self.enterContext(running_standin(self.store, self.config))
+
+    def test_crud_through_supabase_client(self):
+        links = self.db.table("links")
+        links.insert([
+            {"id": "lnk_000001", "utm_campaign": "a", "utm_source": "email", "full_url": "u1", "created_at": "2026-01-01T00:00:00"},
+            {"id": "lnk_000002", "utm_campaign": "a", "utm_source": "whats,app", "full_url": "u2", "created_at": "2026-01-02T00:00:00"},
+            {"id": "lnk_000003", "utm_campaign": "b", "utm_source": "email", "full_url": "u3", "created_at": "2026-01-03T00:00:00"},
+        ]).execute()
+
+        res = self.db.table("links").select("id,utm_source", count="exact").eq("utm_campaign", "a").order("created_at", desc=True).limit(1).execute()
+        self.assertEqual(res.data, [{"id": "lnk_000002", "utm_source": "whats,app"}])
+        self.assertEqual(res.count, 2)
+        self.assertEqual(self.store.tables["links"][0]["status"], "active")  # column default
+
+        quoted = self.db.table("links").select("id").in_("utm_source", ["whats,app", "nope"]).execute()
+        self.assertEqual([r["id"] for r in quoted.data], ["lnk_000002"])
+        self.assertEqual(len(self.db.table("links").select("id").neq("status", "archived").gte("created_at", "2026-01-02").execute().data), 2)
+
+        updated = self.db.table("links").update({"status": "archived"}).in_("id", ["lnk_000001", "lnk_000003"]).execute()
+        self.assertEqual(len(updated.data), 2)
+        deleted = self.db.table("links").delete().eq("utm_campaign", "b").execute()
+        self.assertEqual([r["id"] for r in deleted.data], ["lnk_000003"])
+
+        with self.assertRaises(APIError) as ctx:
+            self.db.table("links").insert({"id": "lnk_000001", "full_url": "dup"}).execute()
+        self.assertEqual(ctx.exception.code, "23505")
+
+        self.db.table("settings").upsert({"id": "x", "count": 5}).execute()
+        self.db.table("settings").upsert({"id": "x", "count": 7}).execute()
+        self.assertEqual(self.db.table("settings").select("*").execute().data, [{"id": "x", "count": 7}])
+        self.db.table("conversions").upsert([{"event_id": "e1"}], on_conflict="event_id", ignore_duplicates=True).execute()
+        self.db.table("conversions").upsert([{"event_id": "e1", "status": "changed"}], on_conflict="event_id", ignore_duplicates=True).execute()
+        self.assertIsNone(self.store.tables["conversions"][0].get("status"))
+
+        self.assertEqual(self.db.rpc("increment_link_counter", {"row_id": "link_counter"}).execute().data, 1)
+        self.assertEqual(self.db.rpc("increment_link_counter_by", {"row_id": "link_counter", "amount": 10}).execute().data, 11)
+
+    def test_link_search_is_indexed_and_ranked(self):
+        self.store.insert("links", [
+            {"id": "lnk_000001", "utm_campaign": "vde1f_evento_0326", "created_at": "2026-01-01"},
+            {"id": "lnk_000002", "utm_campaign": "vde1f_evento", "utm_term": "x0326y", "created_at": "2026-01-03"},
+            {"id": "lnk_000003", "utm_campaign": "outra", "notes": "Evento 0326 remarcado", "created_at": "2026-01-02"},
+            {"id": "lnk_000004", "utm_campaign": "vde1f_evento_0326", "status": "archived", "created_at": "2026-01-04"},
+            {"id": "lnk_000326", "utm_campaign": "outra", "created_at": "2026-01-05"},
+        ])
+        search = lambda **args: [r["id"] for r in self.db.rpc("search_links", args).execute().data]
+
+        # Whole-word matches first (newest first), then partial ones.
+        self.assertEqual(search(q="0326"), ["lnk_000003", "lnk_000001", "lnk_000326", "lnk_000002"])
+        self.assertEqual(search(q="0326", page_size=2, page_offset=2), ["lnk_000326", "lnk_000002"])
+        self.assertEqual(search(q="0326", link_status="archived"), ["lnk_000004"])
+        self.assertEqual(search(q="EVENTO_0", campaign="vde1f_evento_0326"), ["lnk_000001"])
+        self.assertEqual(search(q="0327"), [])
+
+        # The index follows updates and deletes.
+        self.db.table("links").update({"notes": None}).eq("id", "lnk_000003").execute()
+        self.db.table("links").delete().eq("id", "lnk_000326").execute()
+        self.assertEqual(search(q="0326"), ["lnk_000001", "lnk_000002"])
+        index = self.store._search["links"]
+        self.assertEqual({index.rows[key]["id"] for key in index.postings["326"]}, {"lnk_000001", "lnk_000002", "lnk_000004"})
+
+    def test_error_and_latency_injection(self):
+        httpx.post(f"{self.url}/_standin/config", json={"error_rate": 1, "error_status": 500})
+        with self.assertRaises(APIError):
+            self.db.table("links").select("*").execute()
+        stats = httpx.post(f"{self.url}/_standin/config", json={"error_rate": 0, "latency_ms": 1}).json()
+        self.assertEqual(stats["injected_errors"], 1)
+        self.assertEqual(stats["latency_ms"], 1.0)
+        self.assertEqual(self.db.table("links").select("*").execute().data, [])
+
+    def test_api_end_to_end_over_http(self):
+        reset_caches()
+        idempotency_store.clear()
+        main.app.dependency_overrides[main.require_editor] = lambda: {"username": "admin", "role": "admin"}
+        main.app.dependency_overrides[main.get_current_active_user] = lambda: {"username": "admin", "role": "admin"}
+        try:
+            with patch("backend.app.main.get_db", return_value=self.db):
+                client = TestClient(main.app)
+                payload = {
+                    "link_type": "vendas",
+                    "base_url": "https://checkout.exemplo.com",
+                    "utm_source": "whatsapp",
+                    "utm_medium": "api_disparos",
+                    "utm_campaign": "vde1f_120d_evento_0326",
+                    "utm_content": "grupos_antigos",
+                }
+                created = client.post("/links/generate", json=payload).json()
+                self.assertEqual(created["id"], "lnk_000001")
+                self.assertEqual(client.post("/links/generate", json=payload).headers.get("x-link-reused"), "true")
+                listed = client.get("/links", params={"launch_id": created["utm_campaign"]})
+                self.assertEqual([l["id"] for l in listed.json()], ["lnk_000001"])
+
+                found = client.get("/links", params={"q": " GRUPOS_ant "})
+                self.assertEqual([l["id"] for l in found.json()], ["lnk_000001"])
+                self.assertEqual(client.get("/links", params={"q": "grupos", "status": "archived"}).json(), [])
+                self.assertEqual(client.get("/links", params={"q": "gr"}).status_code, 400)
+
+                bulk = client.post("/links/bulk", json={"action": "delete", "utm_campaign": "vde1f_120d_evento_0326"}).json()
+                self.assertEqual(bulk["affected"], 1)
+                self.assertEqual(client.get("/links").json(), [])
+                self.assertEqual(len(self.store.tables["audits"]), 2)
+        finally:
+            main.app.dependency_overrides = {}
+
+
+if __name__ == "__main__":
+    unittest.main()
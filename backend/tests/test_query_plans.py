@@ -0,0 +1,180 @@
+"""EXPLAIN checks for the link access paths against a real Postgres.
+
+Uses TEST_DATABASE_URL when set (a throwaway database is created on that
+server), otherwise a temporary `pgserver` instance if that package is
+installed; skipped when neither is available or psycopg2 is missing.
+"""
+import glob
+import itertools
+import json
+import os
+import re
+import tempfile
+import unittest
+import uuid
+
+try:
+    import psycopg2
+except ImportError:  # pragma: no cover - optional test dependency
+    psycopg2 = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROWS = int(os.getenv("QUERY_PLAN_ROWS", "200000"))
+LINK_FILTERS = ("utm_campaign", "utm_source", "utm_medium", "link_type")
+
+
+def admin_dsn():
+    if os.getenv("TEST_DATABASE_URL"):
+        return os.environ["TEST_DATABASE_URL"], None
+    try:
+        import pgserver
+    except ImportError:
+        return None, None
+    server = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="stop")
+    return server.get_uri(), server
+
+
+def load_sql(cur, path):
+    sql = open(path).read()
+    # Extensions may be missing on a bare local server; only the trigram
+    # search index needs one, and it is left out (its test is skipped).
+    for statement in re.findall(r"(?m)^create extension.*$", sql):
+        try:
+            cur.execute(statement)
+        except psycopg2.Error:
+            pass
+    sql = re.sub(r"(?m)^create extension.*$", "", sql)
+    if not has_extension(cur, "pg_trgm"):
+        sql = re.sub(r"(?m)^create index[^;]*_trgm_ops[^;]*;", "", sql)
+    if re.sub(r"(?m)^--.*$", "", sql).strip():
+        cur.execute(sql)
+
+
+def has_extension(cur, name):
+    cur.execute("select 1 from pg_extension where extname = %s", (name,))
+    return cur.fetchone() is not None
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@unittest.skipIf(psycopg2 is None, "psycopg2 not installed")
+class QueryPlanTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dsn, cls.server = admin_dsn()
+        if dsn is None:
+            raise unittest.SkipTest("no TEST_DATABASE_URL and pgserver not installed")
+        cls.admin = psycopg2.connect(dsn)
+        cls.admin.autocommit = True
+        cls.dbname = f"viciolinks_plans_{uuid.uuid4().hex[:8]}"
+        cls.admin.cursor().execute(f"create database {cls.dbname}")
+
+        cls.conn = psycopg2.connect(dsn, dbname=cls.dbname)
+        cls.conn.autocommit = True
+        cur = cls.conn.cursor()
+        load_sql(cur, os.path.join(BACKEND_DIR, "schema.sql"))
+        for migration in sorted(glob.glob(os.path.join(BACKEND_DIR, "migrations", "*.sql"))):
+            load_sql(cur, migration)
+        cls.seed(cur)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.admin.cursor().execute(f"drop database if exists {cls.dbname}")
+        cls.admin.close()
+
+    @classmethod
+    def seed(cls, cur):
+        # Roughly the shape of production: many campaigns, a dozen sources,
+        # a few dozen mediums, two link types, three years of history.
+        cur.execute(
+            """
+            insert into public.links (
+              id, link_type, base_url, path, full_url, utm_source, utm_medium,
+              utm_campaign, utm_content, utm_term, xcode, created_by, created_at, status, short_code
+            )
+            select
+              'lnk_' || lpad(n::text, 7, '0'),
+              case when mod(n, 10) < 3 then 'vendas' else 'captacao' end,
+              'https://vicio.com', '', 'https://vicio.com/?utm_id=' || n,
+              'source_' || (mod(n, 12)),
+              'medium_' || (mod(n, 40)),
+              'campaign_' || (mod(n, 400)),
+              'content_' || (mod(n, 25)),
+              'term_' || md5(n::text),
+              case when mod(n, 10) < 3 then 'lnk_' || lpad(n::text, 7, '0') end,
+              'seed',
+              now() - make_interval(mins => n * 8),
+              case when mod(n, 50) = 0 then 'archived' else 'active' end,
+              base62_encode(n)
+            from generate_series(1, %s) as n
+            """,
+            (ROWS,),
+        )
+        cur.execute(
+            """
+            insert into public.audits (event_id, link_id, actor, action, seq)
+            select 'evt_' || n, 'lnk_' || lpad(n::text, 7, '0'), 'seed', 'create', n
+            from generate_series(1, %s) as n
+            """,
+            (ROWS,),
+        )
+        cur.execute("analyze")
+
+    def explain(self, sql, params=()):
+        cur = self.conn.cursor()
+        cur.execute("explain (format json) " + sql, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def assert_no_seq_scan(self, sql, params=(), relation="links"):
+        plan = self.explain(sql, params)
+        scans = [n for n in plan_nodes(plan) if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == relation]
+        self.assertEqual(scans, [], f"sequential scan on {relation} for: {sql % tuple(params)}")
+
+    def test_list_links_filter_combinations_use_indexes(self):
+        # Mirrors main.filter_links_query + list_links ordering and limit.
+        values = {
+            "utm_campaign": "campaign_7",
+            "utm_source": "source_3",
+            "utm_medium": "medium_11",
+            "link_type": "vendas",
+        }
+        for size in range(len(LINK_FILTERS) + 1):
+            for combo in itertools.combinations(LINK_FILTERS, size):
+                where = [f"{column} = %s" for column in combo] + ["status <> 'archived'"]
+                sql = (
+                    "select * from public.links where " + " and ".join(where)
+                    + " order by created_at desc limit 100"
+                )
+                with self.subTest(filters=combo):
+                    self.assert_no_seq_scan(sql, [values[c] for c in combo])
+
+    def test_lookup_paths_use_indexes(self):
+        self.assert_no_seq_scan("select * from public.links where xcode in %s", (("lnk_0000010", "lnk_0000020"),))
+        self.assert_no_seq_scan("select * from public.links where short_code = %s", ("1z",))
+        self.assert_no_seq_scan("select * from public.audits where link_id = %s", ("lnk_0000042",), relation="audits")
+        self.assert_no_seq_scan("delete from public.audits where link_id = %s", ("lnk_0000042",), relation="audits")
+
+    def test_link_search_uses_trigram_index(self):
+        if not has_extension(self.conn.cursor(), "pg_trgm"):
+            self.skipTest("pg_trgm not available")
+        # Mirrors the query in search_links(); a plpgsql body is not EXPLAINed.
+        expression = "link_search_text(id, utm_campaign, utm_content, utm_term, notes)"
+        for term in ("lnk_0012345", "campaign_17", "a1b2"):
+            sql = (
+                f"select * from public.links where {expression} like %s and status <> 'archived'"
+                f" order by %s <<-> {expression}, created_at desc, id limit 50"
+            )
+            with self.subTest(term=term):
+                self.assert_no_seq_scan(sql, (f"%{term.replace('_', chr(92) + '_')}%", term))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from backend.app import main, resilience, snapshot
+from backend.app.cache import reset_caches
+from backend.app.resilience import BackendUnavailable, CircuitBreaker, ResilientClient
+from backend.postgrest_standin import StandinConfig
+from backend.tests.standin import running_standin
+
+
+class ResilientClientTests(unittest.TestCase):
+    def setUp(self):
+        self.config = StandinConfig()
+        standin = self.enterContext(running_standin(config=self.config))
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.2)
+        self.db = ResilientClient(standin.db, self.breaker)
+        patcher = patch.object(resilience, "SUPABASE_RETRY_BASE_MS", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_error_rate(self, rate):
+        self.config.update({"error_rate": rate})
+
+    def test_reads_retry_and_breaker_fails_fast(self):
+        self.set_error_rate(1)
+        with self.assertRaises(BackendUnavailable):
+            self.db.table("links").select("*").eq("id", "x").execute()
+        # One call plus SUPABASE_READ_RETRIES retries, then the breaker is open.
+        self.assertEqual(self.config.stats["requests"], 3)
+        self.assertEqual(self.breaker.state, "open")
+
+        with self.assertRaises(BackendUnavailable) as ctx:
+            self.db.table("links").select("*").execute()
+        self.assertEqual(self.config.stats["requests"], 3)
+        self.assertGreater(ctx.exception.retry_after, 0)
+        self.assertEqual(self.breaker.snapshot()["rejected"], 1)
+
+        # After the reset window one probe goes through and closes it.
+        self.set_error_rate(0)
+        time.sleep(0.25)
+        self.assertEqual(self.db.table("links").select("*").execute().data, [])
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_writes_are_not_retried_and_client_errors_do_not_trip(self):
+        self.set_error_rate(1)
+        with self.assertRaises(BackendUnavailable):
+            self.db.rpc("increment_link_counter", {"row_id": "link_counter"}).execute()
+        self.assertEqual(self.config.stats["requests"], 1)
+
+        self.set_error_rate(0)
+        self.db.table("links").insert({"id": "a", "full_url": "u"}).execute()
+        for _ in range(5):
+            with self.assertRaises(APIError):
+                self.db.table("links").insert({"id": "a", "full_url": "u"}).execute()
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class ApiOutageTests(unittest.TestCase):
+    def setUp(self):
+        reset_caches()
+        self.config = StandinConfig()
+        standin = self.enterContext(running_standin(config=self.config))
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+        self.db = ResilientClient(standin.db, self.breaker)
+        self.db.table("source_configs").insert({"slug": "email", "name": "Email", "config": {}}).execute()
+
+        for patcher in (
+            patch("backend.app.main.get_db", return_value=self.db),
+            patch.object(main, "supabase_breaker", self.breaker),
+            patch.object(resilience, "SUPABASE_RETRY_BASE_MS", 1),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        user = {"username": "admin", "role": "admin"}
+        for dependency in (main.get_current_active_user, main.require_editor, main.require_admin):
+            main.app.dependency_overrides[dependency] = lambda: user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.client = TestClient(main.app)
+
+    def test_outage_serves_cached_reads_and_503s_the_rest(self):
+        self.assertEqual(self.client.get("/source-configs").json()[0]["slug"], "email")
+
+        self.config.update({"error_rate": 1})
+        generate = self.client.post("/links/generate", json={
+            "link_type": "captacao", "base_url": "https://vicio.com", "utm_source": "email",
+            "utm_medium": "newsletter", "utm_campaign": "c", "utm_term": "10-03-2026",
+        })
+        self.assertEqual(generate.status_code, 503)
+        self.assertIn("retry-after", generate.headers)
+        self.assertEqual(self.breaker.state, "open")
+
+        # Reference data already cached by this worker keeps being served.
+        cached = self.client.get("/source-configs")
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.json()[0]["slug"], "email")
+        # Nothing cached for this query: fail fast.
+        self.assertEqual(self.client.get("/links", params={"utm_source": "email"}).status_code, 503)
+
+        metrics = self.client.get("/metrics").json()
+        self.assertEqual(metrics["database"]["state"], "open")
+        self.assertGreaterEqual(metrics["database"]["rejected"], 1)
+
+    def test_new_worker_starts_from_snapshot_during_outage(self):
+        path = os.path.join(tempfile.mkdtemp(), "snapshot.json")
+        self.assertIsNotNone(snapshot.write_snapshot(self.db, path))
+
+        # A fresh process: empty caches, database already down.
+        reset_caches()
+        self.config.update({"error_rate": 1})
+        self.assertIn("source_configs", snapshot.load_snapshot(path))
+        listing = self.client.get("/source-configs")
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(listing.json()[0]["slug"], "email")
+        self.assertEqual(self.config.stats["injected_errors"], 0)
+
+        # Still served once the poll is due and fails.
+        with patch.object(main.version_watcher, "poll_interval", 0.0):
+            self.assertEqual(self.client.get("/source-configs").status_code, 200)
+        self.assertGreater(self.config.stats["injected_errors"], 0)
+
+    def test_concurrent_snapshot_writers_leave_a_whole_file(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "snapshot.json")
+        snapshot.write_snapshot(self.db, path)
+        writers = [threading.Thread(target=snapshot.write_snapshot, args=(self.db, path)) for _ in range(8)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        self.assertEqual(os.listdir(directory), ["snapshot.json"])
+        reset_caches()
+        self.assertIn("source_configs", snapshot.load_snapshot(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
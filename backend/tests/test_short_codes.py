@@ -0,0 +1,35 @@
+import unittest
+
+from backend.app.utils import (
+    decode_short_code,
+    encode_short_code,
+    link_id_from_short_code,
+    short_code_for,
+)
+
+
+class ShortCodeTests(unittest.TestCase):
+    def test_round_trip(self):
+        for n in (0, 1, 61, 62, 123, 3843, 3844, 999_999, 1_000_000, 2**63 - 1):
+            with self.subTest(n=n):
+                self.assertEqual(decode_short_code(encode_short_code(n)), n)
+        self.assertEqual(encode_short_code(123), "1z")
+        self.assertEqual(len(encode_short_code(2**63 - 1)), 11)
+
+    def test_link_ids(self):
+        self.assertEqual(short_code_for("lnk_000123"), "1z")
+        self.assertEqual(link_id_from_short_code("1z"), "lnk_000123")
+        # Past six digits the id just grows; the code stays short and reversible.
+        self.assertEqual(link_id_from_short_code(short_code_for("lnk_12345678")), "lnk_12345678")
+        self.assertIsNone(short_code_for("lnk_a1b2c3"))
+
+    def test_rejects_non_codes(self):
+        for code in ("", "ab-c", "lnk_1", "z" * 12, "01z", "00", "z" * 11, encode_short_code(2**63)):
+            with self.subTest(code=code), self.assertRaises(ValueError):
+                decode_short_code(code)
+        with self.assertRaises(ValueError):
+            encode_short_code(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
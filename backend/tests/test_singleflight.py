@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.cache import reset_caches
+from backend.app.singleflight import SingleFlight, read_flight
+from backend.postgrest_standin import StandinConfig
+from backend.tests.standin import running_standin
+
+
+class SingleFlightTests(unittest.TestCase):
+    def run_concurrently(self, flight, callers, fn, key="k"):
+        barrier = threading.Barrier(callers)
+
+        def call():
+            barrier.wait()
+            try:
+                return flight.do(key, fn)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(callers) as pool:
+            return list(pool.map(lambda _: call(), range(callers)))
+
+    def test_overlapping_calls_share_one_execution(self):
+        flight = SingleFlight()
+        runs = []
+
+        def slow_read():
+            runs.append(1)
+            time.sleep(0.2)
+            return ["row"]
+
+        results = self.run_concurrently(flight, 8, slow_read)
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        stats = flight.snapshot()
+        self.assertEqual((stats["calls"], stats["merged"], stats["in_flight"]), (1, 7, 0))
+        self.assertEqual(stats["keys"]["k"], {"calls": 1, "merged": 7})
+
+        # Finished calls are not cached.
+        flight.do("k", slow_read)
+        self.assertEqual(len(runs), 2)
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        def failing_read():
+            time.sleep(0.2)
+            raise RuntimeError("boom")
+
+        results = self.run_concurrently(flight, 4, failing_read)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.snapshot()["calls"], 1)
+
+
+class ApiCoalescingTests(unittest.TestCase):
+    def setUp(self):
+        reset_caches()
+        read_flight.reset()
+        self.config = StandinConfig()
+        self.db = self.enterContext(running_standin(config=self.config)).db
+        self.db.table("source_configs").insert({"slug": "email", "name": "Email", "config": {}}).execute()
+
+        patcher = patch("backend.app.main.get_db", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        main.app.dependency_overrides[main.get_current_active_user] = lambda: {"username": "admin", "role": "admin"}
+        main.app.dependency_overrides[main.require_admin] = lambda: {"username": "admin", "role": "admin"}
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.client = TestClient(main.app)
+
+    def test_burst_of_page_loads_hits_supabase_once_per_query(self):
+        self.config.update({"latency_ms": 200})
+        before = self.config.stats["requests"]
+        with ThreadPoolExecutor(10) as pool:
+            responses = list(pool.map(lambda _: self.client.get("/source-configs"), range(10)))
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertEqual({r.json()[0]["slug"] for r in responses}, {"email"})
+
+        # One version poll plus one table read, instead of ten of each.
+        self.assertLessEqual(self.config.stats["requests"] - before, 3)
+        coalescing = self.client.get("/metrics").json()["coalescing"]
+        self.assertGreater(coalescing["merged"], 0)
+        self.assertIn("source_configs", coalescing["keys"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""Behaviour of the plpgsql functions and triggers in schema.sql on a real Postgres.
+
+Same database setup as test_query_plans (TEST_DATABASE_URL or pgserver),
+without the large seed; skipped when neither is available.
+"""
+import glob
+import os
+import threading
+import unittest
+import uuid
+
+from backend.tests.test_query_plans import BACKEND_DIR, admin_dsn, load_sql, psycopg2
+
+
+@unittest.skipIf(psycopg2 is None, "psycopg2 not installed")
+class SqlFunctionTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dsn, cls.server = admin_dsn()
+        if cls.dsn is None:
+            raise unittest.SkipTest("no TEST_DATABASE_URL and pgserver not installed")
+        cls.admin = psycopg2.connect(cls.dsn)
+        cls.admin.autocommit = True
+        cls.dbname = f"viciolinks_sql_{uuid.uuid4().hex[:8]}"
+        cls.admin.cursor().execute(f"create database {cls.dbname}")
+
+        cls.conn = cls.connect()
+        cls.conn.autocommit = True
+        cur = cls.conn.cursor()
+        load_sql(cur, os.path.join(BACKEND_DIR, "schema.sql"))
+        for migration in sorted(glob.glob(os.path.join(BACKEND_DIR, "migrations", "*.sql"))):
+            load_sql(cur, migration)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.admin.cursor().execute(f"drop database if exists {cls.dbname}")
+        cls.admin.close()
+
+    @classmethod
+    def connect(cls):
+        return psycopg2.connect(cls.dsn, dbname=cls.dbname)
+
+    def query(self, sql, params=()):
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    def test_link_changes_become_visible_in_seq_order(self):
+        first, second = self.connect(), self.connect()
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+        cur = first.cursor()
+        cur.execute("select record_link_changes(%s, 'create')", (["lnk_seq_a"],))
+        seq = cur.fetchone()[0]
+
+        result = {}
+
+        def next_writer():
+            other = second.cursor()
+            other.execute("select record_link_changes(%s, 'delete')", (["lnk_seq_b"],))
+            result["seq"] = other.fetchone()[0]
+            second.commit()
+
+        thread = threading.Thread(target=next_writer)
+        thread.start()
+        # seq + 1 cannot be taken while the audits of seq are uncommitted.
+        thread.join(0.3)
+        self.assertTrue(thread.is_alive())
+        first.commit()
+        thread.join(5)
+        self.assertEqual(result["seq"], seq + 1)
+        self.assertEqual(
+            self.query("select link_id, action, seq from public.audits where seq >= %s order by seq", (seq,)),
+            [("lnk_seq_a", "create", seq), ("lnk_seq_b", "delete", seq + 1)],
+        )
+        self.assertEqual(self.query("select count from public.settings where id = 'version:links'"), [(seq + 1,)])
+
+    def test_conversion_rollup_trigger(self):
+        events = [
+            ("e1", "PURCHASE_APPROVED", "lnk_a", "camp_roll", 297, "s1", "k1"),
+            ("e2", "PURCHASE_APPROVED", "lnk_a", "camp_roll", 497, "s1", "k1"),
+            ("e3", "PURCHASE_APPROVED", "lnk_b", "camp_roll", 100, "s2", None),
+            ("e4", "PURCHASE_REFUNDED", "lnk_a", "camp_roll", 297, "s1", "k1"),
+            # Duplicate delivery, an event that does not count, an unmatched sale.
+            ("e1", "PURCHASE_APPROVED", "lnk_a", "camp_roll", 297, "s1", "k1"),
+            ("e5", "PURCHASE_CANCELED", "lnk_b", "camp_roll", 100, "s2", None),
+            ("e6", "PURCHASE_APPROVED", None, None, 999, "s1", "k1"),
+        ]
+        cur = self.conn.cursor()
+        for event in events:
+            # Same statement shape as the ingestor's upsert(ignore_duplicates=True).
+            cur.execute(
+                """
+                insert into public.conversions (event_id, event, link_id, utm_campaign, amount, src, sck)
+                values (%s, %s, %s, %s, %s, %s, %s)
+                on conflict (event_id) do nothing
+                """,
+                event,
+            )
+
+        rows = self.query(
+            "select dimension, dim_key, conversions, revenue::float from public.attribution_rollups "
+            "where utm_campaign = 'camp_roll' order by dimension, dim_key"
+        )
+        self.assertEqual(rows, [
+            ("campaign", "", 2, 597.0),
+            ("link", "lnk_a", 1, 497.0),
+            ("link", "lnk_b", 1, 100.0),
+            ("source", "s1|k1", 1, 497.0),
+            ("source", "s2|", 1, 100.0),
+        ])
+        self.assertEqual(self.query("select count(*) from public.attribution_rollups where utm_campaign is null"), [(0,)])
+
+    def test_archive_links_replaces_ids_already_archived(self):
+        cur = self.conn.cursor()
+        for link_id, url in (("lnk_arch_1", "https://vicio.com/new"), ("lnk_arch_2", "https://vicio.com/2")):
+            cur.execute(
+                "insert into public.links (id, full_url, utm_campaign, created_at) values (%s, %s, 'camp_arch', '2020-01-01')",
+                (link_id, url),
+            )
+        # Copy left behind by an earlier, interrupted run.
+        cur.execute("insert into public.links_archive (id, full_url, created_at) values ('lnk_arch_1', 'https://vicio.com/old', '2020-01-01')")
+
+        cur.execute("select archive_links('2021-01-01', 10)")
+        self.assertEqual(sorted(cur.fetchone()[0]), ["lnk_arch_1", "lnk_arch_2"])
+        self.assertEqual(self.query("select count(*) from public.links where utm_campaign = 'camp_arch'"), [(0,)])
+        self.assertEqual(
+            self.query("select id, full_url from public.links_archive where id like 'lnk_arch_%%' order by id"),
+            [("lnk_arch_1", "https://vicio.com/new"), ("lnk_arch_2", "https://vicio.com/2")],
+        )
+        cur.execute("select archive_links('2021-01-01', 10)")
+        self.assertEqual(cur.fetchone()[0], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
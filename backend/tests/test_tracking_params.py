@@ -1,7 +1,7 @@
 import unittest
 from urllib.parse import parse_qs, urlparse
 
-from backend.app.utils import build_tracking_params, build_full_url
+from backend.app.utils import build_tracking_params, build_full_url, rebuild_full_url
 
 
 class TrackingParamsTests(unittest.TestCase):
@@ -67,5 +67,13 @@ class TrackingParamsTests(unittest.TestCase):
         self.assertNotIn("utm_id", parsed)
 
 
+    def test_rebuild_full_url_keeps_params_and_drops_old_base_query(self):
+        old = build_full_url("https://old.com/?ref=x", "/vendas", {"utm_source": "email", "xcode": "lnk_000007"}, {"a": "1"})
+        rebuilt = rebuild_full_url(old, "https://old.com/?ref=x", "/vendas", "https://new.com", "/oferta")
+        self.assertEqual(rebuilt, "https://new.com/oferta?a=1&utm_source=email&xcode=lnk_000007")
+        # Same destination: byte-identical.
+        self.assertEqual(rebuild_full_url(old, "https://old.com/?ref=x", "/vendas", "https://old.com/?ref=x", "/vendas"), old)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -9,6 +9,10 @@ let currentLinks = [];
 let filteredLinks = []; // Store current filtered state for export
 let currentMode = 'captacao'; // 'captacao' or 'vendas'
 let pendingDeleteLinkId = null;
+let linksChangeToken = null; // cursor for /links/changes
+let linkEvents = null; // EventSource for /links/stream
+let searchResults = null; // server matches for the search box (GET /links?q=)
+let searchTimer = null;
 
 // State for Admin Cascading
 let adminSelectedSource = null;
@@ -96,6 +100,29 @@ async function authFetch(url, options = {}) {
     return res;
 }
 
+// Conditional GET cache for list endpoints: url -> { etag, body }
+// The raw body is kept so every caller gets fresh objects it may mutate.
+const etagCache = new Map();
+
+async function fetchJsonCached(url, onHeaders = null) {
+    const cached = etagCache.get(url);
+    const headers = {};
+    if (cached) headers['If-None-Match'] = cached.etag;
+    const res = await authFetch(url, { headers });
+    if (onHeaders && (res.ok || res.status === 304)) onHeaders(res.headers);
+    if (res.status === 304 && cached) return JSON.parse(cached.body);
+    const body = await res.text();
+    const etag = res.headers.get('ETag');
+    if (res.ok && etag) etagCache.set(url, { etag, body });
+    return JSON.parse(body);
+}
+
+// FastAPI error detail: a string, or a list of {msg} (validation and
+// source governance errors).
+function describeError(detail) {
+    return Array.isArray(detail) ? detail.map(e => e.msg).join('; ') : detail;
+}
+
 function showLoginScreen() {
     const overlay = document.getElementById('login-overlay');
     const app = document.getElementById('app-container');
@@ -114,6 +141,12 @@ function handleLogout() {
     localStorage.removeItem('authToken');
     authToken = null;
     currentUser = null;
+    etagCache.clear();
+    linksChangeToken = null;
+    if (linkEvents) {
+        linkEvents.close();
+        linkEvents = null;
+    }
     showLoginScreen();
 }
 
@@ -189,6 +222,7 @@ async function initApp() {
         ]);
         console.log('initApp completed successfully.');
         updateMediums('instagram');
+        connectLinkEvents();
     } catch (err) {
         console.error('Failed to initialize app:', err);
     }
@@ -243,6 +277,13 @@ function setupEventListeners() {
             return;
         }
 
+        const qrBtn = e.target.closest('button[data-qr-link-id]');
+        if (qrBtn) {
+            const id = qrBtn.dataset.qrLinkId;
+            downloadFile(`${API_BASE}/links/${encodeURIComponent(id)}/qr`, `${id}.png`);
+            return;
+        }
+
         const deleteBtn = e.target.closest('button[data-delete-link-id]');
         if (deleteBtn) {
             openDeleteLinkModal(deleteBtn.dataset.deleteLinkId);
@@ -264,7 +305,7 @@ function setupEventListeners() {
     // addListener('subtype', 'change', (e) => { ... });
 
     // --- Repository Filters ---
-    addListener('search-links', 'input', applyFilters);
+    addListener('search-links', 'input', onSearchInput);
     addListener('filter-campaign', 'change', applyFilters);
     addListener('filter-source', 'change', (e) => {
         const sourceSlug = e.target.value;
@@ -291,6 +332,10 @@ function setupEventListeners() {
     });
 
     addListener('btn-export', 'click', exportToCSV);
+    addListener('btn-archive-filtered', 'click', archiveFilteredLinks);
+    addListener('btn-health-check', 'click', checkLinkDestinations);
+    addListener('btn-qr-zip', 'click', downloadCampaignQrCodes);
+    addListener('btn-rewrite-destination', 'click', rewriteCampaignDestination);
     addListener('users-list', 'click', (e) => {
         const actionBtn = e.target.closest('button[data-user-action]');
         if (!actionBtn) return;
@@ -382,26 +427,22 @@ function setAdminTab(tab) {
 
 // Fetch Functions
 async function fetchProducts() {
-    const res = await authFetch(`${API_BASE}/products`);
-    products = await res.json();
+    products = await fetchJsonCached(`${API_BASE}/products`);
     populateSelect('gen-product', products);
 }
 
 async function fetchTurmas() {
-    const res = await authFetch(`${API_BASE}/turmas`);
-    turmas = await res.json();
+    turmas = await fetchJsonCached(`${API_BASE}/turmas`);
     populateSelect('gen-turma', turmas);
 }
 
 async function fetchLaunchTypes() {
-    const res = await authFetch(`${API_BASE}/launch-types`);
-    launchTypes = await res.json();
+    launchTypes = await fetchJsonCached(`${API_BASE}/launch-types`);
     populateSelect('gen-type', launchTypes);
 }
 
 async function fetchSourceConfigs() {
-    const res = await authFetch(`${API_BASE}/source-configs`);
-    sourceConfigs = await res.json();
+    sourceConfigs = await fetchJsonCached(`${API_BASE}/source-configs`);
 
     populateSelect('channel', sourceConfigs.map(s => ({ slug: s.slug, nome: s.name })));
     populateSelect('filter-source', sourceConfigs.map(s => ({ slug: s.slug, nome: s.name })));
@@ -411,19 +452,57 @@ async function fetchSourceConfigs() {
 }
 
 async function fetchLaunches() {
-    const res = await authFetch(`${API_BASE}/launches`);
-    const launches = await res.json();
+    const launches = await fetchJsonCached(`${API_BASE}/launches`);
     populateCampaignDropdown(launches);
     populateSelect('filter-campaign', launches.map(l => ({ slug: l.slug, nome: l.nome || l.slug })));
     return launches;
 }
 
 async function fetchLinks() {
-    const res = await authFetch(`${API_BASE}/links`);
-    currentLinks = await res.json();
+    currentLinks = await fetchJsonCached(`${API_BASE}/links`, (headers) => {
+        const token = headers.get('X-Change-Token');
+        linksChangeToken = token === null ? null : Number(token);
+    });
     renderLinksTable();
 }
 
+// Apply only what changed since the last load instead of refetching the list.
+async function syncLinks() {
+    if (linksChangeToken === null) return fetchLinks();
+    const res = await authFetch(`${API_BASE}/links/changes?since=${linksChangeToken}`);
+    if (!res.ok) return fetchLinks();
+    const delta = await res.json();
+    if (delta.reset) return fetchLinks();
+    applyLinkChanges(delta);
+}
+
+function applyLinkChanges(delta) {
+    const removed = new Set(delta.deleted);
+    const createdIds = new Set(delta.created.map(l => l.id));
+    currentLinks = delta.created.concat(currentLinks.filter(l => !removed.has(l.id) && !createdIds.has(l.id)));
+    if (searchResults) searchResults = searchResults.filter(l => !removed.has(l.id));
+    if (delta.token !== undefined) linksChangeToken = Math.max(linksChangeToken, delta.token);
+    applyFilters();
+}
+
+// Live updates from other operators. Stream events only carry this server's
+// writes, so the change token is advanced by syncLinks alone.
+function connectLinkEvents() {
+    if (linkEvents || !authToken || typeof EventSource === 'undefined') return;
+    linkEvents = new EventSource(`${API_BASE}/links/stream?access_token=${encodeURIComponent(authToken)}`);
+    linkEvents.addEventListener('created', (e) => {
+        const data = JSON.parse(e.data);
+        applyLinkChanges({ created: [data.link], deleted: [] });
+    });
+    linkEvents.addEventListener('deleted', (e) => {
+        const data = JSON.parse(e.data);
+        applyLinkChanges({ created: [], deleted: [data.id] });
+    });
+    // Sent after a reconnect gap or when this client fell behind.
+    linkEvents.addEventListener('resync', () => syncLinks());
+    linkEvents.addEventListener('open', () => syncLinks());
+}
+
 function populateSelect(id, items) {
     const select = document.getElementById(id);
     if (!select) return;
@@ -453,9 +532,31 @@ function populateCampaignDropdown(launches) {
     });
 }
 
+// Search: 3+ characters query every link on the server (ranked); shorter
+// input filters the loaded list.
+function onSearchInput() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(searchLinks, 300);
+}
+
+async function searchLinks() {
+    const q = document.getElementById('search-links').value.trim();
+    if (q.length < 3) {
+        searchResults = null;
+        return applyFilters();
+    }
+    const res = await authFetch(`${API_BASE}/links?q=${encodeURIComponent(q)}`);
+    if (!res.ok) return;
+    const found = await res.json();
+    // A newer keystroke already replaced this query.
+    if (document.getElementById('search-links').value.trim() !== q) return;
+    searchResults = found;
+    applyFilters();
+}
+
 // Filter Logic
 function applyFilters() {
-    const search = document.getElementById('search-links').value.toLowerCase();
+    const search = searchResults ? '' : document.getElementById('search-links').value.toLowerCase();
     const campaign = document.getElementById('filter-campaign').value;
     const source = document.getElementById('filter-source').value;
     const medium = document.getElementById('filter-medium').value;
@@ -463,7 +564,7 @@ function applyFilters() {
     const term = document.getElementById('filter-term').value.toLowerCase();
     const linkType = document.getElementById('filter-link-type').value;
 
-    const filtered = currentLinks.filter(l => {
+    const filtered = (searchResults || currentLinks).filter(l => {
         const effectiveType = l.link_type || ((l.xcode || l.src || l.sck) ? 'vendas' : 'captacao');
         const matchesSearch = !search || l.id.toLowerCase().includes(search) || (l.full_url && l.full_url.toLowerCase().includes(search));
         const matchesCampaign = !campaign || l.utm_campaign === campaign;
@@ -552,14 +653,26 @@ async function saveGeneratedCampaign() {
     const btn = document.getElementById('btn-save-campaign');
     if (btn) btn.disabled = true;
 
+    // The server normalizes the parts the same way and skips existing slugs.
+    const value = (id) => document.getElementById(id).value;
+    const body = {
+        products: [value('gen-product')],
+        turmas: [value('gen-turma')],
+        launch_types: [value('gen-type')],
+        dates: [`${value('gen-month')}-${value('gen-year').slice(2)}`],
+        create: [slug],
+        names: { [slug]: nome }
+    };
+
     try {
-        const res = await authFetch(`${API_BASE}/launches`, {
+        const res = await authFetch(`${API_BASE}/launches/generate`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ slug, nome: nome, owner: 'admin', status: 'active' })
+            body: JSON.stringify(body)
         });
         if (res.ok) {
-            alert('Campaign criada com sucesso!');
+            const result = await res.json();
+            alert(result.created.length ? 'Campaign criada com sucesso!' : 'Essa Campaign já existe.');
             nameInput.value = '';
             await fetchLaunches();
             renderAdminLists();
@@ -569,7 +682,7 @@ async function saveGeneratedCampaign() {
         let errorMsg = `Erro ao salvar Campaign (status ${res.status}).`;
         try {
             const data = await res.json();
-            if (data?.detail) errorMsg = `${errorMsg} ${data.detail}`;
+            if (data?.detail) errorMsg = `${errorMsg} ${describeError(data.detail)}`;
         } catch (_) {
             // Ignore JSON parsing failures.
         }
@@ -584,6 +697,18 @@ async function saveGeneratedCampaign() {
 }
 
 // Link Generation
+// Idempotency-Key of the last generate request that did not get an answer; a
+// resubmit of the same payload reuses it so the server does not create twice.
+let pendingGenerate = null;
+
+function idempotencyKeyFor(body) {
+    if (!pendingGenerate || pendingGenerate.body !== body) {
+        const key = window.crypto?.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        pendingGenerate = { body, key };
+    }
+    return pendingGenerate.key;
+}
+
 async function handleGenerateLink(e) {
     e.preventDefault();
     const campaign = document.getElementById('campaign-select').value;
@@ -629,17 +754,19 @@ async function handleGenerateLink(e) {
         notes: notes
     };
 
+    const body = JSON.stringify(payload);
     try {
         const res = await authFetch(`${API_BASE}/links/generate`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
+            headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKeyFor(body) },
+            body
         });
+        if (res.status !== 409) pendingGenerate = null;
         if (!res.ok) {
             let msg = `Erro ao gerar o link (status ${res.status}).`;
             try {
                 const errData = await res.json();
-                if (errData?.detail) msg = `${msg} ${errData.detail}`;
+                if (errData?.detail) msg = `${msg} ${describeError(errData.detail)}`;
             } catch (_) {
                 // Ignore response parsing errors.
             }
@@ -649,7 +776,10 @@ async function handleGenerateLink(e) {
 
         const link = await res.json();
         showResult(link);
-        await fetchLinks();
+        if (res.headers.get('X-Link-Reused') === 'true') {
+            showToast('Link idêntico já existia e foi reutilizado.');
+        }
+        await syncLinks();
     } catch (err) {
         console.error('Generate link error:', err);
         alert('Erro ao gerar o link.');
@@ -662,6 +792,8 @@ function showResult(link) {
         resultCard.classList.remove('hidden');
         document.getElementById('final-url').innerText = link.full_url;
         document.getElementById('res-id').innerText = link.id;
+        // GET /r/{short_code} redirects to full_url.
+        document.getElementById('res-short').innerText = link.short_code ? `${location.origin}${API_BASE}/r/${link.short_code}` : '-';
         document.getElementById('res-source').innerText = link.utm_source;
         document.getElementById('res-medium').innerText = link.utm_medium;
         document.getElementById('res-campaign').innerText = link.utm_campaign;
@@ -1191,6 +1323,17 @@ function splitTerm(term) {
     return { detail: term, date: '-' };
 }
 
+// Result of the last destination check (POST /links/health-check), if any.
+function healthDot(link) {
+    if (!link.health_checked_at) return '';
+    const ok = !link.health_error;
+    const label = ok
+        ? `${link.health_status} em ${link.health_ms} ms`
+        : `${link.health_status || 'sem resposta'}: ${link.health_error}`;
+    const title = `${label} (${new Date(link.health_checked_at).toLocaleString()})`;
+    return `<span class="health-dot ${ok ? 'health-ok' : 'health-broken'}" title="${escapeHtml(title)}"></span>`;
+}
+
 function renderLinksTable(links = currentLinks) {
     const tbody = document.getElementById('links-tbody');
     const emptyState = document.getElementById('empty-state');
@@ -1201,7 +1344,7 @@ function renderLinksTable(links = currentLinks) {
         const fullUrl = l.full_url || '';
         return `
             <tr>
-                <td><code>${escapeHtml(l.id)}</code></td>
+                <td>${healthDot(l)}<code>${escapeHtml(l.id)}</code></td>
                 <td>${escapeHtml(l.utm_campaign)}</td>
                 <td>${escapeHtml(l.utm_source)}</td>
                 <td>${escapeHtml(l.utm_medium)}</td>
@@ -1211,6 +1354,7 @@ function renderLinksTable(links = currentLinks) {
                 <td class="actions-col">
                     <div class="repo-actions">
                         <button class="btn btn-secondary btn-sm" type="button" data-copy-url="${escapeHtml(fullUrl)}">Copy</button>
+                        <button class="btn btn-secondary btn-sm" type="button" data-qr-link-id="${escapeHtml(l.id)}">QR</button>
                         <button class="btn-icon-trash" type="button" data-delete-link-id="${escapeHtml(l.id)}" aria-label="Remover link" title="Remover link">
                             <svg viewBox="0 0 24 24" aria-hidden="true">
                                 <path d="M9 4h6m-9 3h12m-1 0-1 12a2 2 0 0 1-2 2H10a2 2 0 0 1-2-2L7 7m3 4v6m4-6v6"/>
@@ -1226,7 +1370,43 @@ function renderLinksTable(links = currentLinks) {
     filteredLinks = links; // Initial/Fallback filtered state
 }
 
-function exportToCSV() {
+// Server export covers every matching link, including links_archive; free-text
+// filters (search, term) only exist client-side, so those use the loaded rows.
+async function exportToCSV() {
+    const search = document.getElementById('search-links').value;
+    const term = document.getElementById('filter-term').value;
+    if (!search && !term) {
+        const params = new URLSearchParams();
+        const filters = {
+            launch_id: 'filter-campaign',
+            utm_source: 'filter-source',
+            utm_medium: 'filter-medium',
+            utm_content: 'filter-content',
+            link_type: 'filter-link-type'
+        };
+        Object.entries(filters).forEach(([param, id]) => {
+            const value = document.getElementById(id).value;
+            if (value) params.set(param, value);
+        });
+        try {
+            const res = await authFetch(`${API_BASE}/links/export?${params}`);
+            if (res.ok) {
+                const url = URL.createObjectURL(await res.blob());
+                const link = document.createElement("a");
+                link.setAttribute("href", url);
+                const date = new Date().toISOString().split('T')[0];
+                link.setAttribute("download", `viciolinks_export_${date}.csv`);
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+                URL.revokeObjectURL(url);
+                return;
+            }
+        } catch (err) {
+            console.error('Export error:', err);
+        }
+    }
+
     if (!filteredLinks || filteredLinks.length === 0) {
         alert('Nenhum link pesquisado para exportar.');
         return;
@@ -1290,7 +1470,7 @@ async function confirmDeleteLink() {
 
         showToast("Link removido com sucesso!");
         closeDeleteLinkModal();
-        await fetchLinks();
+        await syncLinks();
         applyFilters();
     } catch (err) {
         console.error('Delete link error:', err);
@@ -1419,3 +1599,175 @@ async function deleteUser(username) {
         console.error(err);
     }
 }
+
+// Archive every link currently shown by the repository filters in one call.
+async function archiveFilteredLinks() {
+    const ids = (filteredLinks || []).map(l => l.id);
+    if (!ids.length) {
+        showToast('Nenhum link filtrado para arquivar.');
+        return;
+    }
+    if (!confirm(`Arquivar ${ids.length} link(s) filtrado(s)?`)) return;
+
+    try {
+        const res = await authFetch(`${API_BASE}/links/bulk`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ action: 'archive', ids })
+        });
+        if (!res.ok) {
+            let msg = `Erro ao arquivar links (status ${res.status}).`;
+            try {
+                const errData = await res.json();
+                if (errData?.detail) msg = `${msg} ${errData.detail}`;
+            } catch (_) {
+                // Ignore parsing issues for non-JSON errors.
+            }
+            alert(msg);
+            return;
+        }
+
+        const result = await res.json();
+        showToast(`${result.affected} link(s) arquivado(s).`);
+        await syncLinks();
+    } catch (err) {
+        console.error('Archive links error:', err);
+        alert('Erro ao arquivar links.');
+    }
+}
+
+async function downloadFile(url, filename) {
+    try {
+        const res = await authFetch(url);
+        if (!res.ok) {
+            let msg = `Erro ao baixar arquivo (status ${res.status}).`;
+            try {
+                const errData = await res.json();
+                if (errData?.detail) msg = `${msg} ${errData.detail}`;
+            } catch (_) {
+                // Ignore parsing issues for non-JSON errors.
+            }
+            alert(msg);
+            return;
+        }
+        const objectUrl = URL.createObjectURL(await res.blob());
+        const link = document.createElement('a');
+        link.setAttribute('href', objectUrl);
+        link.setAttribute('download', filename);
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+        URL.revokeObjectURL(objectUrl);
+    } catch (err) {
+        console.error('Download error:', err);
+        alert('Erro ao baixar arquivo.');
+    }
+}
+
+async function downloadCampaignQrCodes() {
+    const campaign = document.getElementById('filter-campaign').value;
+    if (!campaign) {
+        showToast('Selecione uma campanha para baixar os QR codes.');
+        return;
+    }
+    const params = new URLSearchParams({ launch_id: campaign });
+    await downloadFile(`${API_BASE}/links/qr.zip?${params}`, `qr_${campaign}.zip`);
+}
+
+// Moves every link of the filtered campaign to a new base_url/path, keeping
+// ids and UTMs. Shows a dry-run preview before writing.
+async function rewriteCampaignDestination() {
+    const campaign = document.getElementById('filter-campaign').value;
+    if (!campaign) {
+        showToast('Selecione uma campanha para trocar o destino.');
+        return;
+    }
+    const baseUrl = prompt('Nova URL base (ex: https://vicio.com):');
+    if (!baseUrl) return;
+    const path = prompt('Novo path (vazio mantém o path de cada link):', '');
+    if (path === null) return;
+
+    const body = { base_url: baseUrl.trim(), utm_campaign: campaign };
+    if (path.trim()) body.path = path.trim();
+    const post = (dryRun) => authFetch(`${API_BASE}/links/rewrite`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...body, dry_run: dryRun })
+    });
+
+    try {
+        let res = await post(true);
+        if (!res.ok) {
+            let msg = `Erro ao trocar destino (status ${res.status}).`;
+            try {
+                const errData = await res.json();
+                if (errData?.detail) msg = `${msg} ${errData.detail}`;
+            } catch (_) {
+                // Ignore parsing issues for non-JSON errors.
+            }
+            alert(msg);
+            return;
+        }
+        const preview = await res.json();
+        if (!preview.rewritten) {
+            showToast('Nenhum link precisa ser alterado.');
+            return;
+        }
+        const example = preview.sample[0] ? `\n\nEx.: ${preview.sample[0].new_url}` : '';
+        if (!confirm(`Trocar o destino de ${preview.rewritten} link(s) de ${campaign}?${example}`)) return;
+
+        res = await post(false);
+        if (!res.ok) {
+            alert(`Erro ao trocar destino (status ${res.status}).`);
+            return;
+        }
+        const result = await res.json();
+        showToast(`${result.rewritten} link(s) atualizado(s).`);
+        await syncLinks();
+    } catch (err) {
+        console.error('Rewrite destination error:', err);
+        alert('Erro ao trocar destino.');
+    }
+}
+
+async function waitForJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const res = await authFetch(`${API_BASE}/jobs/${encodeURIComponent(jobId)}`);
+        if (!res.ok) throw new Error(`status ${res.status}`);
+        const job = await res.json();
+        if (!['queued', 'running'].includes(job.status)) return job;
+    }
+}
+
+async function checkLinkDestinations() {
+    const campaign = document.getElementById('filter-campaign').value;
+    const scope = campaign ? `da campanha ${campaign}` : 'dos últimos 7 dias';
+    if (!confirm(`Checar os destinos dos links ${scope}?`)) return;
+
+    try {
+        const res = await authFetch(`${API_BASE}/links/health-check`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ utm_campaign: campaign || null })
+        });
+        if (!res.ok) {
+            alert(`Erro ao iniciar checagem (status ${res.status}).`);
+            return;
+        }
+        showToast('Checagem de destinos iniciada...');
+        const job = await waitForJob((await res.json()).id);
+        if (job.status !== 'done') {
+            alert(`Checagem terminou como ${job.status}. ${job.error || ''}`);
+            return;
+        }
+        const broken = job.result.broken || [];
+        showToast(broken.length
+            ? `${broken.length} destino(s) com problema de ${job.result.destinations}.`
+            : `${job.result.destinations} destino(s) OK.`);
+        await fetchLinks();
+    } catch (err) {
+        console.error('Health check error:', err);
+        alert('Erro ao checar destinos.');
+    }
+}